@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark: pickled LangChain docstore vs the compact mmap docstore.
+
+Writes one synthetic index in both on-disk layouts:
+1. pickle   FAISS.save_local (index.faiss + index.pkl), loaded with load_local
+2. compact  index.faiss + texts.bin/texts.idx + docstore.sqlite3 (chat.mmap_store)
+
+then starts a fresh Python process per layout and run, and measures the time
+to load the store, the first 12-chunk search, and the process memory after
+each step: RSS, and where /proc/self/smaps_rollup exists the anonymous
+(heap) part of it. Memory-mapped index pages count toward RSS but are file
+page cache, shared by every worker process on the host.
+
+Usage:
+    python benchmarks/bench_cold_start.py [--chunks 20000] [--dim 768] [--runs 3]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import FakeEmbeddings
+
+from chat.mmap_store import INDEX_FILE, load_compact_store, write_compact_store
+
+_WORDS = (
+    "quinnipiac student housing dining hall hours registrar final exam calendar tuition "
+    "financial aid library parking shuttle mount carmel york hill north haven athletics "
+    "hockey nursing law medicine career orientation advising course registration"
+).split()
+
+
+def _memory_mb() -> dict:
+    out = {}
+    try:
+        with open("/proc/self/status", "r") as f:
+            out["rss"] = int(f.read().split("VmRSS:")[1].split()[0]) / 1024
+        with open("/proc/self/smaps_rollup", "r") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        out["anon"] = int(fields["Anonymous"].split()[0]) / 1024
+    except (OSError, IndexError, KeyError, ValueError):
+        try:
+            import psutil
+
+            out["rss"] = psutil.Process().memory_info().rss / (1024 * 1024)
+        except ImportError:
+            pass
+    return out
+
+
+def _child(layout: str, folder: Path, dim: int) -> None:
+    embeddings = FakeEmbeddings(size=dim)
+    query = np.random.default_rng(1).normal(size=dim).astype(np.float32).tolist()
+    before = _memory_mb()
+    started = time.perf_counter()
+    if layout == "pickle":
+        store = FAISS.load_local(str(folder), embeddings, allow_dangerous_deserialization=True)
+    else:
+        store = load_compact_store(folder, embeddings)
+    loaded = time.perf_counter()
+    after_load = _memory_mb()
+    docs = store.similarity_search_with_score_by_vector(query, k=12)
+    searched = time.perf_counter()
+    assert len(docs) == 12 and docs[0][0].page_content
+    after_search = _memory_mb()
+    print(json.dumps({
+        "load_s": loaded - started,
+        "search_s": searched - loaded,
+        "load_mb": {k: after_load[k] - before[k] for k in after_load},
+        "search_mb": {k: after_search[k] - before[k] for k in after_search},
+    }))
+
+
+def _write_layouts(root: Path, chunks: int, dim: int) -> dict:
+    rng = np.random.default_rng(7)
+    texts = [" ".join(rng.choice(_WORDS, size=140)) for _ in range(chunks)]
+    vectors = rng.normal(size=(chunks, dim)).astype(np.float32)
+    store = FAISS.from_embeddings(
+        list(zip(texts, vectors.tolist())),
+        FakeEmbeddings(size=dim),
+        metadatas=[{"source": f"https://www.qu.edu/page-{i // 8}"} for i in range(chunks)],
+        ids=[f"chunk-{i}" for i in range(chunks)],
+    )
+    layouts = {"pickle": root / "pickle", "compact": root / "compact"}
+    store.save_local(str(layouts["pickle"]))
+    layouts["compact"].mkdir()
+    faiss.write_index(store.index, str(layouts["compact"] / INDEX_FILE))
+    write_compact_store(store, layouts["compact"])
+    return layouts
+
+
+def _disk_mb(folder: Path) -> float:
+    return sum(p.stat().st_size for p in folder.iterdir()) / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh processes per layout (median is reported)")
+    parser.add_argument("--child", nargs=2, metavar=("LAYOUT", "DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child[0], Path(args.child[1]), args.dim)
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Writing {args.chunks} chunks (dim {args.dim}) in both layouts...")
+        layouts = _write_layouts(Path(tmp), args.chunks, args.dim)
+        print(f"{'layout':<8} {'disk MB':>8} {'load s':>7} {'1st search s':>12} "
+              f"{'RSS +MB load':>12} {'RSS +MB search':>14} {'anon +MB':>9}")
+        for layout, folder in layouts.items():
+            runs = []
+            for _ in range(max(1, args.runs)):
+                out = subprocess.run(
+                    [sys.executable, __file__, "--dim", str(args.dim), "--child", layout, str(folder)],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                runs.append(json.loads(out.strip().splitlines()[-1]))
+
+            def median(get):
+                values = [get(r) for r in runs]
+                return statistics.median(values) if None not in values else float("nan")
+
+            print(f"{layout:<8} {_disk_mb(folder):>8.1f} {median(lambda r: r['load_s']):>7.3f} "
+                  f"{median(lambda r: r['search_s']):>12.4f} "
+                  f"{median(lambda r: r['load_mb'].get('rss')):>12.1f} "
+                  f"{median(lambda r: r['search_mb'].get('rss')):>14.1f} "
+                  f"{median(lambda r: r['search_mb'].get('anon')):>9.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Embedding throughput benchmark: current OllamaEmbeddings path vs the batched client.
+
+Starts a local fake Ollama embed server (see fake_ollama.py), then embeds the
+same synthetic chunks through:
+1. langchain_ollama.OllamaEmbeddings (what build_index used before)
+2. chat.embed_client.BatchedOllamaEmbeddings for each batch/concurrency setting
+
+Usage:
+    python benchmarks/bench_embed.py [--chunks N] [--parallel P]
+        [--batch-sizes 8,32,64] [--concurrency 1,4,8]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from langchain_ollama import OllamaEmbeddings
+
+from chat.embed_client import BatchedOllamaEmbeddings
+from fake_ollama import FakeOllama
+
+_WORDS = (
+    "quinnipiac student housing dining hall hours registrar final exam calendar tuition "
+    "financial aid library parking shuttle mount carmel york hill north haven athletics "
+    "hockey nursing law medicine career orientation advising course registration"
+).split()
+
+
+def _chunks(n: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(_WORDS) for _ in range(160)) for _ in range(n)]
+
+
+def _int_list(raw: str) -> list:
+    return [int(x) for x in raw.split(",") if x.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=512, help="Number of chunks to embed")
+    parser.add_argument("--parallel", type=int, default=4, help="Requests the fake server serves at once")
+    parser.add_argument("--request-latency", type=float, default=0.02, help="Fake per-request cost (s)")
+    parser.add_argument("--item-latency", type=float, default=0.004, help="Fake per-chunk cost (s)")
+    parser.add_argument("--batch-sizes", default="8,32,64")
+    parser.add_argument("--concurrency", default="1,4,8")
+    args = parser.parse_args()
+
+    server = FakeOllama(
+        request_latency=args.request_latency,
+        item_latency=args.item_latency,
+        parallel=args.parallel,
+    )
+    server.start()
+    texts = _chunks(args.chunks)
+    print(f"{args.chunks} chunks, fake server parallel={args.parallel}, "
+          f"cost={args.request_latency}s/request + {args.item_latency}s/chunk")
+    print(f"{'client':<40} {'seconds':>8} {'chunks/s':>9} {'requests':>9}")
+
+    def run(label, embeddings):
+        before = server.requests
+        started = time.perf_counter()
+        vectors = embeddings.embed_documents(texts)
+        elapsed = time.perf_counter() - started
+        assert len(vectors) == len(texts)
+        print(f"{label:<40} {elapsed:>8.2f} {len(texts) / elapsed:>9.1f} {server.requests - before:>9}")
+        return vectors
+
+    baseline = run("OllamaEmbeddings (current)", OllamaEmbeddings(model="bench", base_url=server.base_url))
+    for batch_size in _int_list(args.batch_sizes):
+        for concurrency in _int_list(args.concurrency):
+            client = BatchedOllamaEmbeddings(
+                model="bench",
+                base_url=server.base_url,
+                batch_size=batch_size,
+                concurrency=concurrency,
+            )
+            vectors = run(f"Batched batch={batch_size} concurrency={concurrency}", client)
+            if vectors != baseline:
+                print("  ! vectors differ from the baseline path")
+
+    server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
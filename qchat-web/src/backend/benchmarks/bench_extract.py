@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+HTML extraction benchmark: compares the chat.html_extract backends on saved pages.
+
+Reads a corpus of HTML snapshots (*.html in --snapshots), runs every backend
+over it and reports throughput plus how its output compares to the first
+backend (bs4 by default, what builds used before):
+
+    identical   pages whose text is exactly the baseline's
+    kept        share of baseline lines the backend also returns
+    extra       share of the backend's lines that the baseline doesn't have
+    chunks      chunks the text splits into with the current chunk settings
+
+Save a corpus first (fetches with the build's fetcher, politeness included):
+    python benchmarks/bench_extract.py --save chat/qu_docs.txt --max 200
+
+Usage:
+    python benchmarks/bench_extract.py [--snapshots DIR] [--backends bs4,lxml,main]
+        [--repeat 3] [--worst 5]
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from chat.html_extract import available_extractors, get_extractor
+from chat.RAG import _new_splitter, read_urls
+from chat.rag_fetch import PageFetcher
+
+DEFAULT_SNAPSHOTS = Path(__file__).resolve().parent / "html_snapshots"
+INDEX_FILE = "snapshots.json"
+
+
+def save_snapshots(urls_txt: Path, out_dir: Path, max_urls: int) -> int:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    index_path = out_dir / INDEX_FILE
+    index = json.loads(index_path.read_text(encoding="utf-8")) if index_path.exists() else {}
+    urls = read_urls(urls_txt)[:max_urls]
+    saved = 0
+    for result in PageFetcher().fetch_all(urls):
+        if not result.ok or not result.html:
+            continue
+        name = hashlib.sha1(result.url.encode("utf-8")).hexdigest()[:16] + ".html"
+        (out_dir / name).write_text(result.html, encoding="utf-8")
+        index[name] = result.url
+        saved += 1
+    index_path.write_text(json.dumps(index, indent=1, sort_keys=True), encoding="utf-8")
+    return saved
+
+
+def _line_overlap(baseline: str, text: str):
+    base_lines, lines = set(baseline.split("\n")), set(text.split("\n"))
+    base_lines.discard("")
+    lines.discard("")
+    kept = len(base_lines & lines) / len(base_lines) if base_lines else 1.0
+    extra = len(lines - base_lines) / len(lines) if lines else 0.0
+    return kept, extra
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--snapshots", type=Path, default=DEFAULT_SNAPSHOTS, help="Directory of *.html snapshots")
+    parser.add_argument("--save", type=Path, metavar="URLS_TXT", help="Fetch URLs from this file into --snapshots")
+    parser.add_argument("--max", type=int, default=200, help="Max URLs to save with --save")
+    parser.add_argument("--backends", default=",".join(available_extractors()))
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per backend (best time is reported)")
+    parser.add_argument("--worst", type=int, default=5, help="List the pages each backend keeps least of")
+    args = parser.parse_args()
+
+    if args.save:
+        saved = save_snapshots(args.save, args.snapshots, args.max)
+        print(f"Saved {saved} snapshots to {args.snapshots}")
+        return 0
+
+    files = sorted(args.snapshots.glob("*.html"))
+    if not files:
+        print(f"No *.html snapshots in {args.snapshots} (create them with --save)")
+        return 1
+    index_path = args.snapshots / INDEX_FILE
+    names = json.loads(index_path.read_text(encoding="utf-8")) if index_path.exists() else {}
+    pages = [f.read_text(encoding="utf-8", errors="replace") for f in files]
+    megabytes = sum(len(p.encode("utf-8")) for p in pages) / (1024 * 1024)
+    splitter = _new_splitter()
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    print(f"{len(pages)} pages, {megabytes:.1f} MB of HTML, baseline: {backends[0]}")
+    print(f"{'backend':<8} {'seconds':>8} {'pages/s':>8} {'MB/s':>6} {'chars':>10} {'chunks':>7} "
+          f"{'identical':>9} {'kept':>6} {'extra':>6}")
+
+    baseline = None
+    for backend in backends:
+        extract = get_extractor(backend)
+        best = float("inf")
+        for _ in range(max(1, args.repeat)):
+            started = time.perf_counter()
+            texts = [extract(p) for p in pages]
+            best = min(best, time.perf_counter() - started)
+        if baseline is None:
+            baseline = texts
+        overlaps = [_line_overlap(b, t) for b, t in zip(baseline, texts)]
+        kept = sum(o[0] for o in overlaps) / len(overlaps)
+        extra = sum(o[1] for o in overlaps) / len(overlaps)
+        identical = sum(1 for b, t in zip(baseline, texts) if b == t)
+        chunks = sum(len(splitter.split_text(t)) for t in texts)
+        print(f"{backend:<8} {best:>8.2f} {len(pages) / best:>8.1f} {megabytes / best:>6.1f} "
+              f"{sum(len(t) for t in texts):>10} {chunks:>7} {identical:>9} {kept:>6.1%} {extra:>6.1%}")
+        if args.worst and texts is not baseline:
+            worst = sorted(range(len(pages)), key=lambda i: overlaps[i][0])[:args.worst]
+            for i in worst:
+                if overlaps[i][0] < 1.0:
+                    label = names.get(files[i].name, files[i].name)
+                    # the overlap is over distinct non-empty lines, as in _line_overlap
+                    lines = len(set(baseline[i].split("\n")) - {""})
+                    print(f"    kept {overlaps[i][0]:.0%} of {lines} baseline lines: {label}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Index type benchmark: recall@k and query latency of quantized indexes vs flat.
+
+Vectors come from a built index (--index-dir, the exact flat vectors are used)
+or a synthetic corpus shaped like sentence embeddings: unit-length vectors
+around overlapping topics (topics grouped into broader areas, points spread
+about as far as neighbouring topics are apart). The fixed query set is either
+real questions (--queries, one per line, embedded with the configured Ollama
+model) or synthetic questions that mix two topics plus noise, so their true
+neighbours straddle IVF cells like real questions do (seeded, so runs compare).
+
+For each QCHAT_INDEX_TYPE (and each nprobe for IVF types) it prints the index
+size, training time, mean / p95 single-query latency and recall@k against
+exact flat search. Settings are built with chat.index_quant.index_spec, i.e.
+exactly what build_index would publish.
+
+Usage:
+    python benchmarks/bench_index.py [--index-dir chat/faiss_index | --vectors 50000 --dim 768]
+        [--queries questions.txt | --num-queries 200] [--k 12]
+        [--types flat,sq8,ivf,ivfsq8,pq,ivfpq] [--nprobe 4,16,64]
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from chat.index_quant import FLAT_INDEX_FILE, INDEX_TYPES, apply_search_params, index_bytes, index_spec, train_index
+from chat.index_store import resolve_current
+
+
+def _load_vectors(index_dir: Path) -> np.ndarray:
+    live_dir, version = resolve_current(index_dir)
+    if live_dir is None:
+        raise SystemExit(f"No index found at {index_dir}")
+    path = live_dir / FLAT_INDEX_FILE
+    if not path.exists():
+        path = live_dir / "index.faiss"
+    index = faiss.read_index(str(path))
+    print(f"Loaded {index.ntotal} vectors (dim {index.d}) from version {version}")
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def _unit(x: np.ndarray) -> np.ndarray:
+    return (x / np.linalg.norm(x, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _topics(dim: int, clusters: int, rng) -> np.ndarray:
+    # topics of one area (admissions, housing, law school, ...) sit close together
+    areas = rng.normal(size=(max(1, clusters // 10), dim))
+    return areas[rng.integers(0, len(areas), clusters)] + 0.7 * rng.normal(size=(clusters, dim))
+
+
+def _synthetic(n: int, topics: np.ndarray, spread: float, rng) -> np.ndarray:
+    points = topics[rng.integers(0, len(topics), n)] + spread * rng.normal(size=(n, topics.shape[1]))
+    return _unit(points)
+
+
+def _synthetic_queries(n: int, topics: np.ndarray, spread: float, rng) -> np.ndarray:
+    # a question usually touches two topics, weighted unevenly
+    weight = rng.uniform(0.5, 1.0, size=(n, 1))
+    first, second = topics[rng.integers(0, len(topics), n)], topics[rng.integers(0, len(topics), n)]
+    mixed = weight * first + (1 - weight) * second
+    return _unit(mixed + spread * rng.normal(size=mixed.shape))
+
+
+def _embed_questions(path: Path) -> np.ndarray:
+    from chat.embed_client import BatchedOllamaEmbeddings
+
+    questions = [q.strip() for q in path.read_text(encoding="utf-8").splitlines() if q.strip()]
+    client = BatchedOllamaEmbeddings(
+        model=os.getenv("QCHAT_EMBED_MODEL", "nomic-embed-text"),
+        base_url=os.getenv("OLLAMA_URL", "http://127.0.0.1:11434"),
+    )
+    return np.asarray(client.embed_documents(questions), dtype=np.float32)
+
+
+def _time_queries(index, queries: np.ndarray, k: int):
+    latencies, results = [], []
+    for q in queries:
+        started = time.perf_counter()
+        _, ids = index.search(q.reshape(1, -1), k)
+        latencies.append(time.perf_counter() - started)
+        results.append(ids[0])
+    return np.array(latencies) * 1000.0, np.array(results)
+
+
+def _recall(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def _int_list(raw: str) -> list:
+    return [int(x) for x in raw.split(",") if x.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index-dir", type=Path, help="Benchmark the vectors of a built index")
+    parser.add_argument("--vectors", type=int, default=50000, help="Synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=768, help="Synthetic vector size (nomic-embed-text: 768)")
+    parser.add_argument("--clusters", type=int, default=200, help="Synthetic topic clusters")
+    parser.add_argument("--spread", type=float, default=0.8, help="Synthetic per-dimension noise around a topic")
+    parser.add_argument("--queries", type=Path, help="Questions file, embedded with Ollama")
+    parser.add_argument("--num-queries", type=int, default=200, help="Held-out query vectors otherwise")
+    parser.add_argument("--k", type=int, default=12)
+    parser.add_argument("--types", default=",".join(INDEX_TYPES))
+    parser.add_argument("--nprobe", default="4,16,64", help="nprobe values tried for IVF types")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    topics = None
+    if args.index_dir:
+        vectors = _load_vectors(args.index_dir)
+    else:
+        topics = _topics(args.dim, args.clusters, rng)
+        vectors = _synthetic(args.vectors, topics, args.spread, rng)
+    if args.queries:
+        queries = _embed_questions(args.queries)
+    elif args.index_dir:
+        # corpus vectors nudged off their position, so they are not exact hits
+        picks = vectors[rng.choice(len(vectors), args.num_queries, replace=False)]
+        queries = (picks + 0.05 * picks.std() * rng.normal(size=picks.shape)).astype(np.float32)
+    else:
+        # separate stream: the questions are not copies of corpus points
+        queries = _synthetic_queries(args.num_queries, topics, args.spread, np.random.default_rng(args.seed + 1))
+    n, dim = vectors.shape
+
+    exact = faiss.IndexFlatL2(dim)
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+    print(f"{n} vectors, dim {dim}, {len(queries)} queries, k={args.k}")
+    print(f"{'type':<8} {'factory':<18} {'nprobe':>6} {'MB':>8} {'train s':>8} "
+          f"{'mean ms':>8} {'p95 ms':>7} {'recall@k':>8}")
+
+    for index_type in [t.strip() for t in args.types.split(",") if t.strip()]:
+        spec = index_spec(n, dim, index_type=index_type)
+        if spec.get("fallback_reason"):
+            print(f"{index_type:<8} skipped: {spec['fallback_reason']}")
+            continue
+        started = time.perf_counter()
+        index = exact if spec["type"] == "flat" else train_index(vectors, spec)
+        train_seconds = time.perf_counter() - started
+        size_mb = index_bytes(index) / 1e6
+        probes = [p for p in _int_list(args.nprobe) if p <= spec["nlist"]] if "nlist" in spec else [None]
+        for nprobe in probes:
+            if nprobe:
+                apply_search_params(index, nprobe)
+            latencies, found = _time_queries(index, queries, args.k)
+            print(f"{index_type:<8} {spec['factory']:<18} {nprobe or '-':>6} {size_mb:>8.1f} {train_seconds:>8.1f} "
+                  f"{latencies.mean():>8.3f} {np.percentile(latencies, 95):>7.3f} {_recall(found, truth):>8.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Keyword rerank microbenchmark: per-query substring scan vs precomputed keyword sets.
+
+Scores candidate pools of synthetic chunks (or chunks read from a built index
+with --index-dir) against a set of questions, with
+
+  scan        the previous rerank: lowercase page_content[:1500] + source and
+              substring-search every question keyword, for every candidate
+  keywords    keyword_overlap_scores() over the hashes stored in the docstore
+
+and prints microseconds per query for each pool size, the stored bytes per
+chunk, and how often the two scores agree (they differ only when a keyword
+occurs inside a longer word, e.g. "101" in "cis101").
+
+Usage:
+    python benchmarks/bench_keyword_rerank.py [--index-dir chat/faiss_index]
+        [--pool-sizes 12,24,48] [--queries 200] [--rounds 5]
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from langchain_core.documents import Document
+
+from chat.keyword_sets import KeywordedDocument, chunk_keywords, keyword_overlap_scores
+
+_WORDS = (
+    "quinnipiac student housing dining hall hours registrar final finals exam exams calendar tuition "
+    "financial aid library parking shuttle mount carmel york hill north haven athletics hockey nursing "
+    "law medicine career orientation advising course courses registration register spring fall semester "
+    "cis 101 bio 150 office contact email phone building center services undergraduate graduate"
+).split()
+_QUESTION_WORDS = ["when", "are", "the", "what", "where", "is", "how", "do", "register", "for"] + _WORDS
+
+
+def _scan_score(question: str, doc: Document) -> int:
+    # the rerank before keyword sets (RAG._keyword_overlap_score)
+    keywords = [t for t in re.findall(r"[a-zA-Z0-9]+", question.lower()) if len(t) >= 3]
+    if not keywords:
+        return 0
+    haystack = (doc.page_content[:1500] + " " + str(doc.metadata.get("source", ""))).lower()
+    return sum(1 for kw in set(keywords) if kw in haystack)
+
+
+def _synthetic_docs(count: int, rng: random.Random) -> list:
+    docs = []
+    for i in range(count):
+        words = [rng.choice(_WORDS) for _ in range(170)]
+        text = " ".join(w.capitalize() if rng.random() < 0.1 else w for w in words)
+        docs.append(Document(page_content=text, metadata={"source": f"https://www.qu.edu/{rng.choice(_WORDS)}/page{i}/"}))
+    return docs
+
+
+def _index_docs(index_dir: Path, count: int) -> list:
+    from chat.index_store import resolve_current
+    from chat.mmap_store import load_compact_store
+
+    folder, _ = resolve_current(index_dir)
+    if folder is None:
+        raise SystemExit(f"No published index in {index_dir}")
+    store = load_compact_store(folder, embeddings=None)
+    if store is None:
+        raise SystemExit(f"No compact store in {folder}")
+    total = store.index.ntotal
+    return [store.docstore.search(store.index_to_docstore_id[p]) for p in range(min(count, total))]
+
+
+def _int_list(raw: str) -> list:
+    return [int(x) for x in raw.split(",") if x.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index-dir", type=Path, help="Score chunks of a built index (default: synthetic)")
+    parser.add_argument("--chunks", type=int, default=2000, help="Chunks to sample candidates from")
+    parser.add_argument("--pool-sizes", default="12,24,48", help="Candidates per query (retrieve uses max(4k, 12))")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5, help="Repeats per pool size (best is kept)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    docs = _index_docs(args.index_dir, args.chunks) if args.index_dir else _synthetic_docs(args.chunks, rng)
+    started = time.perf_counter()
+    keyworded = [
+        doc if isinstance(doc, KeywordedDocument) and doc.keywords is not None
+        else KeywordedDocument(page_content=doc.page_content, metadata=doc.metadata, keywords=chunk_keywords(doc))
+        for doc in docs
+    ]
+    build = time.perf_counter() - started
+    stored = sum(len(doc.keywords) for doc in keyworded) / len(keyworded)
+    print(f"{len(docs)} chunks: {stored:.0f} keyword bytes per chunk, {build / len(docs) * 1e6:.0f} us per chunk to build")
+
+    questions = [" ".join(rng.choice(_QUESTION_WORDS) for _ in range(rng.randint(3, 9))) for _ in range(args.queries)]
+    print(f"{'pool':>5} {'scan us/q':>10} {'keywords us/q':>14} {'speedup':>8} {'agree':>7}")
+    for size in _int_list(args.pool_sizes):
+        pools = [rng.sample(range(len(docs)), min(size, len(docs))) for _ in questions]
+        scan_best = sets_best = float("inf")
+        for _ in range(args.rounds):
+            started = time.perf_counter()
+            scanned = [[_scan_score(q, docs[i]) for i in pool] for q, pool in zip(questions, pools)]
+            scan_best = min(scan_best, time.perf_counter() - started)
+            started = time.perf_counter()
+            scored = [keyword_overlap_scores(q, [keyworded[i] for i in pool]) for q, pool in zip(questions, pools)]
+            sets_best = min(sets_best, time.perf_counter() - started)
+        pairs = [(a, b) for row_a, row_b in zip(scanned, scored) for a, b in zip(row_a, row_b)]
+        agree = sum(a == b for a, b in pairs) / len(pairs)
+        print(f"{size:>5} {scan_best / len(questions) * 1e6:>10.1f} {sets_best / len(questions) * 1e6:>14.1f} "
+              f"{scan_best / sets_best:>7.1f}x {agree:>6.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
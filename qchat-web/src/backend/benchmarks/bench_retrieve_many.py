@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Batch retrieval benchmark: a loop of retrieve() calls vs one retrieve_many().
+
+Runs against a built index (--index-dir, questions embedded by the configured
+Ollama) or, by default, a synthetic index published to a temp dir and served
+by the local fake Ollama embed server (see fake_ollama.py), so the embedding
+round trip is part of the measurement like in production. The retrieval and
+query embedding caches are turned off, so every round does the full work.
+
+For each batch size it prints questions/sec of both paths and the speedup,
+and checks that retrieve_many returns the same chunks as retrieve.
+
+Usage:
+    python benchmarks/bench_retrieve_many.py [--index-dir chat/faiss_index --queries questions.txt]
+        [--chunks 5000] [--batch-sizes 1,8,32,128] [--k 6] [--rounds 3]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# measure the search itself, not the caches in front of it
+os.environ["QCHAT_RETRIEVAL_CACHE_SIZE"] = "0"
+os.environ["QCHAT_QUERY_EMBED_CACHE_SIZE"] = "0"
+os.environ.setdefault("QCHAT_INDEX_CHECK_SECONDS", "1000000")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_ollama import FakeOllama
+
+_WORDS = (
+    "quinnipiac student housing dining hall hours registrar final exam calendar tuition "
+    "financial aid library parking shuttle mount carmel york hill north haven athletics "
+    "hockey nursing law medicine career orientation advising course registration"
+).split()
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def _synthetic_index(index_dir: Path, chunks: int, seed: int) -> None:
+    import numpy as np
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+
+    from chat import RAG
+    from chat.build_telemetry import BuildTelemetry
+    from chat.url_manifest import build_params, new_manifest
+
+    rng = random.Random(seed)
+    hosts = ["www.qu.edu"] * 8 + ["law.qu.edu", "medicine.qu.edu"]
+    docs = [
+        Document(page_content=_text(rng, 120), metadata={"source": f"https://{rng.choice(hosts)}/page{i // 4}"})
+        for i in range(chunks)
+    ]
+    embeddings = RAG.OllamaEmbeddings(model=RAG.EMBED_MODEL, base_url=RAG.OLLAMA_URL)
+    vectors = np.asarray(embeddings.embed_documents([d.page_content for d in docs]), dtype=np.float32)
+    store = FAISS.from_embeddings(list(zip([d.page_content for d in docs], vectors)), embeddings,
+                                  metadatas=[d.metadata for d in docs])
+    RAG._publish(store, new_manifest(build_params(RAG.EMBED_MODEL, 1000, 200)), index_dir, BuildTelemetry())
+
+
+def _int_list(raw: str) -> list:
+    return [int(x) for x in raw.split(",") if x.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index-dir", type=Path, help="Benchmark a built index (default: synthetic)")
+    parser.add_argument("--queries", type=Path, help="Questions file, one per line (default: synthetic)")
+    parser.add_argument("--chunks", type=int, default=5000, help="Synthetic index size")
+    parser.add_argument("--batch-sizes", default="1,8,32,128")
+    parser.add_argument("--k", type=int, default=6)
+    parser.add_argument("--rounds", type=int, default=3, help="Repeats per batch size (best is kept)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    server = None
+    if args.index_dir is None:
+        server = FakeOllama(dim=256)
+        server.start()
+        os.environ["OLLAMA_URL"] = server.base_url
+    from chat import RAG
+
+    index_dir = args.index_dir
+    if index_dir is None:
+        index_dir = Path(tempfile.mkdtemp()) / "faiss_index"
+        started = time.perf_counter()
+        _synthetic_index(index_dir, args.chunks, args.seed)
+        print(f"Synthetic index: {args.chunks} chunks in {time.perf_counter() - started:.1f}s")
+    RAG.get_vector_store(index_dir)
+
+    rng = random.Random(args.seed)
+    if args.queries:
+        pool = [q.strip() for q in args.queries.read_text(encoding="utf-8").splitlines() if q.strip()]
+    else:
+        pool = [_text(rng, rng.randint(4, 10)) for _ in range(max(_int_list(args.batch_sizes)))]
+
+    print(f"{'batch':>6} {'loop q/s':>10} {'many q/s':>10} {'speedup':>8} {'same':>5}")
+    for size in _int_list(args.batch_sizes):
+        questions = [pool[i % len(pool)] for i in range(size)]
+        loop_best = many_best = float("inf")
+        for _ in range(args.rounds):
+            started = time.perf_counter()
+            looped = [RAG.retrieve(q, k=args.k) for q in questions]
+            loop_best = min(loop_best, time.perf_counter() - started)
+            started = time.perf_counter()
+            batched = RAG.retrieve_many(questions, k=args.k)
+            many_best = min(many_best, time.perf_counter() - started)
+        same = all(
+            [d.page_content for d in a] == [d.page_content for d in b] for a, b in zip(looped, batched)
+        )
+        print(f"{size:>6} {size / loop_best:>10.1f} {size / many_best:>10.1f} "
+              f"{loop_best / many_best:>7.1f}x {'yes' if same else 'NO':>5}")
+    if server is not None:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
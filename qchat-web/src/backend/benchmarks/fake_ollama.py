@@ -0,0 +1,91 @@
+"""
+Local stand-in for Ollama's /api/embed endpoint, used by the benchmarks.
+
+Vectors are deterministic bag-of-words hashes, so similar texts land near each
+other and results are repeatable. Latency is simulated as a fixed cost per
+request plus a cost per input, and only `parallel` requests are served at once
+(like OLLAMA_NUM_PARALLEL); the rest queue.
+"""
+
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Tuple
+
+
+def fake_vector(text: str, dim: int) -> List[float]:
+    vec = [0.0] * dim
+    for token in re.findall(r"[a-z0-9]+", text.lower()):
+        h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+        vec[h % dim] += 1.0 if (h >> 32) & 1 else -1.0
+    norm = math.sqrt(sum(x * x for x in vec)) or 1.0
+    return [x / norm for x in vec]
+
+
+class FakeOllama:
+    def __init__(
+        self,
+        dim: int = 256,
+        request_latency: float = 0.02,
+        item_latency: float = 0.004,
+        parallel: int = 4,
+    ):
+        self.dim = dim
+        self.request_latency = request_latency
+        self.item_latency = item_latency
+        self._slots = threading.BoundedSemaphore(max(1, parallel))
+        self.requests = 0
+        self.items = 0
+        self._server = None
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                inputs = body.get("input") or body.get("prompt") or ""
+                if isinstance(inputs, str):
+                    inputs = [inputs]
+                with fake._slots:
+                    fake.requests += 1
+                    fake.items += len(inputs)
+                    time.sleep(fake.request_latency + fake.item_latency * len(inputs))
+                vectors = [fake_vector(t, fake.dim) for t in inputs]
+                payload = {"model": body.get("model"), "embeddings": vectors}
+                if self.path.rstrip("/").endswith("/api/embeddings"):
+                    payload = {"embedding": vectors[0] if vectors else []}
+                out = json.dumps(payload).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> Tuple[str, int]:
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address[0], self._server.server_address[1]
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
@@ -0,0 +1,70 @@
+"""
+Build Reports API
+GET /api/build_reports - Recent index builds, and the newest diffed against the one before
+GET /api/build_reports?base=<run_id>&head=<run_id> - Diff of two specific builds
+"""
+
+import azure.functions as func
+import logging
+import json
+
+from chat.build_telemetry import diff_reports, list_reports, load_report
+from chat.build_worker import resolve_index_dir
+
+# reports listed in the summary
+LIST_LIMIT = 20
+
+
+def _summary(report: dict) -> dict:
+    return {
+        "run_id": report.get("run_id"),
+        "started_at": report.get("started_at"),
+        "finished_at": report.get("finished_at"),
+        "mode": report.get("mode"),
+        "result": report.get("result"),
+        "error": report.get("error"),
+        "version": report.get("version"),
+        "seconds": report.get("stages", {}).get("total"),
+        "totals": report.get("totals", {}),
+    }
+
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Index build telemetry for the admin panel
+
+    Reports are written by every build_index run to <index dir>/builds/.
+    """
+    logging.info('Build Reports API triggered')
+
+    try:
+        paths = {p.stem: p for p in list_reports(resolve_index_dir())}
+        base_id = req.params.get('base')
+        head_id = req.params.get('head')
+
+        if base_id or head_id:
+            missing = [r for r in (base_id, head_id) if r not in paths]
+            if missing:
+                return func.HttpResponse(
+                    json.dumps({"error": f"Unknown build report: {', '.join(str(m) for m in missing)}"}),
+                    status_code=404,
+                    mimetype="application/json"
+                )
+            diff = diff_reports(load_report(paths[base_id]), load_report(paths[head_id]))
+            return func.HttpResponse(json.dumps({"diff": diff}), status_code=200, mimetype="application/json")
+
+        recent = [load_report(p) for p in list(paths.values())[:LIST_LIMIT]]
+        diff = diff_reports(recent[1], recent[0]) if len(recent) >= 2 else None
+        return func.HttpResponse(
+            json.dumps({"reports": [_summary(r) for r in recent], "diff": diff}),
+            status_code=200,
+            mimetype="application/json"
+        )
+
+    except Exception as e:
+        logging.error(f"Build Reports API error: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": str(e)}),
+            status_code=500,
+            mimetype="application/json"
+        )
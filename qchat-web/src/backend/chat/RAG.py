@@ -1,23 +1,68 @@
 
 import os
+import queue
+import sys
 import time
-import time
-import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Callable, Iterable, List, Optional, Tuple
 
-import requests
-import bs4
+import faiss
+import numpy as np
 
 from env_loader import load_backend_env
 
 load_backend_env()
 
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
 from langchain_ollama import OllamaEmbeddings
 
+from .boilerplate import BOILERPLATE_ENABLED, BoilerplateStripper
+from .build_checkpoint import BuildCheckpoint, urls_fingerprint
+from .build_telemetry import BuildTelemetry
+from .console_log import _safe_log
+from .embed_client import BatchedOllamaEmbeddings
+from .embedding_cache import EMBED_CACHE_ENABLED, CachedEmbeddings
+from .mmap_store import (
+    INDEX_FILE,
+    has_compact_store,
+    load_compact_store,
+    load_editable_store,
+    write_compact_store,
+)
+from .near_dup import DEDUP_ENABLED, DEDUP_RECHECK_ROUNDS, SIMHASH_MAX_DISTANCE, NearDuplicateFilter
+from .html_extract import HTML_EXTRACTOR, get_extractor
+from .index_shards import SHARD_FALLBACK_SCORE, SHARDS_ENABLED, ShardedFAISS, route_shards, shard_view, write_shards
+from .keyword_sets import keyword_overlap_scores
+from .index_quant import FLAT_INDEX_FILE, INDEX_TYPE, apply_search_params, index_bytes, index_spec, quantize
+from .index_store import (
+    current_version,
+    discard_version,
+    publish_version,
+    resolve_current,
+    stage_version,
+    version_path,
+)
+from .mmr import MMR_ENABLED, MMR_LAMBDA, ChunkVectors, mmr_select
+from .lexical_index import HYBRID_ENABLED, LexicalIndex, reciprocal_rank_fusion, write_lexical_index
+from .retrieval_filter import SourceFilter, allowed_positions, restrict_shards, search_by_vectors
+from .query_cache import QUERY_EMBEDDINGS, RETRIEVAL_RESULTS, CachedQueryEmbeddings, normalize_question
+from .rag_fetch import PageFetcher, USER_AGENT, REQUEST_TIMEOUT, get_session
+from .url_discovery import discover_urls
+from .url_manifest import (
+    build_params,
+    chunk_ids_for,
+    content_hash,
+    load_manifest,
+    new_manifest,
+    save_manifest,
+    url_entry,
+)
+
 
 # paths
 BASE_DIR = Path(__file__).parent
@@ -26,14 +71,14 @@ DEFAULT_INDEX_DIR = BASE_DIR / "faiss_index"
 
 
 # config
-USER_AGENT = os.getenv("QCHAT_USER_AGENT", "QChatIndexer/1.0")
-REQUEST_TIMEOUT = float(os.getenv("QCHAT_REQUEST_TIMEOUT", "12"))
-SLEEP_EVERY_N = int(os.getenv("QCHAT_SLEEP_EVERY_N", "25"))
-SLEEP_SECONDS = float(os.getenv("QCHAT_SLEEP_SECONDS", "0.5"))
 CHUNK_SIZE = int(os.getenv("QCHAT_CHUNK_SIZE", "1000"))
 CHUNK_OVERLAP = int(os.getenv("QCHAT_CHUNK_OVERLAP", "150"))
 EMBED_MODEL = os.getenv("QCHAT_EMBED_MODEL", "nomic-embed-text")
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434")
+# embed this many chunks between checkpoint writes during a build
+CHECKPOINT_EVERY_CHUNKS = int(os.getenv("QCHAT_CHECKPOINT_EVERY_CHUNKS", "256"))
+# split pages allowed to wait for the embedder before fetching/splitting blocks
+PIPELINE_QUEUE_PAGES = int(os.getenv("QCHAT_PIPELINE_QUEUE_PAGES", "32"))
 
 
 # If you want to reject irrelevant retrievals in chat:
@@ -44,32 +89,12 @@ SCORE_THRESHOLD = float(os.getenv("QCHAT_SCORE_THRESHOLD", "0.9"))
 DEBUG_RETRIEVAL = os.getenv("QCHAT_DEBUG_RETRIEVAL", "false").lower() == "true"
 
 
-def _safe_log(*parts) -> None:
-    """Log text safely on Windows consoles that may default to cp1252."""
-    text = " ".join(str(p) for p in parts)
-    try:
-        print(text)
-    except UnicodeEncodeError:
-        print(text.encode("ascii", "backslashreplace").decode("ascii"))
-
-
-def _question_keywords(question: str) -> List[str]:
-    tokens = re.findall(r"[a-zA-Z0-9]+", question.lower())
-    return [t for t in tokens if len(t) >= 3]
-
-
-def _keyword_overlap_score(question: str, doc: Document) -> int:
-    keywords = _question_keywords(question)
-    if not keywords:
-        return 0
-    haystack = (doc.page_content[:1500] + " " + str(doc.metadata.get("source", ""))).lower()
-    return sum(1 for kw in set(keywords) if kw in haystack)
-
-
 def _rerank_by_keyword_overlap(question: str, docs: List[Document], k: int) -> List[Document]:
     if not docs:
         return docs
-    ranked = sorted(docs, key=lambda d: _keyword_overlap_score(question, d), reverse=True)
+    # keyword sets are precomputed per chunk at publish time (keyword_sets.py)
+    scores = keyword_overlap_scores(question, docs)
+    ranked = [doc for _, doc in sorted(zip(scores, docs), key=lambda pair: pair[0], reverse=True)]
     return ranked[:k]
 
 
@@ -94,29 +119,21 @@ def read_urls(txt_path: Path = DEFAULT_URLS_TXT) -> List[str]:
     return out
 
 # read through the url to get the text
+_EXTRACT_TEXT = None
+
+
 def _clean_html_to_text(html: str) -> str:
-    soup = bs4.BeautifulSoup(html, "html.parser")
-    # remove html elements before extracting the text
-    for tag in soup(["script", "style", "noscript"]):
-        tag.decompose()
-    # get text
-    text = soup.get_text(separator="\n", strip=True)
-    # basic whitespace cleanup (keep line breaks)
-    text = re.sub(r"[ \t]+", " ", text)
-    text = re.sub(r"\n{3,}", "\n\n", text)
-    # return cleaned text
-    return text
+    global _EXTRACT_TEXT
+    # backend picked by QCHAT_HTML_EXTRACTOR (bs4, lxml or main), resolved on first use
+    if _EXTRACT_TEXT is None:
+        _EXTRACT_TEXT = get_extractor(HTML_EXTRACTOR)
+    return _EXTRACT_TEXT(html)
 
 
-# fetch and extract visible text from usable urls, returns None if empty/unusable.
-def fetch_url_text(url: str) -> Optional[str]:
-    headers = {"User-Agent": USER_AGENT}
-    r = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT, allow_redirects=True)
-    # if blocked or forbidden skip
-    if r.status_code != 200:
-        return None
+# keep only pages with real visible text, returns None if empty/unusable.
+def _page_text_from_html(html: str) -> Optional[str]:
     # get text from the page
-    text = _clean_html_to_text(r.text)
+    text = _clean_html_to_text(html)
     # skip pages that are basically empty or likely login pages
     if not text or len(text) < 150:
         return None
@@ -128,94 +145,1008 @@ def fetch_url_text(url: str) -> Optional[str]:
     # return text
     return text
 
+
+# fetch and extract visible text from usable urls, returns None if empty/unusable.
+def fetch_url_text(url: str) -> Optional[str]:
+    r = get_session().get(url, timeout=REQUEST_TIMEOUT, allow_redirects=True)
+    # if blocked or forbidden skip
+    if r.status_code != 200:
+        return None
+    return _page_text_from_html(r.text)
+
+# embeddings used while building: batched/concurrent against Ollama, and cached on
+# disk so unchanged chunks skip Ollama entirely
+def _build_embeddings() -> Embeddings:
+    embeddings = BatchedOllamaEmbeddings(model=EMBED_MODEL, base_url=OLLAMA_URL)
+    if EMBED_CACHE_ENABLED:
+        return CachedEmbeddings(embeddings, EMBED_MODEL)
+    return embeddings
+
+
+def _finish_build_embeddings(embeddings: Embeddings, telemetry: BuildTelemetry) -> None:
+    client = embeddings.inner if isinstance(embeddings, CachedEmbeddings) else embeddings
+    stats = {}
+    if isinstance(client, BatchedOllamaEmbeddings):
+        _safe_log(client.report())
+        stats.update(
+            requests=client.batches, chunks=client.chunks, retried=client.retried,
+            seconds=round(client.elapsed, 3),
+        )
+    if isinstance(embeddings, CachedEmbeddings):
+        stats.update(cache_hits=embeddings.cache.hits, cache_misses=embeddings.cache.misses)
+        embeddings.cache.evict()
+        _safe_log(embeddings.cache.report())
+        embeddings.cache.close()
+    telemetry.set(embedding=stats)
+
+
+def _new_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+    )
+
+
+def _checkpoint_dir(index_dir: Path) -> Path:
+    configured = (os.getenv("QCHAT_CHECKPOINT_DIR") or "").strip()
+    return Path(configured) if configured else index_dir / "checkpoint"
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:
+        # Windows: psutil reports the peak working set when it is installed
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+        except Exception:
+            return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
 # build faiss index and save to disk, returns num_pages_ingested and num_chunks
-def build_index(urls_txt: Path = DEFAULT_URLS_TXT, index_dir: Path = DEFAULT_INDEX_DIR, max_urls: Optional[int] = None,) -> Tuple[int, int]:
-    # get urls
-    urls = read_urls(urls_txt)
+def build_index(
+    urls_txt: Path = DEFAULT_URLS_TXT,
+    index_dir: Path = DEFAULT_INDEX_DIR,
+    max_urls: Optional[int] = None,
+    incremental: bool = False,
+    resume: bool = True,
+    sitemaps: Optional[List[str]] = None,
+    on_progress: Optional[Callable[[dict], None]] = None,
+) -> Tuple[int, int]:
+    # timings and per-URL outcomes, written to index_dir/builds/ however the run ends;
+    # on_progress gets BuildTelemetry.progress() (stage, percent, ETA) as the build moves
+    telemetry = BuildTelemetry(on_progress=on_progress)
+    try:
+        result = _build_index(urls_txt, index_dir, max_urls, incremental, resume, sitemaps, telemetry)
+    except BaseException as e:
+        telemetry.finish("failed", e)
+        raise
+    else:
+        pages, chunks = result
+        telemetry.finish(
+            "published" if telemetry.report["version"] else "up_to_date",
+            pages=pages, chunks=chunks, peak_rss_mb=round(_peak_rss_mb() or 0, 1) or None,
+        )
+    finally:
+        try:
+            path = telemetry.write(index_dir)
+            _safe_log(f"[RAG] Build report: {path}")
+        except OSError as e:
+            _safe_log(f"[RAG] Could not write build report: {e!r}")
+    return result
+
+
+def _build_index(
+    urls_txt: Path,
+    index_dir: Path,
+    max_urls: Optional[int],
+    incremental: bool,
+    resume: bool,
+    sitemaps: Optional[List[str]],
+    telemetry: BuildTelemetry,
+) -> Tuple[int, int]:
+    # get urls: canonical seed list plus sitemap pages (QCHAT_SITEMAPS unless given)
+    with telemetry.stage("discover"):
+        discovery = discover_urls(read_urls(urls_txt), sitemaps)
+    _safe_log(discovery.report())
+    urls = discovery.urls
     if max_urls is not None:
         urls = urls[:max_urls]
 
-    embeddings = OllamaEmbeddings(model=EMBED_MODEL, base_url=OLLAMA_URL)
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE,
-        chunk_overlap=CHUNK_OVERLAP,
+    params = build_params(
+        EMBED_MODEL, CHUNK_SIZE, CHUNK_OVERLAP,
+        dedup_distance=SIMHASH_MAX_DISTANCE if DEDUP_ENABLED else None,
+        strip_boilerplate=BOILERPLATE_ENABLED,
+        html_extractor=HTML_EXTRACTOR,
     )
-    # to store all url info
-    docs: List[Document] = []
-    ok = 0
-    # loop through each url and build index
-    _safe_log(f"[RAG] Building index from {len(urls)} URLs...")
-    for i, url in enumerate(urls):
+    previous = None
+    live_dir, live_version = None, None
+    if incremental:
+        live_dir, live_version = resolve_current(index_dir)
+        previous = load_manifest(live_dir) if live_dir else None
+        if previous is None:
+            _safe_log("[RAG] No usable url manifest/index found, falling back to a full build.")
+        elif previous.get("params") != params:
+            _safe_log("[RAG] Embed model or chunk settings changed, falling back to a full build.")
+            previous = None
+
+    # progress is checkpointed per URL; a rerun of the same build resumes from it
+    checkpoint = BuildCheckpoint(
+        _checkpoint_dir(index_dir),
+        {
+            "mode": "incremental" if previous else "full",
+            "params": params,
+            "urls": urls_fingerprint(urls),
+            "base_version": live_version if previous else None,
+        },
+        resume=resume,
+    )
+    if checkpoint.resumed:
+        _safe_log(f"[RAG] Resuming interrupted build from checkpoint: {checkpoint.root}")
+    telemetry.set(
+        mode="incremental" if previous else "full",
+        resumed=checkpoint.resumed,
+        base_version=live_version if previous else None,
+        params=dict(params),
+    )
+
+    if previous:
+        result = _build_incremental(urls, index_dir, live_dir, previous, checkpoint, telemetry, discovery.lastmod)
+    else:
+        result = _build_full(urls, index_dir, params, checkpoint, telemetry, discovery.lastmod)
+    checkpoint.clear()
+    peak = _peak_rss_mb()
+    _safe_log(f"[RAG] Peak RSS during build: {f'{peak:.0f} MB' if peak is not None else 'n/a'}")
+    return result
+
+
+# what one fetch means for the build; None = transient failure (not recorded, retried on resume)
+def _page_record(result, old: Optional[dict]) -> Optional[dict]:
+    if result.not_modified and old:
+        return {
+            "state": "unchanged",
+            "etag": result.etag or old.get("etag"),
+            "last_modified": result.last_modified or old.get("last_modified"),
+        }
+    page_text = _page_text_from_html(result.html) if result.ok else None
+    if page_text:
+        if old and old["content_hash"] == content_hash(page_text):
+            return {"state": "unchanged", "etag": result.etag, "last_modified": result.last_modified}
+        return {"state": "page", "text": page_text, "etag": result.etag, "last_modified": result.last_modified}
+    if result.ok or result.status in (404, 410):
+        # page is gone or no longer has usable text
+        return {"state": "gone"}
+    if old:
+        _safe_log(f"[RAG] fetch failed, keeping previous chunks: {result.url} | {result.error or result.status}")
+    elif result.error:
+        # if you cant fetch content from the url
+        _safe_log(f"[RAG] fetch failed: {result.url} | {result.error}")
+    return None
+
+
+class _IndexWriter(threading.Thread):
+    """Embed/index side of the build pipeline.
+
+    Takes split pages off a bounded queue, embeds them in batches of about
+    CHECKPOINT_EVERY_CHUNKS chunks, checkpoints the vectors and adds them to
+    the store. When the queue is full, the fetch/split side blocks.
+    """
+
+    def __init__(self, checkpoint: BuildCheckpoint, telemetry: BuildTelemetry, load_store, replaced: dict):
+        super().__init__(name="qchat-index-writer", daemon=True)
+        self.queue = queue.Queue(maxsize=PIPELINE_QUEUE_PAGES)
+        self.checkpoint = checkpoint
+        self.telemetry = telemetry
+        self.store: Optional[FAISS] = None
+        self._load_store = load_store
+        # url -> chunk ids the page had in the previous index (deleted when it is re-added)
+        self._replaced = dict(replaced)
+        self.entries = {}
+        self.error: Optional[BaseException] = None
+        self.deleted = 0
+        self._embeddings: Optional[Embeddings] = None
+
+    def submit(self, url: Optional[str], chunks: Optional[dict] = None, embedded: bool = False) -> None:
+        while True:
+            if self.error is not None:
+                raise self.error
+            try:
+                self.queue.put((url, chunks, embedded), timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def close(self) -> None:
+        self.submit(None)
+        self.join()
+        if self.error is not None:
+            raise self.error
+
+    def run(self) -> None:
         try:
-            # get text from the url
-            page_text = fetch_url_text(url)
-            if not page_text:
+            batch, batch_chunks = [], 0
+            while True:
+                url, chunks, embedded = self.queue.get()
+                if url is None:
+                    break
+                if not chunks["texts"]:
+                    # every chunk was a duplicate; keep the page in the manifest only
+                    self._add([(url, chunks, [])])
+                    continue
+                if embedded:
+                    # finished in an earlier run: replay straight from the checkpoint
+                    vectors = self.checkpoint.vectors(url, len(chunks["texts"]))
+                    if vectors is not None:
+                        self._add([(url, chunks, vectors)])
+                        continue
+                batch.append((url, chunks))
+                batch_chunks += len(chunks["texts"])
+                if batch_chunks >= CHECKPOINT_EVERY_CHUNKS:
+                    self._embed(batch)
+                    batch, batch_chunks = [], 0
+            if batch:
+                self._embed(batch)
+        except BaseException as e:
+            self.error = e
+            # unblock a producer waiting on a full queue
+            while not self.queue.empty():
+                self.queue.get_nowait()
+        finally:
+            if self._embeddings is not None:
+                _finish_build_embeddings(self._embeddings, self.telemetry)
+
+    def _embed(self, batch: list) -> None:
+        if self._embeddings is None:
+            self._embeddings = _build_embeddings()
+        texts = [t for _, chunks in batch for t in chunks["texts"]]
+        started = time.perf_counter()
+        vectors = self._embeddings.embed_documents(texts)
+        self.telemetry.embed_batch(len(batch), len(texts), time.perf_counter() - started)
+        pages, offset = [], 0
+        for url, chunks in batch:
+            count = len(chunks["texts"])
+            page_vectors = vectors[offset:offset + count]
+            offset += count
+            self.checkpoint.save_vectors(url, page_vectors)
+            pages.append((url, chunks, page_vectors))
+        self._add(pages)
+
+    def _add(self, pages: list) -> None:
+        with self.telemetry.stage("index_add"):
+            self._add_pages(pages)
+
+    def _add_pages(self, pages: list) -> None:
+        text_embeddings, metadatas, ids, delete_ids = [], [], [], []
+        for url, chunks, vectors in pages:
+            text_embeddings.extend(zip(chunks["texts"], vectors))
+            metadatas.extend({"source": url} for _ in chunks["texts"])
+            ids.extend(chunks["ids"])
+            delete_ids.extend(self._replaced.pop(url, []))
+            self.entries[url] = url_entry(
+                chunks["page_hash"], chunks["ids"], chunks.get("etag"), chunks.get("last_modified"),
+                chunks.get("fingerprints"), chunks.get("lastmod"), chunks.get("dup_of"),
+            )
+            self.telemetry.url(url, chunks=len(chunks["ids"]))
+            self.telemetry.url_done(url)
+        if self.store is None:
+            self.store = self._load_store()
+        if delete_ids:
+            self.store.delete(delete_ids)
+            self.deleted += len(delete_ids)
+        if not text_embeddings:
+            return
+        if self.store is None:
+            self.store = FAISS.from_embeddings(
+                text_embeddings,
+                OllamaEmbeddings(model=EMBED_MODEL, base_url=OLLAMA_URL),
+                metadatas=metadatas,
+                ids=ids,
+            )
+        else:
+            self.store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+
+
+# streaming build: fetch -> clean -> split -> embed -> add, one page at a time with
+# bounded hand-offs, so memory does not grow with the number of URLs
+def _run_pipeline(
+    urls: List[str],
+    checkpoint: BuildCheckpoint,
+    telemetry: BuildTelemetry,
+    entries: dict,
+    load_store,
+    boilerplate: Optional[BoilerplateStripper] = None,
+    lastmod: Optional[dict] = None,
+):
+    lastmod = lastmod or {}
+    writer = _IndexWriter(checkpoint, telemetry, load_store, {u: e["chunk_ids"] for u, e in entries.items()})
+    writer.start()
+    splitter = _new_splitter()
+    outcomes = {}
+    fetcher = PageFetcher()
+    # drop chunks that (nearly) repeat one already kept, before they are embedded
+    dedup = NearDuplicateFilter() if DEDUP_ENABLED else None
+    if dedup:
+        for url, entry in entries.items():
+            dedup.seed(url, entry.get("fingerprints", []))
+
+    def route(url: str, record: dict) -> None:
+        telemetry.url(url, state=record["state"])
+        if record["state"] != "page":
+            outcomes[url] = record
+            if record["state"] == "unchanged" and url in entries:
+                telemetry.url(url, chunks=len(entries[url]["chunk_ids"]))
+            telemetry.url_done(url)
+            return
+        if boilerplate is None:
+            split(url, record)
+            return
+        # held back until the host's boilerplate lines are learned
+        for ready_url, ready_record in boilerplate.add(url, record["text"], record):
+            split(ready_url, ready_record)
+
+    def split(url: str, record: dict) -> None:
+        # hash the unstripped text, so unchanged detection doesn't depend on learned rules
+        page_hash = content_hash(record["text"])
+        texts = splitter.split_text(record["text"])
+        if boilerplate is not None:
+            stripped = boilerplate.strip(url, record["text"])
+            chunks_before = len(texts)
+            if stripped != record["text"]:
+                texts = splitter.split_text(stripped)
+            boilerplate.record(record["text"], stripped, chunks_before, len(texts))
+        fingerprints, dup_of = [], []
+        if dedup:
+            texts, fingerprints, dup_of = dedup.filter(url, texts)
+        chunks = {
+            "page_hash": page_hash,
+            "ids": chunk_ids_for(url, page_hash, len(texts)),
+            "texts": texts,
+            "fingerprints": fingerprints,
+            "dup_of": dup_of,
+            "lastmod": lastmod.get(url),
+            "etag": record.get("etag"),
+            "last_modified": record.get("last_modified"),
+        }
+        checkpoint.save_chunks(url, chunks)
+        writer.submit(url, chunks)
+
+    try:
+        to_fetch = []
+        for url in urls:
+            if checkpoint.has_chunks(url):
+                chunks = checkpoint.chunks(url)
+                if boilerplate is not None:
+                    page = checkpoint.page(url)
+                    if page and page.get("state") == "page":
+                        boilerplate.observe(url, page["text"])
+                if dedup:
+                    dedup.remember(url, chunks["texts"], chunks.get("fingerprints", []), chunks.get("dup_of", []))
+                telemetry.url(url, state="resumed")
+                writer.submit(url, chunks, checkpoint.has_vectors(url))
+            elif checkpoint.has_page(url):
+                route(url, checkpoint.page(url))
+            elif _lastmod_unchanged(entries.get(url), lastmod.get(url)):
+                # sitemap says the page hasn't changed since it was fetched: no request at all
+                record = {
+                    "state": "unchanged",
+                    "etag": entries[url].get("etag"),
+                    "last_modified": entries[url].get("last_modified"),
+                }
+                checkpoint.save_page(url, record)
+                telemetry.url(url, skipped="lastmod")
+                route(url, record)
+            else:
+                to_fetch.append(url)
+        if len(to_fetch) < len(urls):
+            _safe_log(f"[RAG] {len(urls) - len(to_fetch)} URLs checkpointed or unchanged by lastmod, fetching {len(to_fetch)}")
+        validators = {
+            u: (entries[u].get("etag"), entries[u].get("last_modified"))
+            for u in to_fetch if u in entries
+        }
+        for result in fetcher.fetch_all(to_fetch, validators):
+            telemetry.fetched(result)
+            record = _page_record(result, entries.get(result.url))
+            if record is None:
+                telemetry.url(result.url, state="failed")
+                telemetry.url_done(result.url)
                 continue
-            # add content to docs
-            docs.append(Document(page_content=page_text, metadata={"source": url}))
-            ok += 1
-        # if you cant fetch content from the url
-        except Exception as e:
-            _safe_log(f"[RAG] fetch failed: {url} | {repr(e)}")
-        # sleep
-        if SLEEP_EVERY_N and (i + 1) % SLEEP_EVERY_N == 0:
-            time.sleep(SLEEP_SECONDS)
+            checkpoint.save_page(result.url, record)
+            route(result.url, record)
+        telemetry.add_seconds("fetch", fetcher.elapsed)
+        if boilerplate is not None:
+            for url, record in boilerplate.flush():
+                split(url, record)
+    except BaseException:
+        if writer.error is None:
+            try:
+                writer.close()
+            except BaseException:
+                pass
+        raise
+    writer.close()
+    if boilerplate is not None:
+        _safe_log(boilerplate.report())
+    if dedup:
+        _safe_log(dedup.report())
+        counts = {"chunks_checked": dedup.checked, "exact_removed": dedup.exact_removed,
+                  "near_removed": dedup.near_removed}
+        # a recheck pass (_recheck_dependents) adds to the main pass's counts
+        earlier = telemetry.report.get("dedup") or {}
+        telemetry.set(dedup={k: v + earlier.get(k, 0) for k, v in counts.items()})
+    return writer, outcomes, fetcher, (dedup.stale if dedup else {})
+
+
+def _lastmod_unchanged(entry: Optional[dict], lastmod: Optional[str]) -> bool:
+    return bool(entry and lastmod and entry.get("lastmod") and lastmod <= entry["lastmod"])
+
+
+# write the vectors as QCHAT_INDEX_TYPE (one index, or one per domain shard); a quantized
+# or sharded index keeps the exact vectors in flat.faiss for incremental builds to edit
+def _write_index_files(store: FAISS, staged: Path) -> dict:
+    if SHARDS_ENABLED:
+        spec = write_shards(store, staged)
+        faiss.write_index(store.index, str(staged / FLAT_INDEX_FILE))
+        _safe_log("[RAG] Index shards: " + ", ".join(
+            f"{name} {shard['ntotal']} ({shard['factory']})" for name, shard in spec["shards"].items()
+        ))
+        return spec
+    spec = index_spec(store.index.ntotal, store.index.d)
+    if spec.get("fallback_reason"):
+        _safe_log(f"[RAG] Keeping a flat index instead of {spec['requested']}: {spec['fallback_reason']}")
+    if spec["type"] == "flat":
+        faiss.write_index(store.index, str(staged / INDEX_FILE))
+        return spec
+    index = quantize(store.index, spec)
+    faiss.write_index(store.index, str(staged / FLAT_INDEX_FILE))
+    faiss.write_index(index, str(staged / INDEX_FILE))
+    _safe_log(
+        f"[RAG] Index type {spec['type']} ({spec['factory']}): {index_bytes(index) / 1e6:.1f} MB "
+        f"vs {index_bytes(store.index) / 1e6:.1f} MB flat, trained in {spec['train_seconds']:.1f}s"
+    )
+    return spec
+
+
+def _index_params(spec: dict) -> dict:
+    # the settings part of an index spec (no sizes or timings), for build reports
+    params = {k: spec[k] for k in ("type", "factory", "nprobe") if k in spec}
+    if spec.get("sharded"):
+        params["shards"] = {name: _index_params(shard) for name, shard in spec["shards"].items()}
+    return params
+
+
+# write a finished build into a fresh version dir, then atomically make it current
+def _publish(store: FAISS, manifest: dict, index_dir: Path, telemetry: BuildTelemetry) -> str:
+    staged = stage_version(index_dir)
+    try:
+        with telemetry.stage("publish"):
+            spec = _write_index_files(store, staged)
+            shards = {name: shard["type"] for name, shard in spec.get("shards", {}).items()}
+            write_compact_store(store, staged, spec["type"], shards)
+            with telemetry.stage("lexical"):
+                lexical = write_lexical_index(store, staged)
+            save_manifest(staged, dict(manifest, index=spec))
+            version = publish_version(index_dir, staged)
+    except Exception:
+        discard_version(staged)
+        raise
+    if "train_seconds" in spec:
+        telemetry.add_seconds("quantize", spec["train_seconds"])
+    telemetry.report["params"]["index"] = _index_params(spec)
+    telemetry.set(version=version)
+    _safe_log(f"[RAG] BM25 index: {lexical['terms']} terms, {lexical['postings']} postings")
+    _safe_log(f"[RAG] Published FAISS index version {version} to: {index_dir}")
+    return version
+
+
+def _build_full(
+    urls: List[str],
+    index_dir: Path,
+    params: dict,
+    checkpoint: BuildCheckpoint,
+    telemetry: BuildTelemetry,
+    lastmod: Optional[dict] = None,
+) -> Tuple[int, int]:
+    _safe_log(f"[RAG] Building index from {len(urls)} URLs...")
+    boilerplate = BoilerplateStripper() if BOILERPLATE_ENABLED else None
+    with telemetry.stage("pipeline"):
+        telemetry.expect_urls(len(urls))
+        writer, _, fetcher, _ = _run_pipeline(urls, checkpoint, telemetry, {}, lambda: None, boilerplate, lastmod)
     # error handeling
-    if not docs:
+    if writer.store is None:
         raise RuntimeError("[RAG] No documents ingested. Check URLs and scraping access.")
-    # split into chunks
-    splits = splitter.split_documents(docs)
-    _safe_log(f"[RAG] Ingested pages: {ok} | Chunks: {len(splits)}")
-    # build + save
-    store = FAISS.from_documents(splits, embeddings)
-    index_dir.mkdir(parents=True, exist_ok=True)
-    store.save_local(str(index_dir))
-    _safe_log(f"[RAG] Saved FAISS index to: {index_dir}")
+    manifest = new_manifest(params)
+    manifest["urls"] = {u: writer.entries[u] for u in urls if u in writer.entries}
+    manifest["boilerplate"] = boilerplate.rules() if boilerplate else {}
+    chunks = writer.store.index.ntotal
+    _safe_log(f"[RAG] Ingested pages: {len(manifest['urls'])} | Chunks: {chunks} | Fetch rate: {fetcher.pages_per_sec:.2f} pages/sec")
+    _publish(writer.store, manifest, index_dir, telemetry)
     # return num_pages_ingested and num_chunks
-    return ok, len(splits)
+    return len(manifest["urls"]), chunks
+
+
+def _build_incremental(
+    urls: List[str],
+    index_dir: Path,
+    live_dir: Path,
+    previous: dict,
+    checkpoint: BuildCheckpoint,
+    telemetry: BuildTelemetry,
+    lastmod: Optional[dict] = None,
+) -> Tuple[int, int]:
+    """Re-embed only pages whose content changed since the manifest was written."""
+    entries = dict(previous["urls"])
+    _safe_log(f"[RAG] Incremental rebuild over {len(urls)} URLs ({sum(1 for u in urls if u in entries)} known)...")
+    # hosts keep the boilerplate lines learned by the full build; new hosts learn their own
+    boilerplate = BoilerplateStripper(previous.get("boilerplate")) if BOILERPLATE_ENABLED else None
+    with telemetry.stage("pipeline"):
+        telemetry.expect_urls(len(urls))
+        writer, outcomes, fetcher, stale = _run_pipeline(
+            urls, checkpoint, telemetry, entries, lambda: load_index(live_dir, editable=True), boilerplate, lastmod
+        )
+
+    url_set = set(urls)
+    dropped = [u for u in entries if u not in url_set]
+    unchanged = 0
+    for url, record in outcomes.items():
+        if url not in entries:
+            continue
+        if record["state"] == "unchanged":
+            # same text (304 or equal hash); just remember the newest validators
+            entries[url] = dict(
+                entries[url],
+                etag=record.get("etag"),
+                last_modified=record.get("last_modified"),
+                lastmod=(lastmod or {}).get(url) or entries[url].get("lastmod"),
+            )
+            unchanged += 1
+        elif record["state"] == "gone":
+            dropped.append(url)
+    _safe_log(
+        f"[RAG] Pages unchanged: {unchanged} | changed/new: {len(writer.entries)} | removed: {len(dropped)} "
+        f"| Fetch rate: {fetcher.pages_per_sec:.2f} pages/sec"
+    )
+    previous_index = previous.get("index") or {}
+    requantize = (
+        previous_index.get("requested", previous_index.get("type", "flat")) != INDEX_TYPE
+        or bool(previous_index.get("sharded")) != SHARDS_ENABLED
+    )
+    if not writer.entries and not dropped and not requantize:
+        # validators may still have moved on, so keep the manifest current
+        save_manifest(live_dir, dict(previous, urls=entries))
+        telemetry.report["params"]["index"] = _index_params(previous_index or {"type": "flat", "factory": "Flat"})
+        _safe_log("[RAG] Index is up to date, no vectors changed.")
+        return len(entries), sum(len(e["chunk_ids"]) for e in entries.values())
+
+    store = writer.store or load_index(live_dir, editable=True)
+    delete_ids: List[str] = []
+    for url in dropped:
+        delete_ids.extend(entries.pop(url)["chunk_ids"])
+    entries.update(writer.entries)
+    if not entries:
+        raise RuntimeError("[RAG] No documents left after incremental update. Check URLs and scraping access.")
+    if delete_ids:
+        store.delete(delete_ids)
+    embedded = sum(len(e["chunk_ids"]) for e in writer.entries.values())
+    deleted = writer.deleted + len(delete_ids)
+    with telemetry.stage("pipeline"):
+        rechecked = _recheck_dependents(
+            entries, set(writer.entries) | set(dropped), stale, store, checkpoint, telemetry, boilerplate, lastmod
+        )
+    embedded, deleted = embedded + rechecked[0], deleted + rechecked[1]
+    _safe_log(f"[RAG] Re-embedded {embedded} chunks, deleted {deleted}")
+    manifest = dict(previous, urls=entries)
+    if boilerplate is not None:
+        manifest["boilerplate"] = boilerplate.rules()
+    _publish(store, manifest, index_dir, telemetry)
+    return len(entries), store.index.ntotal
+
+
+# a page's near-duplicate chunks are only in the index on the page that kept them
+# (its "dup_of"); when that page changed or was removed, split the page again
+def _recheck_dependents(
+    entries: dict,
+    changed: set,
+    stale: dict,
+    store: FAISS,
+    checkpoint: BuildCheckpoint,
+    telemetry: BuildTelemetry,
+    boilerplate: Optional[BoilerplateStripper],
+    lastmod: Optional[dict],
+) -> Tuple[int, int]:
+    """Fetch and split again the pages whose dropped duplicates went with a changed page.
+
+    Updates entries and store in place; returns (chunks embedded, chunks deleted).
+    Pages split in a pass only count the matches against the previous index (stale),
+    the ones against chunks kept in the same pass are current.
+    """
+    embedded = deleted = 0
+    for round_no in range(1, DEDUP_RECHECK_ROUNDS + 1):
+        recheck = [
+            url for url, entry in entries.items()
+            if (stale[url] if url in stale else set(entry.get("dup_of", []))) & (changed - {url})
+        ]
+        if not recheck:
+            break
+        _safe_log(f"[RAG] Re-splitting {len(recheck)} pages whose duplicate chunks were on changed or removed pages")
+        # no validators, lastmod or hash: fetched and split even though they did not change
+        forced = dict(entries)
+        for url in recheck:
+            forced[url] = dict(entries[url], etag=None, last_modified=None, lastmod=None, content_hash=None)
+        writer, outcomes, _, stale = _run_pipeline(
+            recheck, checkpoint.nested(f"recheck-{round_no}"), telemetry, forced, lambda: store, boilerplate, lastmod
+        )
+        gone = [url for url, record in outcomes.items() if record["state"] == "gone"]
+        delete_ids = [chunk_id for url in gone for chunk_id in entries.pop(url)["chunk_ids"]]
+        if delete_ids:
+            store.delete(delete_ids)
+        entries.update(writer.entries)
+        embedded += sum(len(e["chunk_ids"]) for e in writer.entries.values())
+        deleted += writer.deleted + len(delete_ids)
+        changed = set(writer.entries) | set(gone)
+    else:
+        _safe_log(f"[RAG] Stopped re-splitting duplicate-dependent pages after {DEDUP_RECHECK_ROUNDS} rounds")
+    return embedded, deleted
 
 
-# load the faiss index from disk
-def load_index(index_dir: Path = DEFAULT_INDEX_DIR) -> FAISS:
-    embeddings = OllamaEmbeddings(model=EMBED_MODEL, base_url=OLLAMA_URL)
-    return FAISS.load_local(
-        str(index_dir),
+# load the faiss index from disk (the current version, or the given version dir);
+# workers get a read-only store over the memory-mapped compact files (shared page
+# cache across processes, texts decoded per hit), editable=True loads a private
+# in-memory copy with the exact flat vectors, for builds to modify
+def load_index(
+    index_dir: Path = DEFAULT_INDEX_DIR,
+    embeddings: Optional[Embeddings] = None,
+    editable: bool = False,
+) -> FAISS:
+    if embeddings is None:
+        embeddings = OllamaEmbeddings(model=EMBED_MODEL, base_url=OLLAMA_URL)
+        if not editable:
+            # chat workers: repeated questions reuse their embedding
+            embeddings = CachedQueryEmbeddings(embeddings, EMBED_MODEL)
+    live_dir, _ = resolve_current(index_dir)
+    folder = live_dir or index_dir
+    if has_compact_store(folder):
+        if editable:
+            flat = FLAT_INDEX_FILE if (folder / FLAT_INDEX_FILE).exists() else INDEX_FILE
+            return load_editable_store(folder, embeddings, flat)
+        store = load_compact_store(folder, embeddings)
+        if store is not None:
+            apply_search_params(store.index)
+            store.lexical_index = LexicalIndex.load(folder)
+            store.chunk_vectors = ChunkVectors.load(folder, store.index) if MMR_ENABLED else None
+            return store
+    # versions published before the compact docstore
+    store = FAISS.load_local(
+        str(folder),
         embeddings,
         allow_dangerous_deserialization=True,
     )
+    if editable and (folder / FLAT_INDEX_FILE).exists():
+        store.index = faiss.read_index(str(folder / FLAT_INDEX_FILE))
+    else:
+        apply_search_params(store.index)
+    return store
 
 
-# cache vector store per process (fast for Azure Functions)
+# cache vector store per process (fast for Azure Functions); swapped in place when a
+# newer index version is published, so callers holding the old one finish on it
 _VECTOR_STORE: Optional[FAISS] = None
+_VECTOR_STORE_VERSION: Optional[str] = None
+_STORE_LOCK = threading.Lock()
+_RELOADING = False
+_LAST_VERSION_CHECK = 0.0
+# how often (seconds) get_vector_store looks at CURRENT for a newer build
+INDEX_CHECK_SECONDS = float(os.getenv("QCHAT_INDEX_CHECK_SECONDS", "30"))
+
+
+def _reload_in_background(index_dir: Path, version: str) -> None:
+    global _VECTOR_STORE, _VECTOR_STORE_VERSION, _RELOADING
+    try:
+        store = load_index(version_path(index_dir, version))
+        with _STORE_LOCK:
+            _VECTOR_STORE = store
+            _VECTOR_STORE_VERSION = version
+        # results of the old version can no longer be hit (the version is in the key); free them
+        RETRIEVAL_RESULTS.clear()
+        _safe_log(f"[RAG] FAISS index hot-reloaded: version {version}")
+    except Exception as e:
+        _safe_log(f"[RAG] FAISS index reload failed for version {version}: {repr(e)}")
+    finally:
+        _RELOADING = False
+
+
+def _check_for_new_version(index_dir: Path) -> None:
+    global _LAST_VERSION_CHECK, _RELOADING
+    now = time.monotonic()
+    if _RELOADING or now - _LAST_VERSION_CHECK < INDEX_CHECK_SECONDS:
+        return
+    with _STORE_LOCK:
+        if _RELOADING or now - _LAST_VERSION_CHECK < INDEX_CHECK_SECONDS:
+            return
+        _LAST_VERSION_CHECK = now
+        version = current_version(index_dir)
+        if version is None or version == _VECTOR_STORE_VERSION:
+            return
+        _RELOADING = True
+    threading.Thread(
+        target=_reload_in_background,
+        args=(index_dir, version),
+        name="qchat-index-reload",
+        daemon=True,
+    ).start()
 
 
 # get vector store
 def get_vector_store(index_dir: Path = DEFAULT_INDEX_DIR) -> FAISS:
-    global _VECTOR_STORE
+    global _VECTOR_STORE, _VECTOR_STORE_VERSION, _LAST_VERSION_CHECK
     if _VECTOR_STORE is None:
-        if not index_dir.exists():
-            raise FileNotFoundError(
-                f"[RAG] FAISS index not found at {index_dir}. "
-                f"Run build_index() first (nightly job) or build locally."
-            )
-        _VECTOR_STORE = load_index(index_dir)
-        _safe_log("[RAG] FAISS index loaded.")
+        with _STORE_LOCK:
+            if _VECTOR_STORE is None:
+                live_dir, version = resolve_current(index_dir)
+                if live_dir is None:
+                    raise FileNotFoundError(
+                        f"[RAG] FAISS index not found at {index_dir}. "
+                        f"Run build_index() first (nightly job) or build locally."
+                    )
+                _VECTOR_STORE = load_index(live_dir)
+                _VECTOR_STORE_VERSION = version
+                _LAST_VERSION_CHECK = time.monotonic()
+                _safe_log(f"[RAG] FAISS index loaded (version {version}).")
+        return _VECTOR_STORE
+    _check_for_new_version(index_dir)
     return _VECTOR_STORE
 
 
-def retrieve(question: str, k: int = 6) -> List[Document]:
-    store = get_vector_store()
+def get_index_version() -> Optional[str]:
+    """Version of the index this process is currently serving (None before first load)."""
+    return _VECTOR_STORE_VERSION
+
+
+def embed_question(question: str) -> Tuple[List[float], Optional[str]]:
+    """Embedding of a question (through the query embedding cache) and the index version serving it."""
+    get_vector_store()
+    with _STORE_LOCK:
+        store, version = _VECTOR_STORE, _VECTOR_STORE_VERSION
+    return store.embedding_function.embed_query(question), version
+
+
+def retrieval_cache_stats() -> dict:
+    """Hit rates and sizes of this process's retrieval caches (for the health action)."""
+    return {
+        "indexVersion": _VECTOR_STORE_VERSION,
+        "queryEmbeddings": QUERY_EMBEDDINGS.stats(),
+        "retrievalResults": RETRIEVAL_RESULTS.stats(),
+    }
+
+
+# hybrid search: BM25 side of retrieve(), run next to the vector search
+_LEXICAL_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="qchat-bm25")
+
+
+def _lexical_candidates(
+    store: FAISS,
+    lexical: LexicalIndex,
+    question: str,
+    k: int,
+    shards: Optional[List[str]],
+    source_filter: Optional[SourceFilter],
+) -> List[Document]:
+    docs = []
+    for position, _ in lexical.search(question, k, allowed_positions(store, shards, source_filter)):
+        doc = store.docstore.search(store.index_to_docstore_id[position])
+        if isinstance(doc, Document):
+            docs.append(doc)
+    return docs
+
+
+# reciprocal rank fusion of candidate lists (vector first), keeping one doc per key
+def _fuse_rankings(rankings: List[List[Document]], key: Callable[[Document], str]) -> List[Document]:
+    by_key = {}
+    keyed = []
+    for docs in rankings:
+        for doc in docs:
+            by_key.setdefault(key(doc), doc)
+        keyed.append(list(dict.fromkeys(key(doc) for doc in docs)))
+    return [by_key[k] for k in reciprocal_rank_fusion(keyed)]
+
+
+def _doc_vectors(store: FAISS, docs: List[Document]) -> Optional[np.ndarray]:
+    chunk_vectors = getattr(store, "chunk_vectors", None)
+    if chunk_vectors is None or not docs:
+        return None
+    positions = store.docstore.positions([doc.id for doc in docs])
+    if any(p is None for p in positions):
+        return None
+    return chunk_vectors.get(positions)
+
+
+def select_diverse(
+    docs: List[Document],
+    relevance: List[float],
+    k: int,
+    lambda_mult: float = MMR_LAMBDA,
+    store: Optional[FAISS] = None,
+) -> Optional[List[int]]:
+    """Indices of k docs picked by MMR over their embeddings, or None if the index has no vectors for them."""
+    if store is None:
+        store = get_vector_store()
+    vectors = _doc_vectors(store, docs)
+    if vectors is None:
+        return None
+    return mmr_select(relevance, vectors, k, lambda_mult)
+
+
+# the k to return from the reranked candidates: MMR over the best 2k, with rank as relevance
+# (QCHAT_MMR_LAMBDA=1 keeps the rerank order)
+def _pick_diverse(store: FAISS, ranked: List[Document], k: int) -> List[Document]:
+    pool = ranked[: 2 * k]
+    if len(pool) <= 1:
+        return pool
+    picks = select_diverse(pool, [1 - i / len(pool) for i in range(len(pool))], k, store=store)
+    if picks is None:
+        return ranked[:k]
+    return [pool[i] for i in picks]
+
+
+# shards: domain shards to search (see index_shards.py); None routes by the question.
+# source_filter: only chunks whose source URL passes it (applied inside the FAISS search).
+# results are cached per index version (RETRIEVAL_RESULTS)
+def retrieve(
+    question: str,
+    k: int = 6,
+    shards: Optional[List[str]] = None,
+    source_filter: Optional[SourceFilter] = None,
+) -> List[Document]:
+    return retrieve_many([question], k, shards, source_filter)[0]
+
+
+def retrieve_versioned(
+    question: str,
+    k: int = 6,
+    shards: Optional[List[str]] = None,
+    source_filter: Optional[SourceFilter] = None,
+) -> Tuple[List[Document], Optional[str]]:
+    """retrieve() plus the version of the index the results came from (a reload may happen meanwhile)."""
+    results, version = _retrieve_many_versioned([question], k, shards, source_filter)
+    return results[0], version
+
+
+def retrieve_many(
+    questions: List[str],
+    k: int = 6,
+    shards: Optional[List[str]] = None,
+    source_filter: Optional[SourceFilter] = None,
+) -> List[List[Document]]:
+    """retrieve() for a batch of questions: one embedding request and one FAISS search per shard group."""
+    return _retrieve_many_versioned(questions, k, shards, source_filter)[0]
+
+
+def _retrieve_many_versioned(
+    questions: List[str],
+    k: int,
+    shards: Optional[List[str]],
+    source_filter: Optional[SourceFilter],
+) -> Tuple[List[List[Document]], Optional[str]]:
+    get_vector_store()
+    with _STORE_LOCK:
+        full_store, version = _VECTOR_STORE, _VECTOR_STORE_VERSION
+    shard_key = tuple(shards) if shards is not None else None
+    keys = [(normalize_question(q), k, shard_key, source_filter, version) for q in questions]
+    results: List[Optional[List[Document]]] = [None] * len(questions)
+    if RETRIEVAL_RESULTS.enabled:
+        for i, key in enumerate(keys):
+            cached = RETRIEVAL_RESULTS.get(key)
+            if cached is not None:
+                results[i] = list(cached)
+    missing = [i for i, docs in enumerate(results) if docs is None]
+    if missing:
+        fresh = _retrieve_many(full_store, [questions[i] for i in missing], k, shards, source_filter)
+        for i, docs in zip(missing, fresh):
+            RETRIEVAL_RESULTS.put(keys[i], tuple(docs))
+            results[i] = docs
+    return results, version
+
+
+def _embed_queries(store: FAISS, questions: List[str]) -> np.ndarray:
+    embeddings = store.embedding_function
+    if isinstance(embeddings, CachedQueryEmbeddings):
+        vectors = embeddings.embed_queries(questions)
+    elif len(questions) == 1:
+        vectors = [embeddings.embed_query(questions[0])]
+    else:
+        vectors = embeddings.embed_documents(questions)
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def _doc_key(doc: Document) -> str:
+    source = str(doc.metadata.get("source", ""))
+    preview = doc.page_content[:180]
+    return f"{source}|{preview}"
+
+
+def _retrieve_many(
+    full_store: FAISS,
+    questions: List[str],
+    k: int,
+    shards: Optional[List[str]],
+    source_filter: Optional[SourceFilter],
+) -> List[List[Document]]:
+    names = [restrict_shards(route_shards(q) if shards is None else shards, source_filter) for q in questions]
     # Pull a wider candidate pool first, then rerank down to k.
     candidate_k = max(k * 4, 12)
 
-    def _doc_key(doc: Document) -> str:
-        source = str(doc.metadata.get("source", ""))
-        preview = doc.page_content[:180]
-        return f"{source}|{preview}"
+    # BM25 runs while the questions are embedded and searched in FAISS
+    lexical = getattr(full_store, "lexical_index", None) if HYBRID_ENABLED else None
+
+    def _lexical(i: int):
+        if lexical is None:
+            return None
+        return _LEXICAL_POOL.submit(
+            _lexical_candidates, full_store, lexical, questions[i], candidate_k, names[i], source_filter
+        )
+
+    lexical_futures = [_lexical(i) for i in range(len(questions))]
+    vectors = _embed_queries(full_store, questions)
+    found: List[List[Tuple[Document, float]]] = [[] for _ in questions]
+    _search_groups(full_store, vectors, names, range(len(questions)), candidate_k, source_filter, found)
+
+    # routed questions whose shards have no close hit fall back to every shard
+    everywhere = restrict_shards(None, source_filter)
+    retry = [
+        i for i in range(len(questions))
+        if shards is None and names[i] != everywhere
+        and min((score for _, score in found[i]), default=float("inf")) >= SHARD_FALLBACK_SCORE
+    ]
+    if retry and isinstance(full_store, ShardedFAISS):
+        for i in retry:
+            names[i] = everywhere
+            lexical_futures[i] = _lexical(i)
+        _search_groups(full_store, vectors, names, retry, candidate_k, source_filter, found)
+
+    return [
+        _select(full_store, question, k, candidate_k, docs_and_scores, future)
+        for question, docs_and_scores, future in zip(questions, found, lexical_futures)
+    ]
 
-    if USE_SCORE_THRESHOLD:
-        docs_and_scores = store.similarity_search_with_score(question, k=candidate_k)
 
+# questions routed to the same shards share one search over the query matrix
+def _search_groups(
+    full_store: FAISS,
+    vectors: np.ndarray,
+    names: List[Optional[List[str]]],
+    indices: Iterable[int],
+    candidate_k: int,
+    source_filter: Optional[SourceFilter],
+    found: List[List[Tuple[Document, float]]],
+) -> None:
+    groups = {}
+    for i in indices:
+        groups.setdefault(tuple(names[i]) if names[i] is not None else None, []).append(i)
+    for group, rows in groups.items():
+        store = shard_view(full_store, list(group) if group is not None else None)
+        for i, hits in zip(rows, search_by_vectors(store, vectors[rows], candidate_k, source_filter)):
+            found[i] = hits
+
+
+# dedup, score threshold, BM25 fusion, keyword rerank and MMR of one question's candidates
+def _select(
+    store: FAISS,
+    question: str,
+    k: int,
+    candidate_k: int,
+    docs_and_scores: List[Tuple[Document, float]],
+    lexical_future,
+) -> List[Document]:
+    def _hybrid(docs: List[Document]) -> List[Document]:
+        if lexical_future is None:
+            return docs
+        return _fuse_rankings([docs, lexical_future.result()], _doc_key)
+
+    if USE_SCORE_THRESHOLD:
         # Deduplicate candidates while preserving best (lowest) score per doc key.
         best_scores = {}
         for doc, score in docs_and_scores:
@@ -225,7 +1156,11 @@ def retrieve(question: str, k: int = 6) -> List[Document]:
 
         unique_scored = list(best_scores.values())
         filtered = [d for (d, score) in unique_scored if score < SCORE_THRESHOLD]
-        filtered = _rerank_by_keyword_overlap(question, filtered, k)
+        # BM25 only reorders chunks that passed the threshold; it cannot add ones that did not
+        passed = {_doc_key(d) for d in filtered}
+        fused = [d for d in _hybrid(filtered) if _doc_key(d) in passed]
+        filtered = _rerank_by_keyword_overlap(question, fused, 2 * k)
+        filtered = _pick_diverse(store, filtered, k)
         if DEBUG_RETRIEVAL:
             for d, score in unique_scored[:candidate_k]:
                 _safe_log("\n--- RETRIEVED ---")
@@ -233,14 +1168,15 @@ def retrieve(question: str, k: int = 6) -> List[Document]:
                 _safe_log(d.page_content[:350])
         return filtered[:k]
     else:
-        all_docs: List[Document] = store.similarity_search(question, k=candidate_k)
+        all_docs: List[Document] = [doc for doc, _ in docs_and_scores]
 
         deduped = {}
         for doc in all_docs:
             deduped[_doc_key(doc)] = doc
 
         docs = list(deduped.values())
-        docs = _rerank_by_keyword_overlap(question, docs, k)
+        docs = _rerank_by_keyword_overlap(question, _hybrid(docs), 2 * k)
+        docs = _pick_diverse(store, docs, k)
         if DEBUG_RETRIEVAL:
             for d in docs:
                 _safe_log("\n--- RETRIEVED ---")
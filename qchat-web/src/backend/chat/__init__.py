@@ -22,7 +22,10 @@ from .unified_response import get_unified_response
 # FAQ matcher import
 from .faq_matcher import check_faq_by_keywords
 from .profanity_filter import sanitize_text
-from .RAG import retrieve
+from .RAG import embed_question, retrieval_cache_stats, retrieve_versioned
+from .answer_cache import ANSWER_CACHE, depends_on_asker
+from .index_shards import SHARD_HOSTS, named_shards
+from .retrieval_filter import SourceFilter
 from .livewhale import get_upcoming_events
 from .qu_topic_redirects import get_topic_redirect, looks_like_idk_reply
 from mail_service import parse_recipients, send_email
@@ -264,8 +267,11 @@ def _is_final_exam_query(question: str) -> bool:
 
 
 def _mentions_law_or_medicine(question: str) -> bool:
-    q = (question or "").lower()
-    return any(term in q for term in ["law", "school of law", "medicine", "medical", "netter"])
+    # same words that route retrieval to the law / medicine shards
+    return bool({"law", "medicine"} & set(named_shards(question)))
+
+
+_UNDERGRAD_FINALS_FILTER = SourceFilter(exclude_domains=SHARD_HOSTS["law"] + SHARD_HOSTS["medicine"])
 
 
 def _build_final_exam_retrieval_query(question: str) -> str:
@@ -391,19 +397,25 @@ def answer_with_rag(question: str, history_text: str = "", apply_final_exam_boos
 
     use_final_exam_boost = apply_final_exam_boost or _is_final_exam_query(question)
     allow_professional_school_content = _mentions_law_or_medicine(question)
+    # stand-alone questions can reuse the answer to an earlier, similarly worded one
+    use_answer_cache = ANSWER_CACHE.enabled and not history_text.strip() and not depends_on_asker(question)
+    # both flags change what is retrieved and what the model is asked
+    cache_variant = (use_final_exam_boost, allow_professional_school_content)
+    if use_answer_cache:
+        question_vector, index_version = embed_question(question)
+        cached = ANSWER_CACHE.lookup(question_vector, question, index_version, cache_variant)
+        if cached is not None:
+            _safe_log(f"Answer cache hit ({cached['similarity']}): {question!r} ~ {cached['cachedFrom']!r}")
+            return {"reply": cached["reply"], "sources": cached["sources"]}
     retrieval_query = _build_final_exam_retrieval_query(question) if use_final_exam_boost else question
-    docs = retrieve(retrieval_query, k=10 if use_final_exam_boost else 6)
+    # finals questions skip the law/medicine calendars unless they ask about those schools
+    source_filter = _UNDERGRAD_FINALS_FILTER if use_final_exam_boost and not allow_professional_school_content else None
+    # the version actually searched: a hot reload may have happened since the cache lookup
+    docs, index_version = retrieve_versioned(
+        retrieval_query, k=10 if use_final_exam_boost else 6, source_filter=source_filter
+    )
     if use_final_exam_boost and docs:
         docs = _rerank_docs_for_final_exams(docs)[:6]
-        if not allow_professional_school_content:
-            docs = [
-                d for d in docs
-                if "law.qu.edu" not in (d.metadata.get("source") or "").lower()
-                and "medicine.qu.edu" not in (d.metadata.get("source") or "").lower()
-            ]
-            # Keep a fallback in case filtering becomes too aggressive.
-            if not docs:
-                docs = retrieve(question, k=6)
     # failure to retrieve docs
     if not docs:
         redirect = get_topic_redirect(question)
@@ -442,8 +454,12 @@ def answer_with_rag(question: str, history_text: str = "", apply_final_exam_boos
     redirect = get_topic_redirect(question)
     if redirect and looks_like_idk_reply(reply_text):
         return {"reply": redirect["reply"], "sources": redirect["sources"]}
+    result = {"reply": reply_text, "sources": sources[:5]}
+    # a failed answer is not worth repeating to every similar question
+    if use_answer_cache and not looks_like_idk_reply(reply_text):
+        ANSWER_CACHE.put(question_vector, question, result, index_version, cache_variant)
     # retrun reply
-    return{"reply": reply_text, "sources": sources[:5]}
+    return result
 
 
 def _extract_json_object(text: str) -> dict | None:
@@ -753,6 +769,7 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             "hasMongoUri": bool(MONGO_URI),
             "error": _db_error,
             "responseSystem": "unified",  # Indicate using unified system
+            "caches": dict(retrieval_cache_stats(), semanticAnswers=ANSWER_CACHE.stats()),
         }
         return func.HttpResponse(json.dumps(info), mimetype="application/json")
     elif action == "chat":
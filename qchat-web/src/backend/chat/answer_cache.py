@@ -0,0 +1,181 @@
+"""
+Semantic answer cache for answer_with_rag.
+
+Students ask the same things in different words. Each RAG answer is stored
+with the embedding of its question; a later question whose embedding has a
+cosine similarity of at least QCHAT_ANSWER_CACHE_THRESHOLD with a stored one
+gets that reply and sources back without retrieval or an llm.invoke.
+Similarity alone can't tell "when does spring break start" from "when does
+fall break start", so a stored answer is only reused for a question with the
+same key terms (its words minus question and filler words, see key_terms).
+
+The vectors live in one float32 matrix (one row per slot, unit length), so a
+lookup is a single matrix-vector product over the cache. Entries are scoped
+by index version (a new version empties the cache) and by variant (the
+final-exam boost and law/medicine questions retrieve and prompt differently),
+expire after QCHAT_ANSWER_CACHE_TTL seconds and are evicted
+least-recently-used beyond QCHAT_ANSWER_CACHE_SIZE. "I don't know" replies
+are not stored.
+
+Callers only use it for stand-alone questions: not with conversation history
+and not for questions about the asker ("my advisor", "am I eligible"), whose
+answers depend on the user's profile.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Hashable, List, Optional
+
+import numpy as np
+
+# config
+ANSWER_CACHE_SIZE = int(os.getenv("QCHAT_ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_TTL = float(os.getenv("QCHAT_ANSWER_CACHE_TTL", "21600"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("QCHAT_ANSWER_CACHE_THRESHOLD", "0.95"))
+
+_PERSONAL = re.compile(r"\b(i|i'm|im|i've|me|my|mine|myself|am i)\b", re.I)
+_WORD = re.compile(r"[a-z0-9]+")
+# words that don't change what a question asks about
+_FILLER = frozenset("""
+a an the is are was were be been being do does did can could would will should shall may might must
+what when where which who whom whose why how whats there here this that these those it its
+of in on at to for from by with about into and or if than as so any some
+i me my we our you your they their please tell know find get give
+quinnipiac qu university
+""".split())
+
+
+def depends_on_asker(question: str) -> bool:
+    """First-person questions are answered for a particular student, so they are never cached."""
+    return bool(_PERSONAL.search(question or ""))
+
+
+def key_terms(question: str) -> FrozenSet[str]:
+    """Content words of a question (lowercase, plural "s" dropped); a reused answer must have the same."""
+    terms = set()
+    for word in _WORD.findall((question or "").lower()):
+        if word in _FILLER:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.add(word)
+    return frozenset(terms)
+
+
+class SemanticAnswerCache:
+    """Thread-safe LRU + TTL cache of answers, looked up by question embedding similarity."""
+
+    def __init__(
+        self,
+        max_entries: int = ANSWER_CACHE_SIZE,
+        ttl_seconds: float = ANSWER_CACHE_TTL,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        # slot -> entry, least recently used first
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._free: List[int] = list(range(max_entries - 1, -1, -1))
+        self._version: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def _unit(vector: List[float]) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(v))
+        return v / norm if norm else v
+
+    def _drop(self, slot: int) -> None:
+        del self._entries[slot]
+        self._free.append(slot)
+
+    def _scope_to(self, version: Optional[str]) -> None:
+        if version != self._version:
+            # answers of an older index may cite pages that changed or are gone
+            for slot in list(self._entries):
+                self._drop(slot)
+            self._version = version
+
+    def lookup(self, vector: List[float], question: str, version: Optional[str], variant: Hashable = None) -> Optional[dict]:
+        """Stored answer of the most similar question with the same key terms at or above the threshold, else None."""
+        query = self._unit(vector)
+        terms = key_terms(question)
+        now = time.monotonic()
+        with self._lock:
+            self._scope_to(version)
+            for slot, entry in list(self._entries.items()):
+                if entry["expires"] <= now:
+                    self._drop(slot)
+                    self.expirations += 1
+            slots = [
+                slot for slot, entry in self._entries.items()
+                if entry["variant"] == variant and entry["terms"] == terms
+            ]
+            if not slots or self._vectors is None or self._vectors.shape[1] != len(query):
+                self.misses += 1
+                return None
+            sims = self._vectors[slots] @ query
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                self.misses += 1
+                return None
+            slot = slots[best]
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            entry = self._entries[slot]
+            return dict(entry["answer"], cachedFrom=entry["question"], similarity=round(float(sims[best]), 4))
+
+    def put(self, vector: List[float], question: str, answer: dict, version: Optional[str], variant: Hashable = None) -> None:
+        if not self.enabled:
+            return
+        row = self._unit(vector)
+        with self._lock:
+            self._scope_to(version)
+            if self._vectors is None or self._vectors.shape[1] != len(row):
+                self._vectors = np.zeros((self.max_entries, len(row)), dtype=np.float32)
+                for slot in list(self._entries):
+                    self._drop(slot)
+            if not self._free:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+            slot = self._free.pop()
+            self._vectors[slot] = row
+            self._entries[slot] = {
+                "question": question,
+                "terms": key_terms(question),
+                "answer": dict(answer),
+                "variant": variant,
+                "expires": time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else float("inf"),
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "ttlSeconds": self.ttl_seconds,
+                "threshold": self.threshold,
+                "indexVersion": self._version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+ANSWER_CACHE = SemanticAnswerCache()
@@ -0,0 +1,144 @@
+"""
+Site-wide boilerplate stripping for index builds.
+
+_clean_html_to_text keeps every visible line, so each qu.edu page carries the
+same menu, footer and "Request Info / Apply / Visit" lines into its chunks.
+During a build the learner looks at the first QCHAT_BOILERPLATE_SAMPLE_PAGES
+pages of each host and marks every line that shows up on at least
+QCHAT_BOILERPLATE_MIN_SHARE of them as boilerplate; those lines are removed
+from every page of that host before splitting.
+
+Pages of a host are held back until its sample is complete, so the first
+pages are stripped with the same rules as the rest. Query-string variants of
+one path (programs-listing/?Degree=...) count as a single page, otherwise
+their shared body would look like boilerplate. Learned lines are stored in the
+url manifest so incremental builds strip changed pages the same way.
+"""
+
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+BOILERPLATE_ENABLED = os.getenv("QCHAT_STRIP_BOILERPLATE", "true").lower() == "true"
+BOILERPLATE_SAMPLE_PAGES = int(os.getenv("QCHAT_BOILERPLATE_SAMPLE_PAGES", "40"))
+BOILERPLATE_MIN_SHARE = float(os.getenv("QCHAT_BOILERPLATE_MIN_SHARE", "0.5"))
+# never learn from fewer pages than this (a host with 2 pages has no "site-wide" lines)
+BOILERPLATE_MIN_PAGES = 4
+
+
+def _host(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+class _HostState:
+    def __init__(self):
+        self.paths = set()
+        self.line_pages = Counter()
+        self.pending: List[Tuple[str, Any]] = []
+        self.lines: Optional[set] = None
+
+
+class BoilerplateStripper:
+    """Learns repeated lines per host and strips them from page text."""
+
+    def __init__(
+        self,
+        known: Optional[Dict[str, List[str]]] = None,
+        sample_pages: int = BOILERPLATE_SAMPLE_PAGES,
+        min_share: float = BOILERPLATE_MIN_SHARE,
+    ):
+        self.sample_pages = max(BOILERPLATE_MIN_PAGES, sample_pages)
+        self.min_share = min_share
+        self._hosts: Dict[str, _HostState] = {}
+        for host, lines in (known or {}).items():
+            self._state(host).lines = set(lines)
+        self.chars_before = 0
+        self.chars_after = 0
+        self.chunks_before = 0
+        self.chunks_after = 0
+
+    def _state(self, host: str) -> _HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState()
+        return state
+
+    def observe(self, url: str, text: str) -> None:
+        """Count a page's lines toward its host's sample (no-op once the host is learned)."""
+        state = self._state(_host(url))
+        if state.lines is not None or len(state.paths) >= self.sample_pages:
+            return
+        path = urlsplit(url).path.rstrip("/") or "/"
+        if path in state.paths:
+            return
+        state.paths.add(path)
+        state.line_pages.update(set(line.strip() for line in text.split("\n") if line.strip()))
+
+    def _learn(self, state: _HostState) -> None:
+        pages = len(state.paths)
+        if pages < BOILERPLATE_MIN_PAGES:
+            state.lines = set()
+        else:
+            needed = max(BOILERPLATE_MIN_PAGES, math.ceil(self.min_share * pages))
+            state.lines = {line for line, count in state.line_pages.items() if count >= needed}
+        state.line_pages = Counter()
+
+    def add(self, url: str, text: str, item: Any) -> List[Tuple[str, Any]]:
+        """Queue a page; returns the (url, item) pairs whose host rules are now known."""
+        state = self._state(_host(url))
+        if state.lines is not None:
+            return [(url, item)]
+        self.observe(url, text)
+        state.pending.append((url, item))
+        if len(state.paths) < self.sample_pages:
+            return []
+        self._learn(state)
+        ready, state.pending = state.pending, []
+        return ready
+
+    def flush(self) -> List[Tuple[str, Any]]:
+        """Release pages of hosts that never filled their sample, learning from what was seen."""
+        ready = []
+        for state in self._hosts.values():
+            if state.lines is None:
+                self._learn(state)
+            ready.extend(state.pending)
+            state.pending = []
+        return ready
+
+    def strip(self, url: str, text: str) -> str:
+        state = self._hosts.get(_host(url))
+        lines = state.lines if state is not None else None
+        if not lines:
+            return text
+        kept = [line for line in text.split("\n") if line.strip() not in lines]
+        return re.sub(r"\n{3,}", "\n\n", "\n".join(kept)).strip()
+
+    def record(self, text: str, stripped: str, chunks_before: int, chunks_after: int) -> None:
+        self.chars_before += len(text)
+        self.chars_after += len(stripped)
+        self.chunks_before += chunks_before
+        self.chunks_after += chunks_after
+
+    def rules(self) -> Dict[str, List[str]]:
+        """Learned boilerplate lines per host, for the url manifest."""
+        return {
+            host: sorted(state.lines)
+            for host, state in sorted(self._hosts.items())
+            if state.lines
+        }
+
+    def report(self) -> str:
+        def pct(before: int, after: int) -> str:
+            return f"{100.0 * (before - after) / before:.1f}%" if before else "0.0%"
+
+        learned = ", ".join(f"{host}: {len(lines)}" for host, lines in self.rules().items()) or "none"
+        return (
+            f"[RAG] Boilerplate stripped: chars {self.chars_before} -> {self.chars_after} "
+            f"(-{pct(self.chars_before, self.chars_after)}) | chunks {self.chunks_before} -> "
+            f"{self.chunks_after} (-{pct(self.chunks_before, self.chunks_after)}) | lines learned: {learned}"
+        )
+
@@ -0,0 +1,124 @@
+"""
+On-disk checkpoint for resumable index builds.
+
+A build records its progress per URL as it goes:
+
+    checkpoint/
+        build.json          signature of the build (mode, settings, URL list, base version)
+        pages/<key>.json    fetch outcome: cleaned page text + validators, "unchanged" or "gone"
+        chunks/<key>.json   split chunks, their ids and the page hash
+        vectors/<key>.f32   float32 embeddings for those chunks
+
+Every file is written to a temp name and renamed into place, so anything
+present is complete. If the build dies, the next run with the same signature
+skips the work already recorded; a run with a different signature (other URLs,
+settings or base index) starts over. The checkpoint is removed once the index
+is published.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+SIGNATURE_FILE = "build.json"
+
+
+def _url_key(url: str) -> str:
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+
+def urls_fingerprint(urls: List[str]) -> str:
+    return hashlib.sha256("\n".join(urls).encode("utf-8")).hexdigest()
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class BuildCheckpoint:
+    def __init__(self, root: Path, signature: Dict[str, Any], resume: bool = True):
+        self.root = Path(root)
+        self.signature = signature
+        self.resumed = False
+        existing = self._read_signature()
+        if resume and existing == signature:
+            self.resumed = True
+        else:
+            shutil.rmtree(self.root, ignore_errors=True)
+        for sub in ("pages", "chunks", "vectors"):
+            (self.root / sub).mkdir(parents=True, exist_ok=True)
+        if not self.resumed:
+            _write_atomic(self.root / SIGNATURE_FILE, json.dumps(signature, sort_keys=True).encode("utf-8"))
+
+    def _read_signature(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.root / SIGNATURE_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _path(self, stage: str, url: str, suffix: str) -> Path:
+        return self.root / stage / f"{_url_key(url)}{suffix}"
+
+    def _read_json(self, path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    # fetch stage
+    def has_page(self, url: str) -> bool:
+        return self._path("pages", url, ".json").exists()
+
+    def page(self, url: str) -> Optional[Dict[str, Any]]:
+        return self._read_json(self._path("pages", url, ".json"))
+
+    def save_page(self, url: str, record: Dict[str, Any]) -> None:
+        _write_atomic(self._path("pages", url, ".json"), json.dumps(dict(record, url=url)).encode("utf-8"))
+
+    # split stage
+    def has_chunks(self, url: str) -> bool:
+        return self._path("chunks", url, ".json").exists()
+
+    def chunks(self, url: str) -> Optional[Dict[str, Any]]:
+        return self._read_json(self._path("chunks", url, ".json"))
+
+    def save_chunks(self, url: str, record: Dict[str, Any]) -> None:
+        _write_atomic(self._path("chunks", url, ".json"), json.dumps(dict(record, url=url)).encode("utf-8"))
+
+    # embed stage
+    def has_vectors(self, url: str) -> bool:
+        return self._path("vectors", url, ".f32").exists()
+
+    def vectors(self, url: str, count: int) -> Optional[List[List[float]]]:
+        try:
+            with open(self._path("vectors", url, ".f32"), "rb") as f:
+                flat = array("f")
+                flat.frombytes(f.read())
+        except OSError:
+            return None
+        if count <= 0 or len(flat) % count:
+            return None
+        dim = len(flat) // count
+        return [flat[i * dim:(i + 1) * dim].tolist() for i in range(count)]
+
+    def save_vectors(self, url: str, vectors: List[List[float]]) -> None:
+        flat = array("f")
+        for vec in vectors:
+            flat.extend(vec)
+        _write_atomic(self._path("vectors", url, ".f32"), flat.tobytes())
+
+    def nested(self, name: str) -> "BuildCheckpoint":
+        """Checkpoint for a further pass of the same build, kept inside this one."""
+        return BuildCheckpoint(self.root / name, self.signature)
+
+    def clear(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
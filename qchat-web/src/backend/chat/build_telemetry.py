@@ -0,0 +1,352 @@
+"""
+Build telemetry: a JSON report of every build_index run, and a diff of two.
+
+Each run writes faiss_index/builds/<run id>.json (the newest
+QCHAT_BUILD_REPORTS_KEEP are kept), whether it published a version, found
+the index up to date or failed:
+
+    params        embed model, chunk size/overlap and the other build_params,
+                  plus the index spec that was published
+    stages        wall seconds per stage (discover, pipeline, fetch, publish,
+                  total) and busy seconds of the embed / index_add steps,
+                  which overlap fetching inside the pipeline
+    embed_batches one entry per embedded batch: pages, chunks, seconds
+    urls          url -> state, HTTP status, fetch latency, bytes, chunk count
+    hosts         per-host page count, failures, bytes and latency percentiles
+    totals        pages, chunks, fetched / failed, bytes, peak RSS
+
+While a build runs, progress() reports its stage, percent done and ETA
+(URLs finished out of the URL list during the pipeline stage); a listener
+passed as on_progress is called whenever it moves.
+
+diff_reports() compares two reports (slower stages and hosts, new fetch
+failures, chunk count swings, changed params) and lists the ones past the
+thresholds as regressions. The admin panel reads it through the
+build_reports function, CI through diff_build_reports.py.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+from urllib.parse import urlsplit
+
+REPORTS_DIR = "builds"
+REPORT_FORMAT = 1
+# how many build reports to keep under faiss_index/builds/
+KEEP_REPORTS = int(os.getenv("QCHAT_BUILD_REPORTS_KEEP", "30"))
+
+# diff thresholds: a stage/host counts as slower when it took this many times as
+# long as before and at least the minimum absolute difference
+SLOWER_FACTOR = float(os.getenv("QCHAT_BUILD_DIFF_SLOWER_FACTOR", "1.5"))
+MIN_STAGE_SECONDS = 5.0
+MIN_HOST_MS = 200.0
+# share of the progress bar per top-level stage
+_PROGRESS_SPAN = {"discover": (0.0, 5.0), "pipeline": (5.0, 92.0), "publish": (92.0, 100.0)}
+# embedding speed is only compared when both builds embedded at least this many chunks
+MIN_EMBED_CHUNKS = 100
+# share of chunks a page (or the whole index) may gain or lose before it is flagged
+CHUNK_SWING = 0.5
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+class BuildTelemetry:
+    """Collects one build's timings and per-URL outcomes (from the fetch side and the writer thread)."""
+
+    def __init__(self, mode: str = "full", on_progress: Optional[Callable[[dict], None]] = None):
+        self.run_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:6]}"
+        self.report: Dict[str, Any] = {
+            "format": REPORT_FORMAT,
+            "run_id": self.run_id,
+            "started_at": _now(),
+            "finished_at": None,
+            "mode": mode,
+            "resumed": False,
+            "result": "running",
+            "error": None,
+            "version": None,
+            "params": {},
+            "stages": {},
+            "embed_batches": [],
+            "urls": {},
+            "totals": {},
+        }
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._on_progress = on_progress
+        self._stage: Optional[str] = None
+        self._stage_started = self._started
+        self._total_urls = 0
+        self._done_urls: Set[str] = set()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Add the wall time of the block to stages[name]."""
+        started = time.perf_counter()
+        if name in _PROGRESS_SPAN:
+            self._stage, self._stage_started = name, started
+            self._notify()
+        try:
+            yield
+        finally:
+            self.add_seconds(name, time.perf_counter() - started)
+
+    def add_seconds(self, name: str, seconds: float) -> None:
+        with self._lock:
+            stages = self.report["stages"]
+            stages[name] = round(stages.get(name, 0.0) + seconds, 3)
+
+    def set(self, **fields) -> None:
+        self.report.update(fields)
+
+    def url(self, url: str, **fields) -> None:
+        with self._lock:
+            self.report["urls"].setdefault(url, {}).update(fields)
+
+    def expect_urls(self, total: int) -> None:
+        self._total_urls = total
+        self._notify()
+
+    def url_done(self, url: str) -> None:
+        """A URL reached its final state (in the index, unchanged, gone or failed)."""
+        with self._lock:
+            self._done_urls.add(url)
+        self._notify()
+
+    def progress(self) -> dict:
+        """Current stage, percent (0-100), URLs done / total and ETA in seconds (None if unknown)."""
+        now = time.perf_counter()
+        with self._lock:
+            done, total, stage = len(self._done_urls), self._total_urls, self._stage
+        low, high = _PROGRESS_SPAN.get(stage, (0.0, 0.0))
+        fraction = min(1.0, done / total) if stage == "pipeline" and total else 0.0
+        eta = None
+        if stage == "pipeline" and done:
+            eta = round((now - self._stage_started) / done * max(0, total - done), 1)
+        return {
+            "stage": stage,
+            "percent": round(low + (high - low) * fraction, 1),
+            "done": done,
+            "total": total,
+            "eta_seconds": eta,
+            "elapsed_seconds": round(now - self._started, 1),
+        }
+
+    def _notify(self) -> None:
+        if self._on_progress is not None:
+            self._on_progress(self.progress())
+
+    def fetched(self, result) -> None:
+        self.url(
+            result.url,
+            status=result.status,
+            latency_ms=round(result.elapsed * 1000, 1),
+            bytes=result.size,
+            **({"error": result.error} if result.error else {}),
+        )
+
+    def embed_batch(self, pages: int, chunks: int, seconds: float) -> None:
+        with self._lock:
+            self.report["embed_batches"].append({"pages": pages, "chunks": chunks, "seconds": round(seconds, 3)})
+        self.add_seconds("embed", seconds)
+
+    def finish(self, result: str, error: Optional[BaseException] = None, **totals) -> dict:
+        report = self.report
+        report["result"] = result
+        report["error"] = repr(error) if error is not None else None
+        report["finished_at"] = _now()
+        report["stages"]["total"] = round(time.perf_counter() - self._started, 3)
+        urls = report["urls"].values()
+        report["totals"] = dict(
+            {
+                "urls": len(report["urls"]),
+                "fetched": sum(1 for u in urls if "latency_ms" in u),
+                "failed": sum(1 for u in urls if u.get("state") == "failed"),
+                "bytes": sum(u.get("bytes") or 0 for u in urls),
+                "embedded_chunks": sum(b["chunks"] for b in report["embed_batches"]),
+            },
+            **totals,
+        )
+        report["hosts"] = host_summary(report["urls"])
+        return report
+
+    def write(self, index_dir: Path, keep: int = KEEP_REPORTS) -> Path:
+        folder = index_dir / REPORTS_DIR
+        folder.mkdir(parents=True, exist_ok=True)
+        path = folder / f"{self.run_id}.json"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.report, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, path)
+        for old in list_reports(index_dir)[max(1, keep):]:
+            old.unlink(missing_ok=True)
+        return path
+
+
+def host_summary(urls: Dict[str, dict]) -> Dict[str, dict]:
+    """Per host: pages, failures, bytes and fetch latency (ms) of the URLs fetched this run."""
+    hosts: Dict[str, dict] = {}
+    latencies: Dict[str, List[float]] = {}
+    for url, entry in urls.items():
+        host = urlsplit(url).netloc
+        summary = hosts.setdefault(host, {"pages": 0, "fetched": 0, "failed": 0, "bytes": 0})
+        summary["pages"] += 1
+        summary["failed"] += int(entry.get("state") == "failed")
+        summary["bytes"] += entry.get("bytes") or 0
+        if "latency_ms" in entry:
+            summary["fetched"] += 1
+            latencies.setdefault(host, []).append(entry["latency_ms"])
+    for host, values in latencies.items():
+        hosts[host].update(
+            mean_ms=round(sum(values) / len(values), 1),
+            p50_ms=_percentile(values, 50),
+            p95_ms=_percentile(values, 95),
+            max_ms=max(values),
+        )
+    return hosts
+
+
+def list_reports(index_dir: Path) -> List[Path]:
+    """Build reports under index_dir, newest first."""
+    folder = index_dir / REPORTS_DIR
+    if not folder.exists():
+        return []
+    return sorted(folder.glob("*.json"), key=lambda p: p.name, reverse=True)
+
+
+def load_report(path: Path) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _slower(old: Optional[float], new: Optional[float], min_delta: float, factor: float) -> bool:
+    if old is None or new is None:
+        return False
+    return new - old >= min_delta and new >= old * factor
+
+
+def _per_chunk_ms(report: dict) -> Optional[float]:
+    batches = report.get("embed_batches") or []
+    chunks = sum(b["chunks"] for b in batches)
+    return sum(b["seconds"] for b in batches) * 1000 / chunks if chunks else None
+
+
+def _comparable_ms_per_chunk(report: dict) -> Optional[float]:
+    batches = report.get("embed_batches") or []
+    return _per_chunk_ms(report) if sum(b["chunks"] for b in batches) >= MIN_EMBED_CHUNKS else None
+
+
+def diff_reports(old: dict, new: dict, slower_factor: float = SLOWER_FACTOR) -> dict:
+    """What changed between two build reports; "regressions" lists what crossed a threshold."""
+    regressions: List[str] = []
+
+    params = {
+        key: {"old": old.get("params", {}).get(key), "new": new.get("params", {}).get(key)}
+        for key in sorted(set(old.get("params", {})) | set(new.get("params", {})))
+        if old.get("params", {}).get(key) != new.get("params", {}).get(key)
+    }
+
+    stages = {}
+    for name in sorted(set(old.get("stages", {})) | set(new.get("stages", {}))):
+        a, b = old.get("stages", {}).get(name), new.get("stages", {}).get(name)
+        stages[name] = {"old": a, "new": b}
+        if _slower(a, b, MIN_STAGE_SECONDS, slower_factor):
+            regressions.append(f"stage {name}: {a:.1f}s -> {b:.1f}s")
+
+    embed = {"old_ms_per_chunk": _per_chunk_ms(old), "new_ms_per_chunk": _per_chunk_ms(new)}
+    if _slower(_comparable_ms_per_chunk(old), _comparable_ms_per_chunk(new), 1.0, slower_factor):
+        regressions.append(
+            f"embedding: {embed['old_ms_per_chunk']:.1f} -> {embed['new_ms_per_chunk']:.1f} ms/chunk"
+        )
+
+    slow_hosts = {}
+    old_hosts, new_hosts = old.get("hosts", {}), new.get("hosts", {})
+    for host, b in new_hosts.items():
+        a = old_hosts.get(host, {})
+        if _slower(a.get("p95_ms"), b.get("p95_ms"), MIN_HOST_MS, slower_factor):
+            slow_hosts[host] = {"old_p95_ms": a["p95_ms"], "new_p95_ms": b["p95_ms"]}
+            regressions.append(f"host {host}: p95 fetch {a['p95_ms']:.0f} -> {b['p95_ms']:.0f} ms")
+        if b.get("failed", 0) > a.get("failed", 0):
+            regressions.append(f"host {host}: {a.get('failed', 0)} -> {b['failed']} failed fetches")
+
+    old_urls, new_urls = old.get("urls", {}), new.get("urls", {})
+    newly_failed, recovered, chunk_changes = [], [], {}
+    for url in sorted(set(old_urls) & set(new_urls)):
+        a, b = old_urls[url], new_urls[url]
+        if b.get("state") == "failed" and a.get("state") != "failed":
+            newly_failed.append({"url": url, "status": b.get("status"), "error": b.get("error")})
+        elif a.get("state") == "failed" and b.get("state") != "failed":
+            recovered.append(url)
+        if "chunks" in a and "chunks" in b and a["chunks"] != b["chunks"]:
+            chunk_changes[url] = {"old": a["chunks"], "new": b["chunks"]}
+
+    old_total = old.get("totals", {}).get("chunks")
+    new_total = new.get("totals", {}).get("chunks")
+    if old_total and new_total is not None and abs(new_total - old_total) > CHUNK_SWING * old_total:
+        regressions.append(f"index chunks: {old_total} -> {new_total}")
+    if new.get("result") == "failed" and old.get("result") != "failed":
+        regressions.append(f"build failed: {new.get('error')}")
+
+    return {
+        "old": {k: old.get(k) for k in ("run_id", "started_at", "result", "version")},
+        "new": {k: new.get(k) for k in ("run_id", "started_at", "result", "version")},
+        "params": params,
+        "stages": stages,
+        "embed": embed,
+        "totals": {
+            key: {"old": old.get("totals", {}).get(key), "new": new.get("totals", {}).get(key)}
+            for key in sorted(set(old.get("totals", {})) | set(new.get("totals", {})))
+        },
+        "slow_hosts": slow_hosts,
+        "urls": {
+            "added": sorted(set(new_urls) - set(old_urls)),
+            "removed": sorted(set(old_urls) - set(new_urls)),
+            "newly_failed": newly_failed,
+            "recovered": recovered,
+            "chunk_changes": chunk_changes,
+        },
+        "regressions": regressions,
+    }
+
+
+def format_diff(diff: dict) -> str:
+    """Plain-text summary of diff_reports() output."""
+    lines = [f"Build {diff['old']['run_id']} ({diff['old']['result']}) -> {diff['new']['run_id']} ({diff['new']['result']})"]
+    for key, change in diff["params"].items():
+        lines.append(f"  param {key}: {change['old']!r} -> {change['new']!r}")
+    lines.append("  stages (s):")
+    for name, change in diff["stages"].items():
+        a = "-" if change["old"] is None else f"{change['old']:.1f}"
+        b = "-" if change["new"] is None else f"{change['new']:.1f}"
+        lines.append(f"    {name:<12} {a:>9} -> {b:>9}")
+    for key, change in diff["totals"].items():
+        if change["old"] != change["new"]:
+            lines.append(f"  {key}: {change['old']} -> {change['new']}")
+    urls = diff["urls"]
+    lines.append(
+        f"  urls: +{len(urls['added'])} -{len(urls['removed'])}, {len(urls['newly_failed'])} newly failing, "
+        f"{len(urls['recovered'])} recovered, {len(urls['chunk_changes'])} with a different chunk count"
+    )
+    for item in urls["newly_failed"][:20]:
+        lines.append(f"    failing: {item['url']} ({item['error'] or item['status']})")
+    for host, change in diff["slow_hosts"].items():
+        lines.append(f"  slow host {host}: p95 {change['old_p95_ms']:.0f} -> {change['new_p95_ms']:.0f} ms")
+    if diff["regressions"]:
+        lines.append(f"  REGRESSIONS ({len(diff['regressions'])}):")
+        lines.extend(f"    - {r}" for r in diff["regressions"])
+    else:
+        lines.append("  no regressions")
+    return "\n".join(lines)
@@ -0,0 +1,333 @@
+"""
+Out-of-process index builds.
+
+The Functions host never runs build_index itself: start_build() launches
+`python -m chat.build_worker` as a separate, lower-priority process (its own
+session, so it outlives the request or timer that started it) and returns
+at once. The worker writes its progress to <index dir>/build_status.json:
+
+    state        running | succeeded | failed
+    stage        discover | pipeline | publish (see BuildTelemetry.progress)
+    percent      0-100, URLs finished out of the URL list during the pipeline
+    eta_seconds  estimate from the pipeline's rate so far (null until known)
+    result       pages / chunks / version once the build is done
+
+A lock file (build.lock, holding the worker pid) allows one build per index
+directory; a lock left by a worker that died is taken over. The worker's
+output goes to build_worker.log next to the status file.
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .RAG import DEFAULT_INDEX_DIR, DEFAULT_URLS_TXT
+from .console_log import _safe_log
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+STATUS_FILE = "build_status.json"
+LOCK_FILE = "build.lock"
+LOG_FILE = "build_worker.log"
+
+# config
+# niceness added to the worker process (POSIX); Windows runs it below normal priority
+BUILD_NICE = int(os.getenv("QCHAT_BUILD_NICE", "10"))
+# minimum seconds between two progress writes
+STATUS_EVERY_SECONDS = float(os.getenv("QCHAT_BUILD_STATUS_SECONDS", "1"))
+
+# workers started by this process, polled so they don't linger as zombies
+_CHILDREN = []
+
+
+def resolve_urls_file() -> Path:
+    """
+    Resolve URL list path.
+    Supports:
+    - absolute path in QCHAT_URLS_PATH
+    - backend-relative file (e.g., qu_docs.txt)
+    - chat-relative file fallback (chat/qu_docs.txt)
+    """
+    configured = (os.getenv("QCHAT_URLS_PATH") or "").strip()
+    if not configured:
+        return DEFAULT_URLS_TXT
+
+    cfg_path = Path(configured)
+    if cfg_path.is_absolute():
+        return cfg_path
+
+    backend_relative = BACKEND_DIR / cfg_path
+    if backend_relative.exists():
+        return backend_relative
+
+    chat_relative = BACKEND_DIR / "chat" / cfg_path
+    if chat_relative.exists():
+        return chat_relative
+
+    # Fall back to backend-relative target to provide clearer errors in logs
+    return backend_relative
+
+
+def resolve_index_dir() -> Path:
+    configured = (os.getenv("QCHAT_INDEX_DIR") or "").strip()
+    if not configured:
+        return DEFAULT_INDEX_DIR
+    cfg_path = Path(configured)
+    if cfg_path.is_absolute():
+        return cfg_path
+    return BACKEND_DIR / cfg_path
+
+
+def parse_max_urls() -> Optional[int]:
+    raw = (os.getenv("QCHAT_MAX_URLS") or "").strip()
+    if not raw:
+        return None
+    try:
+        value = int(raw)
+        return value if value > 0 else None
+    except ValueError:
+        logging.warning("Invalid QCHAT_MAX_URLS value '%s'. Using full URL list.", raw)
+        return None
+
+
+def default_mode() -> str:
+    mode = (os.getenv("QCHAT_REBUILD_MODE") or "incremental").strip().lower()
+    if mode not in ("full", "incremental"):
+        logging.warning("Invalid QCHAT_REBUILD_MODE value '%s'. Using incremental.", mode)
+        return "incremental"
+    return mode
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    for child in list(_CHILDREN):
+        # reap our own finished workers
+        if child.poll() is not None:
+            _CHILDREN.remove(child)
+    try:
+        import psutil
+
+        return psutil.pid_exists(pid) and psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+    except ImportError:
+        pass
+    except Exception:
+        return False
+    if os.name == "nt":
+        # os.kill would terminate the process on Windows; without psutil, trust the lock
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _write_json(path: Path, data: Dict[str, Any]) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _lock_holder(index_dir: Path) -> Optional[int]:
+    try:
+        return int((index_dir / LOCK_FILE).read_text(encoding="utf-8").strip() or 0)
+    except (OSError, ValueError):
+        return None
+
+
+def read_status(index_dir: Path) -> Dict[str, Any]:
+    """Last written build status; a "running" build whose worker is gone is reported as failed."""
+    status = _read_json(index_dir / STATUS_FILE) or {"state": "idle"}
+    if status.get("state") in ("starting", "running") and not _pid_alive(_lock_holder(index_dir)):
+        status = dict(status, state="failed", error=status.get("error") or "build worker exited unexpectedly")
+    return status
+
+
+def _take_lock(index_dir: Path, pid: int) -> bool:
+    index_dir.mkdir(parents=True, exist_ok=True)
+    lock = index_dir / LOCK_FILE
+    for _ in range(2):
+        try:
+            fd = os.open(str(lock), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if _pid_alive(_lock_holder(index_dir)):
+                return False
+            # left behind by a worker that died
+            lock.unlink(missing_ok=True)
+            continue
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(str(pid))
+        return True
+    return False
+
+
+def start_build(
+    index_dir: Path,
+    urls_txt: Path,
+    mode: str = "incremental",
+    max_urls: Optional[int] = None,
+    trigger: str = "admin",
+    requested_by: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Launch a build worker unless one is running; returns {"started": bool, "status": ...}."""
+    if not _take_lock(index_dir, os.getpid()):
+        return {"started": False, "status": read_status(index_dir)}
+    status = {
+        "state": "starting",
+        "mode": mode,
+        "trigger": trigger,
+        "requested_by": requested_by,
+        "started_at": _now(),
+        "updated_at": _now(),
+        "stage": None,
+        "percent": 0.0,
+        "eta_seconds": None,
+    }
+    try:
+        _write_json(index_dir / STATUS_FILE, status)
+        args = [
+            sys.executable, "-m", "chat.build_worker",
+            "--index-dir", str(index_dir), "--urls-file", str(urls_txt),
+            "--mode", mode, "--trigger", trigger, "--lock-held",
+        ]
+        if max_urls:
+            args += ["--max-urls", str(max_urls)]
+        if requested_by:
+            args += ["--requested-by", requested_by]
+        kwargs: Dict[str, Any] = {"cwd": str(BACKEND_DIR), "stdin": subprocess.DEVNULL}
+        if os.name == "nt":
+            kwargs["creationflags"] = (
+                subprocess.CREATE_NEW_PROCESS_GROUP
+                | subprocess.DETACHED_PROCESS
+                | subprocess.BELOW_NORMAL_PRIORITY_CLASS
+            )
+        else:
+            kwargs["start_new_session"] = True
+        with open(index_dir / LOG_FILE, "wb") as log:
+            child = subprocess.Popen(args, stdout=log, stderr=subprocess.STDOUT, **kwargs)
+    except Exception:
+        (index_dir / LOCK_FILE).unlink(missing_ok=True)
+        raise
+    _CHILDREN.append(child)
+    # the lock now belongs to the worker, which removes it when it exits
+    (index_dir / LOCK_FILE).write_text(str(child.pid), encoding="utf-8")
+    status["pid"] = child.pid
+    logging.info("Started index build worker pid %s (%s, trigger: %s)", child.pid, mode, trigger)
+    return {"started": True, "status": status}
+
+
+class _StatusWriter:
+    """Worker side: throttled writes of BuildTelemetry progress to build_status.json."""
+
+    def __init__(self, index_dir: Path, base: Dict[str, Any]):
+        self.path = index_dir / STATUS_FILE
+        self.status = dict(base)
+        self._last_write = 0.0
+        self._last_key = None
+
+    def __call__(self, progress: Dict[str, Any]) -> None:
+        now = time.monotonic()
+        key = (progress["stage"], progress["total"])
+        if key == self._last_key and now - self._last_write < STATUS_EVERY_SECONDS:
+            return
+        self._last_key = key
+        self.update(state="running", **progress)
+
+    def update(self, **fields) -> None:
+        self.status.update(fields, updated_at=_now())
+        self._last_write = time.monotonic()
+        try:
+            _write_json(self.path, self.status)
+        except OSError as e:
+            _safe_log(f"[RAG] Could not write build status: {e!r}")
+
+
+def _lower_priority() -> None:
+    if os.name != "nt" and BUILD_NICE > 0:
+        try:
+            os.nice(BUILD_NICE)
+        except OSError:
+            pass
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="QChat index build worker (started by start_build)")
+    parser.add_argument("--index-dir", type=Path, default=DEFAULT_INDEX_DIR)
+    parser.add_argument("--urls-file", type=Path, default=DEFAULT_URLS_TXT)
+    parser.add_argument("--mode", choices=("full", "incremental"), default="incremental")
+    parser.add_argument("--max-urls", type=int, default=None)
+    parser.add_argument("--trigger", default="cli")
+    parser.add_argument("--requested-by", default=None)
+    # start_build took the lock on our behalf
+    parser.add_argument("--lock-held", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    from .RAG import build_index
+    from .index_store import current_version
+
+    _lower_priority()
+    index_dir = args.index_dir
+    if args.lock_held:
+        (index_dir / LOCK_FILE).write_text(str(os.getpid()), encoding="utf-8")
+    elif not _take_lock(index_dir, os.getpid()):
+        _safe_log(f"[RAG] Another build is running (pid {_lock_holder(index_dir)}), exiting.")
+        return 1
+    writer = _StatusWriter(index_dir, {
+        "pid": os.getpid(),
+        "mode": args.mode,
+        "trigger": args.trigger,
+        "requested_by": args.requested_by,
+        "started_at": _now(),
+        "stage": None,
+        "percent": 0.0,
+        "eta_seconds": None,
+        "error": None,
+        "result": None,
+    })
+    writer.update(state="running")
+    try:
+        pages, chunks = build_index(
+            urls_txt=args.urls_file,
+            index_dir=index_dir,
+            max_urls=args.max_urls,
+            incremental=args.mode == "incremental",
+            on_progress=writer,
+        )
+    except BaseException as e:
+        writer.update(state="failed", error=repr(e), finished_at=_now())
+        raise
+    else:
+        writer.update(
+            state="succeeded", stage="done", percent=100.0, eta_seconds=0,
+            result={"pages": pages, "chunks": chunks, "version": current_version(index_dir)},
+            finished_at=_now(),
+        )
+    finally:
+        (index_dir / LOCK_FILE).unlink(missing_ok=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,16 @@
+"""
+Console logging shared by the RAG modules.
+
+Retrieved page text and URLs can hold characters a Windows console (cp1252)
+cannot print; _safe_log falls back to backslash escapes instead of raising.
+The build and fetch helpers import it from here because RAG imports them.
+"""
+
+
+def _safe_log(*parts) -> None:
+    """Log text safely on Windows consoles that may default to cp1252."""
+    text = " ".join(str(p) for p in parts)
+    try:
+        print(text)
+    except UnicodeEncodeError:
+        print(text.encode("ascii", "backslashreplace").decode("ascii"))
@@ -0,0 +1,168 @@
+"""
+Batched, concurrent embedding client for index builds.
+
+Chunks are grouped into batches of QCHAT_EMBED_BATCH_SIZE and posted to
+Ollama's /api/embed endpoint with at most QCHAT_EMBED_CONCURRENCY requests in
+flight. Failed or overloaded requests (timeouts, 429, 5xx) are retried with
+exponential backoff, and when a batch takes longer than QCHAT_EMBED_SLOW_SECONDS
+the in-flight cap is lowered until Ollama catches up again.
+"""
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import requests
+from requests.adapters import HTTPAdapter
+from langchain_core.embeddings import Embeddings
+
+from .console_log import _safe_log
+
+
+# config
+EMBED_BATCH_SIZE = int(os.getenv("QCHAT_EMBED_BATCH_SIZE", "32"))
+EMBED_CONCURRENCY = int(os.getenv("QCHAT_EMBED_CONCURRENCY", "4"))
+EMBED_TIMEOUT = float(os.getenv("QCHAT_EMBED_TIMEOUT", "120"))
+EMBED_RETRIES = int(os.getenv("QCHAT_EMBED_RETRIES", "5"))
+EMBED_BACKOFF_SECONDS = float(os.getenv("QCHAT_EMBED_BACKOFF_SECONDS", "1.0"))
+# a batch slower than this counts as "Ollama is struggling" and lowers concurrency
+EMBED_SLOW_SECONDS = float(os.getenv("QCHAT_EMBED_SLOW_SECONDS", "30"))
+
+_RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class EmbedRequestError(RuntimeError):
+    pass
+
+
+class _AdaptiveLimit:
+    """Counting limit whose ceiling drops on slow batches and recovers on fast ones."""
+
+    def __init__(self, maximum: int):
+        self.maximum = max(1, maximum)
+        self.limit = self.maximum
+        self._in_flight = 0
+        self._fast_streak = 0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+        return self
+
+    def __exit__(self, *exc) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def record(self, seconds: float, slow_after: float) -> None:
+        with self._cond:
+            if seconds > slow_after:
+                self._fast_streak = 0
+                self.limit = max(1, self.limit - 1)
+            else:
+                self._fast_streak += 1
+                if self._fast_streak >= self.limit and self.limit < self.maximum:
+                    self._fast_streak = 0
+                    self.limit += 1
+            self._cond.notify_all()
+
+
+class BatchedOllamaEmbeddings(Embeddings):
+    """Embeddings client that batches texts and keeps a bounded number of requests in flight."""
+
+    def __init__(
+        self,
+        model: str,
+        base_url: str,
+        batch_size: int = EMBED_BATCH_SIZE,
+        concurrency: int = EMBED_CONCURRENCY,
+        timeout: float = EMBED_TIMEOUT,
+        retries: int = EMBED_RETRIES,
+        backoff: float = EMBED_BACKOFF_SECONDS,
+        slow_after: float = EMBED_SLOW_SECONDS,
+    ):
+        self.model = model
+        self.url = base_url.rstrip("/") + "/api/embed"
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.slow_after = slow_after
+        self._limit = _AdaptiveLimit(self.concurrency)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._stats_lock = threading.Lock()
+        self.chunks = 0
+        self.batches = 0
+        self.retried = 0
+        self.elapsed = 0.0
+
+    def _post(self, texts: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            try:
+                with self._limit:
+                    started = time.monotonic()
+                    try:
+                        r = self._session.post(
+                            self.url,
+                            json={"model": self.model, "input": texts},
+                            timeout=self.timeout,
+                        )
+                    finally:
+                        self._limit.record(time.monotonic() - started, self.slow_after)
+                if r.status_code in _RETRY_STATUSES:
+                    raise EmbedRequestError(f"Ollama embed returned HTTP {r.status_code}")
+                r.raise_for_status()
+                vectors = r.json().get("embeddings") or []
+                if len(vectors) != len(texts):
+                    raise EmbedRequestError(f"Ollama returned {len(vectors)} embeddings for {len(texts)} inputs")
+                return vectors
+            except (requests.ConnectionError, requests.Timeout, EmbedRequestError) as e:
+                if attempt >= self.retries:
+                    raise
+                attempt += 1
+                with self._stats_lock:
+                    self.retried += 1
+                delay = self.backoff * (2 ** (attempt - 1)) * (0.5 + random.random())
+                _safe_log(f"[RAG] embed batch failed ({e!r}); retry {attempt}/{self.retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        started = time.monotonic()
+        if len(batches) == 1:
+            results = [self._post(batches[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="qchat-embed") as pool:
+                results = list(pool.map(self._post, batches))
+        with self._stats_lock:
+            self.elapsed += time.monotonic() - started
+            self.chunks += len(texts)
+            self.batches += len(batches)
+        return [vec for batch in results for vec in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._post([text])[0]
+
+    @property
+    def chunks_per_sec(self) -> float:
+        return self.chunks / self.elapsed if self.elapsed > 0 else 0.0
+
+    def report(self) -> str:
+        return (
+            f"[RAG] Embedded {self.chunks} chunks in {self.batches} batches, {self.elapsed:.1f}s "
+            f"({self.chunks_per_sec:.1f} chunks/sec, batch={self.batch_size}, "
+            f"concurrency={self.concurrency}, final limit={self._limit.limit}, retries={self.retried})"
+        )
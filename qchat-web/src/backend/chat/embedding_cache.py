@@ -0,0 +1,170 @@
+"""
+Persistent, content-addressed embedding cache for index builds.
+
+Vectors are stored in a local sqlite file keyed by sha256(embed model + chunk
+text), as raw float32 blobs. Chunks whose text did not change since an earlier
+build are served from disk and never reach Ollama. The file is trimmed back
+under QCHAT_EMBED_CACHE_MAX_MB by evicting least-recently-used rows.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+BASE_DIR = Path(__file__).parent
+
+# config
+EMBED_CACHE_ENABLED = os.getenv("QCHAT_EMBED_CACHE", "true").lower() == "true"
+EMBED_CACHE_PATH = Path(os.getenv("QCHAT_EMBED_CACHE_PATH", str(BASE_DIR / "embedding_cache" / "embeddings.sqlite3")))
+EMBED_CACHE_MAX_MB = float(os.getenv("QCHAT_EMBED_CACHE_MAX_MB", "512"))
+
+# sqlite caps bound parameters per statement; stay well below it
+_LOOKUP_BATCH = 500
+
+
+def cache_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """sqlite-backed key -> float32 vector store with LRU size eviction."""
+
+    def __init__(self, path: Path = EMBED_CACHE_PATH, max_mb: float = EMBED_CACHE_MAX_MB):
+        self.path = Path(path)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " dim INTEGER NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), _LOOKUP_BATCH):
+                batch = keys[i:i + _LOOKUP_BATCH]
+                marks = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    vec = array("f")
+                    vec.frombytes(blob)
+                    found[key] = vec.tolist()
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({marks})", [now, *batch]
+                    )
+            self._conn.commit()
+        return found
+
+    def put_many(self, model: str, items: Dict[str, List[float]]) -> None:
+        now = time.time()
+        rows = [
+            (key, model, len(vec), array("f", vec).tobytes(), now)
+            for key, vec in items.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector) + LENGTH(key)), 0) FROM embeddings").fetchone()
+        return int(row[0])
+
+    def count(self) -> int:
+        with self._lock:
+            return int(self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0])
+
+    def evict(self) -> int:
+        """Drop least-recently-used rows until the payload fits in max_bytes."""
+        excess = self.size_bytes() - self.max_bytes
+        if excess <= 0:
+            return 0
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, LENGTH(vector) + LENGTH(key) FROM embeddings ORDER BY last_used ASC"
+            ).fetchall()
+            doomed = []
+            for key, nbytes in rows:
+                if excess <= 0:
+                    break
+                doomed.append((key,))
+                excess -= nbytes
+            self._conn.executemany("DELETE FROM embeddings WHERE key = ?", doomed)
+            self._conn.commit()
+            removed = len(doomed)
+            if removed:
+                # give the freed pages back to the filesystem
+                self._conn.execute("VACUUM")
+        self.evicted += removed
+        return removed
+
+    def report(self) -> str:
+        total = self.hits + self.misses
+        rate = (100.0 * self.hits / total) if total else 0.0
+        return (
+            f"[RAG] Embedding cache: {self.hits} hits / {self.misses} misses ({rate:.1f}% hit rate) "
+            f"| entries: {self.count()} | size: {self.size_bytes() / (1024 * 1024):.1f} MB "
+            f"of {self.max_bytes / (1024 * 1024):.0f} MB | evicted: {self.evicted}"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends cache misses to the wrapped model."""
+
+    def __init__(self, inner: Embeddings, model: str, cache: Optional[EmbeddingCache] = None):
+        self.inner = inner
+        self.model = model
+        self.cache = cache or EmbeddingCache()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [cache_key(self.model, t) for t in texts]
+        found = self.cache.get_many(list(set(keys)))
+        hits = sum(1 for key in keys if key in found)
+        self.cache.hits += hits
+        self.cache.misses += len(keys) - hits
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.inner.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(self.model, fresh)
+            # hand back the same float32-rounded values a later cache hit would return
+            for key, vec in fresh.items():
+                found[key] = array("f", vec).tolist()
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.inner.embed_query(text)
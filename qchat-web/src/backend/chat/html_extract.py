@@ -0,0 +1,116 @@
+"""
+HTML -> visible text extraction backends for index builds.
+
+QCHAT_HTML_EXTRACTOR picks the backend:
+
+    bs4    BeautifulSoup with html.parser (the original extractor)
+    lxml   same output as bs4 (all visible text, one line per text node), parsed by lxml
+    main   lxml, main content only: <main> / role="main" / <article> / #content,
+           without nav, header, footer, aside and forms; falls back to the whole
+           page when no main region with enough text is found
+
+All backends drop script/style/noscript and apply the same whitespace cleanup,
+so they can be swapped and compared (see benchmarks/bench_extract.py). lxml is
+optional; if it is missing the lxml backends fall back to bs4.
+"""
+
+import os
+import re
+from typing import Callable, Dict, List
+
+import bs4
+
+from .console_log import _safe_log
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # pragma: no cover - optional dependency
+    lxml = None
+
+HTML_EXTRACTOR = os.getenv("QCHAT_HTML_EXTRACTOR", "bs4").lower()
+# a main region shorter than this (chars) is probably a hero banner, use the whole page
+MAIN_MIN_CHARS = int(os.getenv("QCHAT_MAIN_MIN_CHARS", "200"))
+
+_DROP_TAGS = ("script", "style", "noscript")
+_CHROME_TAGS = ("nav", "header", "footer", "aside", "form")
+_CHROME_ROLES = ("navigation", "banner", "contentinfo", "search")
+_MAIN_XPATHS = (
+    "//main",
+    "//*[@role='main']",
+    "//article",
+    "//*[@id='main-content' or @id='maincontent' or @id='content' or @id='main']",
+)
+
+
+def _tidy(text: str) -> str:
+    # basic whitespace cleanup (keep line breaks)
+    text = re.sub(r"[ \t]+", " ", text)
+    return re.sub(r"\n{3,}", "\n\n", text)
+
+
+def bs4_text(html: str) -> str:
+    soup = bs4.BeautifulSoup(html, "html.parser")
+    # remove html elements before extracting the text
+    for tag in soup(_DROP_TAGS):
+        tag.decompose()
+    return _tidy(soup.get_text(separator="\n", strip=True))
+
+
+def _lxml_root(html: str):
+    # bytes + explicit encoding: lxml rejects str input that carries an encoding declaration
+    parser = lxml.html.HTMLParser(encoding="utf-8", remove_comments=True, remove_pis=True)
+    try:
+        root = lxml.html.document_fromstring(html.encode("utf-8", "replace"), parser=parser)
+    except (etree.ParserError, ValueError):
+        return None
+    etree.strip_elements(root, *_DROP_TAGS, with_tail=False)
+    return root
+
+
+def _node_text(node) -> str:
+    return "\n".join(s.strip() for s in node.itertext() if s.strip())
+
+
+def lxml_text(html: str) -> str:
+    root = _lxml_root(html)
+    if root is None:
+        return ""
+    return _tidy(_node_text(root))
+
+
+def main_content_text(html: str) -> str:
+    root = _lxml_root(html)
+    if root is None:
+        return ""
+    etree.strip_elements(root, *_CHROME_TAGS, with_tail=False)
+    for node in root.xpath("//*[@role]"):
+        if node.get("role") in _CHROME_ROLES and node.getparent() is not None:
+            node.drop_tree()
+    for xpath in _MAIN_XPATHS:
+        # largest match, e.g. the article body rather than a teaser card
+        texts = [_node_text(node) for node in root.xpath(xpath)]
+        best = max(texts, key=len, default="")
+        if len(best) >= MAIN_MIN_CHARS:
+            return _tidy(best)
+    return _tidy(_node_text(root))
+
+
+EXTRACTORS: Dict[str, Callable[[str], str]] = {
+    "bs4": bs4_text,
+    "lxml": lxml_text,
+    "main": main_content_text,
+}
+
+
+def available_extractors() -> List[str]:
+    return ["bs4"] if lxml is None else list(EXTRACTORS)
+
+
+def get_extractor(name: str = HTML_EXTRACTOR) -> Callable[[str], str]:
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown HTML extractor {name!r}, expected one of {sorted(EXTRACTORS)}")
+    if name not in available_extractors():
+        _safe_log(f"[RAG] lxml is not installed, using the bs4 HTML extractor instead of {name!r}")
+        return bs4_text
+    return EXTRACTORS[name]
@@ -0,0 +1,130 @@
+"""
+Quantized / compressed FAISS index options.
+
+Builds always accumulate vectors in a flat (exact, float32) index. When
+QCHAT_INDEX_TYPE is not "flat", the flat index is converted at publish time
+into the configured FAISS index, trained on the full set of vectors:
+
+    flat     exact search, 4 bytes per dimension (default)
+    sq8      scalar quantizer, 1 byte per dimension
+    pq       product quantizer, QCHAT_PQ_M bytes per vector
+    ivf      inverted file over flat vectors, searches QCHAT_IVF_NPROBE of QCHAT_IVF_NLIST lists
+    ivfsq8   ivf + sq8
+    ivfpq    ivf + pq
+
+Vector positions are kept, so the LangChain docstore mapping stays valid.
+The exact flat index is saved next to it (flat.faiss) for incremental builds
+to edit; only index.faiss is loaded for queries. The chosen parameters are
+written under "index" in url_manifest.json. Corpora too small to train the
+requested type fall back to flat.
+"""
+
+import math
+import os
+import time
+from typing import Any, Dict, Optional
+
+import faiss
+import numpy as np
+
+INDEX_TYPE = os.getenv("QCHAT_INDEX_TYPE", "flat").lower()
+# 0 = pick from the corpus size (about 4 * sqrt(n))
+IVF_NLIST = int(os.getenv("QCHAT_IVF_NLIST", "0"))
+IVF_NPROBE = int(os.getenv("QCHAT_IVF_NPROBE", "16"))
+# 0 = about one sub-quantizer per 16 dimensions
+PQ_M = int(os.getenv("QCHAT_PQ_M", "0"))
+PQ_NBITS = int(os.getenv("QCHAT_PQ_NBITS", "8"))
+
+INDEX_TYPES = ("flat", "sq8", "pq", "ivf", "ivfsq8", "ivfpq")
+FLAT_INDEX_FILE = "flat.faiss"
+# older faiss-cpu releases have no IO_FLAG_MMAP_IFC; IO_FLAG_MMAP there maps IVF lists only
+_MMAP_FLAT_CODES = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+# k-means wants roughly this many training vectors per centroid
+_POINTS_PER_CENTROID = 39
+
+
+def _auto_pq_m(dim: int) -> int:
+    m = max(1, dim // 16)
+    while dim % m:
+        m -= 1
+    return m
+
+
+def mmap_flags(index_type: str) -> int:
+    """read_index flags that map an index of this type read-only (codes for flat / sq / pq, lists for IVF)."""
+    mapped = faiss.IO_FLAG_MMAP if index_type.startswith("ivf") else _MMAP_FLAT_CODES
+    return mapped | faiss.IO_FLAG_READ_ONLY
+
+
+def index_spec(
+    ntotal: int,
+    dim: int,
+    index_type: str = INDEX_TYPE,
+    nlist: int = IVF_NLIST,
+    nprobe: int = IVF_NPROBE,
+    pq_m: int = PQ_M,
+    pq_nbits: int = PQ_NBITS,
+) -> Dict[str, Any]:
+    """Parameters (and the faiss factory string) for indexing ntotal vectors of size dim."""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown QCHAT_INDEX_TYPE {index_type!r}, expected one of {INDEX_TYPES}")
+    spec: Dict[str, Any] = {"type": index_type, "dim": dim, "ntotal": ntotal}
+    parts = []
+    if index_type.startswith("ivf"):
+        nlist = nlist or max(1, int(4 * math.sqrt(ntotal)))
+        nlist = min(nlist, ntotal // _POINTS_PER_CENTROID)
+        if nlist < 2:
+            return _flat_spec(spec, f"{ntotal} vectors are too few to train IVF")
+        spec.update(nlist=nlist, nprobe=min(nprobe, nlist))
+        parts.append(f"IVF{nlist}")
+    if index_type.endswith("pq"):
+        pq_m = pq_m or _auto_pq_m(dim)
+        if dim % pq_m:
+            raise ValueError(f"QCHAT_PQ_M={pq_m} must divide the embedding dimension {dim}")
+        if ntotal < _POINTS_PER_CENTROID * (1 << pq_nbits):
+            return _flat_spec(spec, f"{ntotal} vectors are too few to train PQ with {pq_nbits} bits")
+        spec.update(pq_m=pq_m, pq_nbits=pq_nbits)
+        parts.append(f"PQ{pq_m}x{pq_nbits}")
+    elif index_type.endswith("sq8"):
+        parts.append("SQ8")
+    elif index_type in ("flat", "ivf"):
+        parts.append("Flat")
+    spec["factory"] = ",".join(parts)
+    return spec
+
+
+def _flat_spec(spec: Dict[str, Any], reason: str) -> Dict[str, Any]:
+    return dict(spec, type="flat", factory="Flat", requested=spec["type"], fallback_reason=reason)
+
+
+def train_index(vectors: np.ndarray, spec: Dict[str, Any]) -> faiss.Index:
+    """Train and fill the index described by spec (L2, like LangChain's default)."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = faiss.index_factory(spec["dim"], spec["factory"], faiss.METRIC_L2)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    apply_search_params(index, spec.get("nprobe"))
+    return index
+
+
+def quantize(flat_index: faiss.Index, spec: Dict[str, Any]) -> faiss.Index:
+    started = time.perf_counter()
+    vectors = flat_index.reconstruct_n(0, flat_index.ntotal)
+    index = train_index(vectors, spec)
+    spec["train_seconds"] = round(time.perf_counter() - started, 3)
+    return index
+
+
+def apply_search_params(index: faiss.Index, nprobe: Optional[int] = None) -> None:
+    """Set IVF nprobe; without one, only a QCHAT_IVF_NPROBE override replaces the saved value."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is None:
+        return
+    nprobe = nprobe or int(os.getenv("QCHAT_IVF_NPROBE") or 0)
+    if nprobe:
+        ivf.nprobe = max(1, min(nprobe, ivf.nlist))
+
+
+def index_bytes(index: faiss.Index) -> int:
+    return int(faiss.serialize_index(index).size)
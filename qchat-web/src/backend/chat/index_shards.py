@@ -0,0 +1,173 @@
+"""
+Domain-sharded vector index with query-time shard routing.
+
+Published versions split the vectors by site into shards:
+
+    law        law.qu.edu, lawadm.qu.edu
+    medicine   medicine.qu.edu
+    lifelong   lifelonglearning.qu.edu
+    main       everything else (www.qu.edu, grad, catalog, athletics, ...)
+
+Each shard is its own FAISS index (shards/<name>.faiss, QCHAT_INDEX_TYPE
+trained per shard, flat when a shard is too small) wrapped in an IDMap2 that
+returns the chunk's position in the whole version, so every shard shares the
+one compact docstore (and a shard can reconstruct a vector by position).
+Searching all shards (faiss.IndexShards) gives the same hits as one index.
+route_shards() picks the shards a question is about and ShardedFAISS.view()
+searches only those: a question naming law, medicine or lifelong learning
+searches main plus that shard, any other question only main, so the common
+questions never scan (or spend candidates on) the professional-school
+pages. retrieve() searches every shard again when the routed ones have no
+hit closer than QCHAT_SHARD_FALLBACK_SCORE, so a law or medicine page stays
+reachable by a question that does not use the routing words. The same words
+decide whether answers may use law/medicine pages (chat/__init__.py).
+
+The exact vectors of the whole version are kept in flat.faiss for
+incremental builds to edit.
+"""
+
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+from urllib.parse import urlsplit
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from .index_quant import INDEX_TYPE, apply_search_params, index_spec, mmap_flags
+
+SHARDS_ENABLED = os.getenv("QCHAT_INDEX_SHARDS", "true").lower() == "true"
+
+SHARDS_DIR = "shards"
+MAIN_SHARD = "main"
+# hosts of each non-main shard
+SHARD_HOSTS = {
+    "law": ("law.qu.edu", "lawadm.qu.edu"),
+    "medicine": ("medicine.qu.edu",),
+    "lifelong": ("lifelonglearning.qu.edu",),
+}
+# a question matching one of these is routed to that shard (plus main)
+SHARD_KEYWORDS = {
+    "law": re.compile(
+        r"\b(law|laws|lawyers?|legal|attorneys?|paralegal|j\.?d\.?|juris doctor|bar (exam|passage)|school of law|lsat)\b",
+        re.I,
+    ),
+    "medicine": re.compile(
+        r"\b(medicine|medical|med school|netter|physicians?|physician assistant|m\.?d\.?|mcat)\b", re.I
+    ),
+    "lifelong": re.compile(r"\b(lifelong|continuing education|non-?credit|professional development)\b", re.I),
+}
+
+# routed shards whose best hit is no closer than this (L2 distance, like QCHAT_SCORE_THRESHOLD)
+# are not trusted: the question is searched over every shard
+SHARD_FALLBACK_SCORE = float(os.getenv("QCHAT_SHARD_FALLBACK_SCORE", os.getenv("QCHAT_SCORE_THRESHOLD", "0.9")))
+
+_HOST_SHARD = {host: name for name, hosts in SHARD_HOSTS.items() for host in hosts}
+
+
+def shard_of_host(host: str) -> str:
+    return _HOST_SHARD.get((host or "").lower(), MAIN_SHARD)
+
+
+def shard_for(source: str) -> str:
+    """Shard of a chunk, from its source URL's host."""
+    return shard_of_host(urlsplit(source or "").hostname or "")
+
+
+def named_shards(question: str) -> List[str]:
+    """Non-main shards a question names (SHARD_KEYWORDS)."""
+    return [name for name, pattern in SHARD_KEYWORDS.items() if pattern.search(question or "")]
+
+
+def route_shards(question: str) -> List[str]:
+    """Shards to search for a question: main, plus the shards it names."""
+    return [MAIN_SHARD] + named_shards(question)
+
+
+def write_shards(store: FAISS, folder: Path, index_type: str = INDEX_TYPE) -> dict:
+    """Write shards/<name>.faiss for a store; returns the index spec with a per-shard breakdown."""
+    ntotal, dim = store.index.ntotal, store.index.d
+    vectors = store.index.reconstruct_n(0, ntotal) if ntotal else np.zeros((0, dim), dtype=np.float32)
+    names = np.array([
+        shard_for(store.docstore.search(store.index_to_docstore_id[i]).metadata.get("source", ""))
+        for i in range(ntotal)
+    ])
+    (folder / SHARDS_DIR).mkdir()
+    shards = {}
+    for name in sorted(set(names.tolist())):
+        positions = np.flatnonzero(names == name).astype("int64")
+        spec = index_spec(len(positions), dim, index_type=index_type)
+        started = time.perf_counter()
+        index = faiss.index_factory(dim, f"IDMap2,{spec['factory']}", faiss.METRIC_L2)
+        subset = np.ascontiguousarray(vectors[positions])
+        if not index.is_trained:
+            index.train(subset)
+        index.add_with_ids(subset, positions)
+        spec["train_seconds"] = round(time.perf_counter() - started, 3)
+        apply_search_params(index, spec.get("nprobe"))
+        faiss.write_index(index, str(folder / SHARDS_DIR / f"{name}.faiss"))
+        shards[name] = spec
+    return {
+        "type": index_type,
+        "dim": dim,
+        "ntotal": ntotal,
+        "sharded": True,
+        "shards": shards,
+        "train_seconds": round(sum(spec["train_seconds"] for spec in shards.values()), 3),
+    }
+
+
+def _combine(indexes: Sequence[faiss.Index], dim: int) -> faiss.Index:
+    if len(indexes) == 1:
+        return indexes[0]
+    # ids are global positions already (successive_ids=False); one query is too small to thread
+    combined = faiss.IndexShards(dim, False, False)
+    for index in indexes:
+        combined.add_shard(index)
+    return combined
+
+
+def load_shard_indexes(folder: Path, shard_types: Dict[str, str], mmap: bool) -> Dict[str, faiss.Index]:
+    shards = {}
+    for name, index_type in shard_types.items():
+        flags = mmap_flags(index_type) if mmap else 0
+        index = faiss.read_index(str(folder / SHARDS_DIR / f"{name}.faiss"), flags)
+        apply_search_params(index)
+        shards[name] = index
+    return shards
+
+
+class ShardedFAISS(FAISS):
+    """FAISS store over per-domain shards; searches all of them unless narrowed with view()."""
+
+    def __init__(self, embedding_function, shards: Dict[str, faiss.Index], docstore, index_to_docstore_id):
+        self.shards = shards
+        self._views: Dict[tuple, FAISS] = {}
+        dim = next(iter(shards.values())).d
+        super().__init__(embedding_function, _combine(list(shards.values()), dim), docstore, index_to_docstore_id)
+
+    def view(self, names: Optional[Iterable[str]]) -> FAISS:
+        """A store searching only the named shards (unknown names are ignored; None = all)."""
+        if names is None:
+            return self
+        key = tuple(sorted(set(n for n in names if n in self.shards)))
+        if not key or len(key) == len(self.shards):
+            return self
+        view = self._views.get(key)
+        if view is None:
+            view = FAISS(
+                self.embedding_function,
+                _combine([self.shards[n] for n in key], self.index.d),
+                self.docstore,
+                self.index_to_docstore_id,
+            )
+            self._views[key] = view
+        return view
+
+
+def shard_view(store: FAISS, names: Optional[Iterable[str]]) -> FAISS:
+    """store narrowed to the named shards; unsharded stores are returned as they are."""
+    return store.view(names) if isinstance(store, ShardedFAISS) else store
@@ -0,0 +1,103 @@
+"""
+Versioned on-disk layout for the FAISS index.
+
+Each build is written into its own directory under versions/ and only becomes
+visible once it is complete, by atomically replacing the CURRENT pointer file:
+
+    faiss_index/
+        CURRENT                  -> "20261017T020013482113-3f9a1c"
+        versions/
+            20261017T020013482113-3f9a1c/
+                index.faiss, url_manifest.json
+                texts.bin, texts.idx, docstore.sqlite3   (compact docstore, see mmap_store.py)
+                flat.faiss           (exact vectors, only when index.faiss is quantized)
+
+Readers resolve CURRENT and load that directory, so a worker starting during
+a build never sees a half-written index. Indexes saved straight into
+faiss_index/ by older builds are still picked up as the "legacy" version.
+"""
+
+import os
+import shutil
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Tuple
+
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+LEGACY_VERSION = "legacy"
+
+# how many published versions to keep on disk (the current one is never removed)
+KEEP_VERSIONS = int(os.getenv("QCHAT_INDEX_KEEP_VERSIONS", "3"))
+
+
+def current_version(index_dir: Path) -> Optional[str]:
+    """Cheap check of which version is live: one small file read."""
+    try:
+        version = (index_dir / CURRENT_FILE).read_text(encoding="utf-8").strip()
+    except OSError:
+        version = ""
+    if version:
+        return version
+    if (index_dir / "index.faiss").exists():
+        return LEGACY_VERSION
+    return None
+
+
+def version_path(index_dir: Path, version: str) -> Path:
+    if version == LEGACY_VERSION:
+        return index_dir
+    return index_dir / VERSIONS_DIR / version
+
+
+def resolve_current(index_dir: Path) -> Tuple[Optional[Path], Optional[str]]:
+    """Return (directory, version) of the live index, or (None, None) if there is none."""
+    version = current_version(index_dir)
+    if version is None:
+        return None, None
+    path = version_path(index_dir, version)
+    if not path.exists():
+        return None, None
+    return path, version
+
+
+def stage_version(index_dir: Path) -> Path:
+    """Create an empty, not-yet-visible directory for a new build to write into."""
+    versions = index_dir / VERSIONS_DIR
+    versions.mkdir(parents=True, exist_ok=True)
+    staged = versions / f".staging-{uuid.uuid4().hex[:8]}"
+    staged.mkdir()
+    return staged
+
+
+def discard_version(staged: Path) -> None:
+    shutil.rmtree(staged, ignore_errors=True)
+
+
+def publish_version(index_dir: Path, staged: Path) -> str:
+    """Move a finished staging directory into place and flip CURRENT to it."""
+    # names sort in publish order (microsecond timestamp first)
+    version = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:6]}"
+    final = index_dir / VERSIONS_DIR / version
+    os.replace(staged, final)
+    tmp = index_dir / f"{CURRENT_FILE}.tmp"
+    tmp.write_text(version, encoding="utf-8")
+    os.replace(tmp, index_dir / CURRENT_FILE)
+    prune_versions(index_dir, keep=KEEP_VERSIONS)
+    return version
+
+
+def prune_versions(index_dir: Path, keep: int = KEEP_VERSIONS) -> None:
+    versions = index_dir / VERSIONS_DIR
+    if not versions.exists():
+        return
+    live = current_version(index_dir)
+    published = sorted(
+        (p for p in versions.iterdir() if p.is_dir() and not p.name.startswith(".")),
+        key=lambda p: p.name,
+        reverse=True,
+    )
+    for old in published[max(1, keep):]:
+        if old.name != live:
+            shutil.rmtree(old, ignore_errors=True)
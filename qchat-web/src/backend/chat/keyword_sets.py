@@ -0,0 +1,80 @@
+"""
+Precomputed keyword sets for retrieve()'s keyword rerank.
+
+The rerank counts how many of the question's keywords (alphanumeric words of
+3+ characters) occur in a chunk's first 1500 characters or its source URL.
+Instead of lowercasing and substring-scanning that text for every candidate
+of every query, each chunk's keyword set is computed once at publish time and
+stored in docstore.sqlite3 (chunks.keywords):
+
+    sorted, distinct uint32 CRC-32 hashes of every word of the text and URL
+    and of each word's prefixes of 3+ characters
+
+Prefixes keep the old substring behaviour for the common cases ("exam" still
+matches "exams", "regist" matches "registration"); a keyword that only occurs
+inside a longer word no longer counts. Compact stores hand out
+KeywordedDocument with the hashes attached, so scoring a query's candidates is
+one vectorized pass over their concatenated hashes. Documents without precomputed
+hashes (in-memory stores, versions published before this) are hashed on the
+fly.
+"""
+
+import re
+import zlib
+from typing import List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from pydantic import Field
+
+# characters of page text the rerank looks at (plus the source URL)
+KEYWORD_TEXT_CHARS = 1500
+MIN_KEYWORD_LEN = 3
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+class KeywordedDocument(Document):
+    """Document carrying its chunk's precomputed keyword hashes (not part of its serialized form)."""
+
+    keywords: Optional[bytes] = Field(default=None, exclude=True, repr=False)
+
+
+def _hash(term: str) -> int:
+    return zlib.crc32(term.encode("utf-8"))
+
+
+def chunk_keywords(doc: Document) -> bytes:
+    """Keyword hashes of a chunk, as stored in chunks.keywords (little-endian uint32, sorted)."""
+    text = f"{doc.page_content[:KEYWORD_TEXT_CHARS]} {doc.metadata.get('source', '')}".lower()
+    terms = set()
+    for word in set(_WORD.findall(text)):
+        terms.update(word[:end] for end in range(MIN_KEYWORD_LEN, len(word) + 1))
+    hashes = np.unique(np.fromiter((_hash(t) for t in terms), dtype=np.uint32, count=len(terms)))
+    return hashes.astype("<u4").tobytes()
+
+
+def question_keywords(question: str) -> np.ndarray:
+    """Hashes of the question's distinct keywords."""
+    words = {w for w in _WORD.findall((question or "").lower()) if len(w) >= MIN_KEYWORD_LEN}
+    return np.fromiter((_hash(w) for w in words), dtype=np.uint32, count=len(words))
+
+
+def keyword_overlap_scores(question: str, docs: Sequence[Document]) -> List[int]:
+    """Number of the question's keywords found in each doc."""
+    wanted = question_keywords(question)
+    if not len(wanted) or not docs:
+        return [0] * len(docs)
+    blobs = [
+        doc.keywords if isinstance(doc, KeywordedDocument) and doc.keywords is not None else chunk_keywords(doc)
+        for doc in docs
+    ]
+    hashes = np.frombuffer(b"".join(blobs), dtype="<u4")
+    # a few keywords: one comparison pass each is cheaper than np.isin
+    found = hashes == wanted[0]
+    for value in wanted[1:]:
+        found |= hashes == value
+    # hashes are distinct per chunk, so each hit is one keyword found in the chunk it falls in
+    ends = np.cumsum(np.fromiter(map(len, blobs), dtype=np.intp, count=len(blobs)) // 4)
+    owners = np.searchsorted(ends, np.flatnonzero(found), side="right")
+    return np.bincount(owners, minlength=len(docs)).tolist()
@@ -0,0 +1,138 @@
+"""
+BM25 lexical index, searched next to the vector index and fused with it.
+
+Every published version gets bm25/ next to its FAISS files:
+
+    terms.json        vocabulary (term -> term id, in id order)
+    offsets.npy       int64, start of each term's postings (plus the end)
+    postings.npy      int32 index positions, grouped by term
+    freqs.npy         uint16 term frequency of each posting
+    doc_lengths.npy   uint32 tokens per chunk
+
+Chunks are tokenized (page text plus source URL) into lowercase words;
+course codes like "CIS 101" / "cis-101" also get a joined "cis101" token, so
+a question naming a course finds its pages even when the embedding does not.
+Workers load the arrays memory-mapped like the rest of the version.
+
+retrieve() runs the BM25 search in a thread while the question is embedded
+and searched in FAISS, then merges the two rankings with reciprocal rank
+fusion (score = sum of 1 / (QCHAT_RRF_K + rank)).
+"""
+
+import json
+import math
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from .mmap_store import INDEX_MMAP
+
+HYBRID_ENABLED = os.getenv("QCHAT_HYBRID_SEARCH", "true").lower() == "true"
+BM25_K1 = float(os.getenv("QCHAT_BM25_K1", "1.2"))
+BM25_B = float(os.getenv("QCHAT_BM25_B", "0.75"))
+RRF_K = int(os.getenv("QCHAT_RRF_K", "60"))
+
+LEXICAL_DIR = "bm25"
+_TOKEN = re.compile(r"[a-z0-9]+")
+_COURSE_CODE = re.compile(r"\b([a-z]{2,4})[\s-](\d{3}[a-z]?)\b")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it its of on or that the this to was what "
+    "when where which who will with you your do does can https http www edu".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    text = (text or "").lower()
+    tokens = [t for t in _TOKEN.findall(text) if len(t) > 1 and t not in _STOPWORDS]
+    tokens.extend(a + b for a, b in _COURSE_CODE.findall(text))
+    return tokens
+
+
+def _chunk_text(store: FAISS, position: int) -> str:
+    doc = store.docstore.search(store.index_to_docstore_id[position])
+    return f"{doc.page_content} {doc.metadata.get('source', '')}"
+
+
+def write_lexical_index(store: FAISS, folder: Path) -> dict:
+    """Write bm25/ for a store (postings use its index positions); returns term / posting counts."""
+    vocab: Dict[str, int] = {}
+    term_ids, doc_ids, freqs = [], [], []
+    ntotal = store.index.ntotal
+    lengths = np.zeros(ntotal, dtype=np.uint32)
+    for position in range(ntotal):
+        tokens = tokenize(_chunk_text(store, position))
+        lengths[position] = len(tokens)
+        for term, count in Counter(tokens).items():
+            term_ids.append(vocab.setdefault(term, len(vocab)))
+            doc_ids.append(position)
+            freqs.append(min(count, 65535))
+    term_ids = np.asarray(term_ids, dtype=np.int64)
+    order = np.argsort(term_ids, kind="stable")
+    offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(term_ids, minlength=len(vocab)), out=offsets[1:])
+    out = folder / LEXICAL_DIR
+    out.mkdir()
+    np.save(out / "offsets.npy", offsets)
+    np.save(out / "postings.npy", np.asarray(doc_ids, dtype=np.int32)[order])
+    np.save(out / "freqs.npy", np.asarray(freqs, dtype=np.uint16)[order])
+    np.save(out / "doc_lengths.npy", lengths)
+    (out / "terms.json").write_text(json.dumps(list(vocab)), encoding="utf-8")
+    return {"terms": len(vocab), "postings": len(doc_ids)}
+
+
+class LexicalIndex:
+    """Read side of bm25/: BM25 top-k over index positions."""
+
+    def __init__(self, folder: Path, mmap: bool = INDEX_MMAP):
+        folder = folder / LEXICAL_DIR
+        mode = "r" if mmap else None
+        self._terms = {term: i for i, term in enumerate(json.loads((folder / "terms.json").read_text(encoding="utf-8")))}
+        self._offsets = np.load(folder / "offsets.npy", mmap_mode=mode)
+        self._postings = np.load(folder / "postings.npy", mmap_mode=mode)
+        self._freqs = np.load(folder / "freqs.npy", mmap_mode=mode)
+        lengths = np.load(folder / "doc_lengths.npy").astype(np.float32)
+        self.size = len(lengths)
+        avg = float(lengths.mean()) if self.size else 1.0
+        # the length part of BM25's denominator, per chunk
+        self._norm = (BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(avg, 1.0))).astype(np.float32)
+
+    @classmethod
+    def load(cls, folder: Path, mmap: bool = INDEX_MMAP) -> Optional["LexicalIndex"]:
+        if not (folder / LEXICAL_DIR / "terms.json").exists():
+            return None
+        return cls(folder, mmap)
+
+    def search(self, question: str, k: int, allowed: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """(position, score) of the k best chunks; allowed masks out positions before ranking."""
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(question)):
+            term_id = self._terms.get(term)
+            if term_id is None:
+                continue
+            start, end = int(self._offsets[term_id]), int(self._offsets[term_id + 1])
+            docs = self._postings[start:end]
+            tf = self._freqs[start:end].astype(np.float32)
+            idf = math.log(1 + (self.size - (end - start) + 0.5) / ((end - start) + 0.5))
+            # each chunk appears once per term, so plain fancy-index += is safe
+            scores[docs] += idf * tf * (BM25_K1 + 1) / (tf + self._norm[docs])
+        if allowed is not None:
+            scores[~allowed] = 0
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(int(i), float(scores[i])) for i in hits]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int = RRF_K) -> List[Hashable]:
+    """Merge ranked key lists; earlier lists win ties."""
+    fused: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused, key=lambda key: fused[key], reverse=True)
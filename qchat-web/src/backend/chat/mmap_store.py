@@ -0,0 +1,231 @@
+"""
+Compact, memory-mapped on-disk layout of a published index.
+
+Every version stores, next to index.faiss:
+
+    texts.bin          chunk texts (utf-8), concatenated in index position order
+    texts.idx          uint64 byte offsets into texts.bin, one per chunk plus the end
+    docstore.sqlite3   chunks(position, id, metadata, keywords) table + meta(key, value)
+
+Sharded versions (see index_shards.py) have shards/<name>.faiss instead of
+index.faiss; the texts and the table are shared by all shards.
+
+This replaces LangChain's pickled docstore (index.pkl). Chat workers open
+index.faiss and texts.bin with mmap, so every worker process on a host shares
+the same page-cache pages, and nothing is deserialized at startup: a search
+looks up the ids and metadata of its hits in sqlite and decodes only those
+chunks' text. chunks.keywords holds each chunk's precomputed keyword hashes
+for the rerank (keyword_sets.py; absent in older versions). Builds load an
+editable, in-memory copy instead.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Iterator, List, Optional, Union
+
+import faiss
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from .index_quant import mmap_flags
+from .index_shards import SHARDS_DIR, ShardedFAISS, load_shard_indexes
+from .keyword_sets import KeywordedDocument, chunk_keywords
+
+INDEX_MMAP = os.getenv("QCHAT_INDEX_MMAP", "true").lower() == "true"
+
+INDEX_FILE = "index.faiss"
+TEXTS_FILE = "texts.bin"
+OFFSETS_FILE = "texts.idx"
+DOCSTORE_FILE = "docstore.sqlite3"
+STORE_FORMAT = "1"
+
+
+def write_compact_store(store: FAISS, folder: Path, index_type: str = "flat", shards: Optional[dict] = None) -> None:
+    """Write texts.bin / texts.idx / docstore.sqlite3 for a store (positions match index.faiss).
+
+    shards maps shard name -> index type when the version is sharded.
+    """
+    ntotal = store.index.ntotal
+    offsets = np.zeros(ntotal + 1, dtype="<u8")
+    rows = []
+    with open(folder / TEXTS_FILE, "wb") as f:
+        for position in range(ntotal):
+            doc_id = store.index_to_docstore_id[position]
+            doc = store.docstore.search(doc_id)
+            data = doc.page_content.encode("utf-8")
+            f.write(data)
+            offsets[position + 1] = offsets[position] + len(data)
+            rows.append((position, doc_id, json.dumps(doc.metadata, separators=(",", ":")), chunk_keywords(doc)))
+    offsets.tofile(folder / OFFSETS_FILE)
+    conn = sqlite3.connect(str(folder / DOCSTORE_FILE))
+    try:
+        conn.execute(
+            "CREATE TABLE chunks (position INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, metadata TEXT, keywords BLOB)"
+        )
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", rows)
+        conn.executemany(
+            "INSERT INTO meta VALUES (?, ?)",
+            [("format", STORE_FORMAT), ("index_type", index_type), ("count", str(ntotal))]
+            + ([("shards", json.dumps(shards))] if shards else []),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def has_compact_store(folder: Path) -> bool:
+    if not ((folder / INDEX_FILE).exists() or (folder / SHARDS_DIR).is_dir()):
+        return False
+    return all((folder / name).exists() for name in (TEXTS_FILE, OFFSETS_FILE, DOCSTORE_FILE))
+
+
+class _ChunkTable:
+    """Read-only view of one version's chunk texts (mmap or in memory) and sqlite table."""
+
+    def __init__(self, folder: Path, mmap: bool = True):
+        # immutable: published versions never change, so sqlite skips locking entirely
+        uri = f"{folder.resolve().as_uri()}/{DOCSTORE_FILE}?mode=ro&immutable=1"
+        self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.meta = dict(self._query("SELECT key, value FROM meta"))
+        self.has_keywords = any(row[1] == "keywords" for row in self._query("PRAGMA table_info(chunks)"))
+        if mmap:
+            self._offsets = np.memmap(folder / OFFSETS_FILE, dtype="<u8", mode="r")
+        else:
+            self._offsets = np.fromfile(folder / OFFSETS_FILE, dtype="<u8")
+        if int(self._offsets[-1]) == 0:
+            # np.memmap cannot map an empty file
+            self._texts = np.zeros(0, dtype=np.uint8)
+        elif mmap:
+            self._texts = np.memmap(folder / TEXTS_FILE, dtype=np.uint8, mode="r")
+        else:
+            self._texts = np.fromfile(folder / TEXTS_FILE, dtype=np.uint8)
+
+    def _query(self, sql: str, args: tuple = ()) -> list:
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def text(self, position: int) -> str:
+        start, end = int(self._offsets[position]), int(self._offsets[position + 1])
+        return self._texts[start:end].tobytes().decode("utf-8")
+
+    def id_at(self, position: int) -> Optional[str]:
+        rows = self._query("SELECT id FROM chunks WHERE position = ?", (position,))
+        return rows[0][0] if rows else None
+
+    def lookup(self, doc_id: str) -> Optional[tuple]:
+        """(position, metadata, keywords) of a chunk; keywords is None for older versions."""
+        if self.has_keywords:
+            rows = self._query("SELECT position, metadata, keywords FROM chunks WHERE id = ?", (doc_id,))
+        else:
+            rows = self._query("SELECT position, metadata, NULL FROM chunks WHERE id = ?", (doc_id,))
+        return rows[0] if rows else None
+
+    def positions(self, doc_ids: List[str]) -> List[Optional[int]]:
+        marks = ",".join("?" * len(doc_ids))
+        found = dict(self._query(f"SELECT id, position FROM chunks WHERE id IN ({marks})", tuple(doc_ids)))
+        return [found.get(doc_id) for doc_id in doc_ids]
+
+    def rows(self) -> List[tuple]:
+        return self._query("SELECT position, id, metadata FROM chunks ORDER BY position")
+
+    def sources(self) -> List[str]:
+        rows = self._query("SELECT json_extract(metadata, '$.source') FROM chunks ORDER BY position")
+        return [source or "" for (source,) in rows]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class _PositionIds(Mapping):
+    """index_to_docstore_id for FAISS, resolved from sqlite on access instead of held in a dict."""
+
+    def __init__(self, table: _ChunkTable):
+        self._table = table
+
+    def __getitem__(self, position: int) -> str:
+        doc_id = self._table.id_at(int(position))
+        if doc_id is None:
+            raise KeyError(position)
+        return doc_id
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(len(self._table)))
+
+
+class CompactDocstore(Docstore):
+    """Read-only docstore: metadata from sqlite, page_content decoded from texts.bin per lookup."""
+
+    def __init__(self, table: _ChunkTable):
+        self._table = table
+
+    def search(self, search: str) -> Union[str, Document]:
+        row = self._table.lookup(search)
+        if row is None:
+            return f"ID {search} not found."
+        position, metadata, keywords = row
+        return KeywordedDocument(
+            id=search,
+            page_content=self._table.text(position),
+            metadata=json.loads(metadata or "{}"),
+            keywords=keywords,
+        )
+
+    def sources(self) -> List[str]:
+        """Source URL of every chunk, by index position."""
+        return self._table.sources()
+
+    def positions(self, doc_ids: List[str]) -> List[Optional[int]]:
+        """Index position of each id (None if unknown)."""
+        return self._table.positions(doc_ids) if doc_ids else []
+
+
+def load_compact_store(folder: Path, embeddings: Embeddings, mmap: bool = INDEX_MMAP) -> Optional[FAISS]:
+    """Read-only FAISS store over a version's compact files, or None if it has none."""
+    if not has_compact_store(folder):
+        return None
+    table = _ChunkTable(folder, mmap=mmap)
+    if table.meta.get("format") != STORE_FORMAT:
+        return None
+    if "shards" in table.meta:
+        shards = load_shard_indexes(folder, json.loads(table.meta["shards"]), mmap)
+        return ShardedFAISS(embeddings, shards, CompactDocstore(table), _PositionIds(table))
+    # flat-code indexes (flat / sq / pq) map their codes; IVF maps its inverted lists
+    flags = mmap_flags(table.meta.get("index_type", "flat")) if mmap else 0
+    return FAISS(
+        embedding_function=embeddings,
+        index=faiss.read_index(str(folder / INDEX_FILE), flags),
+        docstore=CompactDocstore(table),
+        index_to_docstore_id=_PositionIds(table),
+    )
+
+
+def load_editable_store(folder: Path, embeddings: Embeddings, index_file: str = INDEX_FILE) -> FAISS:
+    """Fully in-memory store (InMemoryDocstore + dict ids) that builds can add to and delete from."""
+    table = _ChunkTable(folder, mmap=False)
+    docs, ids = {}, {}
+    for position, doc_id, metadata in table.rows():
+        docs[doc_id] = Document(id=doc_id, page_content=table.text(position), metadata=json.loads(metadata or "{}"))
+        ids[position] = doc_id
+    table.close()
+    return FAISS(
+        embedding_function=embeddings,
+        index=faiss.read_index(str(folder / index_file)),
+        docstore=InMemoryDocstore(docs),
+        index_to_docstore_id=ids,
+    )
@@ -0,0 +1,74 @@
+"""
+Maximal marginal relevance (MMR) selection of retrieved chunks.
+
+Neighbouring chunks of one page, and pages that repeat each other, tend to be
+retrieved together and then fill the prompt with the same facts. mmr_select()
+picks k of the candidates one at a time, each time the one maximizing
+
+    lambda * relevance - (1 - lambda) * max cosine similarity to the chunks already picked
+
+over the candidates' embedding matrix: the similarity matrix is computed once
+and every step is a vectorized update over all candidates. lambda = 1 keeps
+the relevance order unchanged; lower values trade relevance for diversity.
+
+The vectors come from the version's full-precision flat index (flat.faiss, or
+index.faiss when that is flat), memory-mapped like the search index and looked
+up by index position (ChunkVectors).
+"""
+
+import os
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import faiss
+import numpy as np
+
+from .index_quant import FLAT_INDEX_FILE, mmap_flags
+from .mmap_store import INDEX_MMAP
+
+MMR_ENABLED = os.getenv("QCHAT_MMR", "true").lower() == "true"
+MMR_LAMBDA = float(os.getenv("QCHAT_MMR_LAMBDA", "0.7"))
+
+
+def mmr_select(relevance: Sequence[float], vectors: np.ndarray, k: int, lambda_mult: float = MMR_LAMBDA) -> List[int]:
+    """Indices of the k candidates picked by MMR, in pick order."""
+    count = min(k, len(relevance))
+    if count <= 0:
+        return []
+    relevance = np.asarray(relevance, dtype=np.float32)
+    unit = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(unit, axis=1, keepdims=True)
+    unit /= np.where(norms > 0, norms, 1)
+    similarity = unit @ unit.T
+    # max similarity of each candidate to the picked ones (nothing picked yet)
+    redundancy = np.zeros(len(relevance), dtype=np.float32)
+    gain = lambda_mult * relevance
+    picked = []
+    for _ in range(count):
+        scores = gain - (1 - lambda_mult) * redundancy
+        scores[picked] = -np.inf
+        best = int(np.argmax(scores))
+        picked.append(best)
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return picked
+
+
+class ChunkVectors:
+    """Full-precision embedding of each chunk by index position."""
+
+    def __init__(self, index: faiss.Index):
+        self._index = index
+
+    @classmethod
+    def load(cls, folder: Path, search_index: faiss.Index, mmap: bool = INDEX_MMAP) -> Optional["ChunkVectors"]:
+        """Vectors of a version: flat.faiss if it has one, else its search index when that is flat."""
+        index = search_index
+        if (folder / FLAT_INDEX_FILE).exists():
+            flags = mmap_flags("flat") if mmap else 0
+            index = faiss.read_index(str(folder / FLAT_INDEX_FILE), flags)
+        if not isinstance(faiss.downcast_index(index), faiss.IndexFlat):
+            return None
+        return cls(index)
+
+    def get(self, positions: Sequence[int]) -> np.ndarray:
+        return self._index.reconstruct_batch(np.asarray(positions, dtype=np.int64))
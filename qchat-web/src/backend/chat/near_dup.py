@@ -0,0 +1,146 @@
+"""
+Near-duplicate chunk detection for index builds.
+
+Many qu.edu pages repeat the same blocks, and qu_docs.txt lists query-string
+variants of one page (programs-listing/?Degree=...). Each chunk gets a 64-bit
+SimHash over word 3-shingles; a chunk whose fingerprint is within
+QCHAT_SIMHASH_MAX_DISTANCE bits of one already kept (or whose normalized text
+is identical) is dropped before it is embedded.
+
+A dropped chunk only stays searchable while the page that kept it keeps it,
+so filter() also returns the other pages that held a page's dropped chunks;
+they are stored as the page's "dup_of" in the url manifest, and an incremental
+build fetches and splits a page again when one of them changed or was removed
+(RAG._recheck_dependents).
+
+Lookups use the pigeonhole trick: the fingerprint is split into
+max_distance + 1 bands, and any fingerprint within max_distance bits must match
+at least one band exactly, so only those candidates are compared.
+"""
+
+import hashlib
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+DEDUP_ENABLED = os.getenv("QCHAT_DEDUP_CHUNKS", "true").lower() == "true"
+SIMHASH_MAX_DISTANCE = int(os.getenv("QCHAT_SIMHASH_MAX_DISTANCE", "3"))
+# passes an incremental build makes over pages whose duplicates moved (each can move more)
+DEDUP_RECHECK_ROUNDS = 5
+
+_TOKEN_RE = re.compile(r"\w+")
+# owner prefix for fingerprints seeded from the previous index
+_PREVIOUS = "previous:"
+_BIT_WEIGHTS = (1 << np.arange(64, dtype=np.uint64)).astype(np.uint64)
+
+
+def _normalize(text: str) -> str:
+    return " ".join(_TOKEN_RE.findall(text.lower()))
+
+
+def simhash(text: str, shingle: int = 3) -> int:
+    tokens = _TOKEN_RE.findall(text.lower())
+    if not tokens:
+        return 0
+    if len(tokens) < shingle:
+        grams = [" ".join(tokens)]
+    else:
+        grams = [" ".join(tokens[i:i + shingle]) for i in range(len(tokens) - shingle + 1)]
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "little") for g in grams),
+        dtype=np.uint64,
+        count=len(grams),
+    )
+    # per-bit vote: bit set in more than half the shingle hashes -> set in the fingerprint
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 > len(grams)
+    return int(np.bitwise_or.reduce(_BIT_WEIGHTS[votes], initial=np.uint64(0)))
+
+
+def _hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class NearDuplicateFilter:
+    """Keeps the first copy of each (near-)duplicate chunk seen during one build."""
+
+    def __init__(self, max_distance: int = SIMHASH_MAX_DISTANCE):
+        self.max_distance = max(0, max_distance)
+        self._bands = self.max_distance + 1
+        self._band_bits = 64 // self._bands
+        self._band_mask = (1 << self._band_bits) - 1
+        # band index -> band value -> [(fingerprint, owner url)]
+        self._buckets: List[Dict[int, List[Tuple[int, str]]]] = [{} for _ in range(self._bands)]
+        self._exact: Dict[str, str] = {}
+        # page -> pages whose chunks from the previous index it matched; those may have
+        # changed in this build, after the match
+        self.stale: Dict[str, Set[str]] = {}
+        self.checked = 0
+        self.exact_removed = 0
+        self.near_removed = 0
+
+    def _band_values(self, fp: int) -> Iterable[Tuple[int, int]]:
+        for i in range(self._bands):
+            yield i, (fp >> (i * self._band_bits)) & self._band_mask
+
+    def _add(self, owner: str, fp: int) -> None:
+        for i, value in self._band_values(fp):
+            self._buckets[i].setdefault(value, []).append((fp, owner))
+
+    def _near_match(self, owner: str, fp: int) -> Optional[str]:
+        """Owner of a kept chunk within max_distance bits of fp, if any."""
+        replaced = _PREVIOUS + owner
+        for i, value in self._band_values(fp):
+            for other, other_owner in self._buckets[i].get(value, ()):
+                # the page's own previous chunks are about to be replaced, so they don't count
+                if other_owner != replaced and _hamming(fp, other) <= self.max_distance:
+                    return other_owner
+        return None
+
+    def seed(self, owner: str, fingerprints: Iterable[str]) -> None:
+        """Register chunks already in the index (hex fingerprints from the url manifest)."""
+        for fp in fingerprints:
+            self._add(_PREVIOUS + owner, int(fp, 16))
+
+    def remember(self, owner: str, texts: List[str], fingerprints: List[str], dup_of: Iterable[str] = ()) -> None:
+        """Register chunks kept earlier in this build (e.g. replayed from a checkpoint)."""
+        # which matches were against the previous index is not known any more
+        self.stale[owner] = set(dup_of)
+        for text, fp in zip(texts, fingerprints):
+            self._exact[hashlib.sha1(_normalize(text).encode("utf-8")).hexdigest()] = owner
+            self._add(owner, int(fp, 16))
+
+    def filter(self, owner: str, texts: List[str]) -> Tuple[List[str], List[str], List[str]]:
+        """Return (kept texts, their hex fingerprints, other pages holding the dropped ones) for one page's chunks."""
+        kept, fingerprints, holders = [], [], set()
+        for text in texts:
+            self.checked += 1
+            exact_key = hashlib.sha1(_normalize(text).encode("utf-8")).hexdigest()
+            if exact_key in self._exact:
+                self.exact_removed += 1
+                holders.add(self._exact[exact_key])
+                continue
+            fp = simhash(text)
+            holder = self._near_match(owner, fp)
+            if holder is not None:
+                self.near_removed += 1
+                holders.add(holder)
+                continue
+            self._exact[exact_key] = owner
+            self._add(owner, fp)
+            kept.append(text)
+            fingerprints.append(f"{fp:016x}")
+        holders.discard(owner)
+        self.stale[owner] = {h[len(_PREVIOUS):] for h in holders if h.startswith(_PREVIOUS)}
+        dup_of = {h[len(_PREVIOUS):] if h.startswith(_PREVIOUS) else h for h in holders}
+        return kept, fingerprints, sorted(dup_of)
+
+    def report(self) -> str:
+        removed = self.exact_removed + self.near_removed
+        pct = (100.0 * removed / self.checked) if self.checked else 0.0
+        return (
+            f"[RAG] Duplicate chunks removed: {removed} of {self.checked} ({pct:.1f}%) "
+            f"| exact: {self.exact_removed} | near (<= {self.max_distance} bits): {self.near_removed}"
+        )
@@ -0,0 +1,155 @@
+"""
+In-process caches for the chat workers' query path.
+
+LRUCache is a bounded, thread-safe map whose entries also expire after a
+TTL; it counts hits, misses, evictions and expirations so the health action
+can report how well each cache is sized.
+
+CachedQueryEmbeddings wraps the embeddings a loaded index searches with:
+embed_query results are kept per (embed model, normalized question), so a
+repeated question ("dining hall hours", "when are finals") is not sent to
+Ollama again. The cache is module-level, so it survives index hot reloads
+(the vectors only depend on the model and the text).
+
+RETRIEVAL_RESULTS holds whole retrieve() results keyed by (normalized
+question, k, shards, source filter, index version); it is cleared when a new
+index version is hot-reloaded, so a cached result never outlives its index.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+# config
+QUERY_EMBED_CACHE_SIZE = int(os.getenv("QCHAT_QUERY_EMBED_CACHE_SIZE", "2048"))
+QUERY_EMBED_CACHE_TTL = float(os.getenv("QCHAT_QUERY_EMBED_CACHE_TTL", "86400"))
+RETRIEVAL_CACHE_SIZE = int(os.getenv("QCHAT_RETRIEVAL_CACHE_SIZE", "1024"))
+# results are only invalidated by a new index version unless this is set
+RETRIEVAL_CACHE_TTL = float(os.getenv("QCHAT_RETRIEVAL_CACHE_TTL", "0"))
+
+_SPACES = re.compile(r"\s+")
+_EDGE_PUNCT = " \t\n?!.,;:"
+
+
+def normalize_question(text: str) -> str:
+    """Cache key form of a question: lowercase, single spaces, no surrounding punctuation."""
+    return _SPACES.sub(" ", (text or "").lower()).strip(_EDGE_PUNCT)
+
+
+class LRUCache:
+    """Thread-safe LRU map with a per-entry TTL (seconds; 0 = no expiry) and hit/miss counters."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float = 0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] is not None and entry[0] <= now:
+                del self._data[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if not self.enabled:
+            return
+        expires = time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "maxEntries": self.max_entries,
+                "ttlSeconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+QUERY_EMBEDDINGS = LRUCache(QUERY_EMBED_CACHE_SIZE, QUERY_EMBED_CACHE_TTL)
+RETRIEVAL_RESULTS = LRUCache(RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_TTL)
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Embeddings wrapper serving repeated embed_query calls from QUERY_EMBEDDINGS."""
+
+    def __init__(self, inner: Embeddings, model: str, cache: Optional[LRUCache] = None):
+        self.inner = inner
+        self.model = model
+        self.cache = cache if cache is not None else QUERY_EMBEDDINGS
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        if not self.cache.enabled:
+            return self.inner.embed_query(text)
+        key = (self.model, normalize_question(text))
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = tuple(self.inner.embed_query(text))
+            self.cache.put(key, vector)
+        return list(vector)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """embed_query for many questions; the ones not cached go to the model as one batch."""
+        keys = [(self.model, normalize_question(t)) for t in texts]
+        found: Dict[Hashable, tuple] = {}
+        missing: Dict[Hashable, str] = {}
+        for key, text in zip(keys, texts):
+            if key in found or key in missing:
+                continue
+            vector = self.cache.get(key) if self.cache.enabled else None
+            if vector is None:
+                missing[key] = text
+            else:
+                found[key] = vector
+        if len(missing) == 1:
+            key, text = next(iter(missing.items()))
+            found[key] = tuple(self.inner.embed_query(text))
+        elif missing:
+            vectors = self.inner.embed_documents(list(missing.values()))
+            found.update((key, tuple(v)) for key, v in zip(missing, vectors))
+        for key in missing:
+            self.cache.put(key, found[key])
+        return [list(found[key]) for key in keys]
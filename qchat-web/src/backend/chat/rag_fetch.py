@@ -0,0 +1,209 @@
+"""
+Concurrent page fetcher for the RAG index build.
+
+Pages are fetched on a thread pool. Each host gets its own concurrency cap and
+a politeness delay between request starts, so qu.edu is never hit harder than
+QCHAT_FETCH_PER_HOST parallel requests no matter how many workers are running.
+Worker threads reuse pooled requests sessions (keep-alive) instead of opening a
+new connection per URL.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .console_log import _safe_log
+
+
+# config
+USER_AGENT = os.getenv("QCHAT_USER_AGENT", "QChatIndexer/1.0")
+REQUEST_TIMEOUT = float(os.getenv("QCHAT_REQUEST_TIMEOUT", "12"))
+FETCH_WORKERS = int(os.getenv("QCHAT_FETCH_WORKERS", "16"))
+FETCH_PER_HOST = int(os.getenv("QCHAT_FETCH_PER_HOST", "4"))
+# minimum spacing between two request starts against the same host
+HOST_DELAY_SECONDS = float(os.getenv("QCHAT_HOST_DELAY_SECONDS", "0.25"))
+# max URLs submitted ahead of the consumer (bounds pages held in memory)
+FETCH_WINDOW = int(os.getenv("QCHAT_FETCH_WINDOW", str(FETCH_WORKERS * 2)))
+# log a progress line every N completed pages (0 disables)
+FETCH_LOG_EVERY = int(os.getenv("QCHAT_FETCH_LOG_EVERY", "100"))
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status: Optional[int] = None
+    html: Optional[str] = None
+    elapsed: float = 0.0
+    # response body bytes
+    size: int = 0
+    error: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 200 and self.html is not None
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
+
+
+class _HostThrottle:
+    """Caps in-flight requests for one host and spaces out request starts."""
+
+    def __init__(self, max_concurrent: int, delay: float):
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrent))
+        self._lock = threading.Lock()
+        self._delay = max(0.0, delay)
+        self._next_start = 0.0
+
+    def __enter__(self):
+        self._slots.acquire()
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_start)
+            self._next_start = start_at + self._delay
+        wait = start_at - now
+        if wait > 0:
+            time.sleep(wait)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._slots.release()
+
+
+_thread_local = threading.local()
+
+
+def get_session() -> requests.Session:
+    """Return this thread's pooled session, creating it on first use."""
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=max(1, FETCH_PER_HOST))
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _thread_local.session = session
+    return session
+
+
+class PageFetcher:
+    """Fetch many URLs concurrently with per-host throttling."""
+
+    def __init__(
+        self,
+        workers: int = FETCH_WORKERS,
+        per_host: int = FETCH_PER_HOST,
+        host_delay: float = HOST_DELAY_SECONDS,
+        timeout: float = REQUEST_TIMEOUT,
+    ):
+        self.workers = max(1, workers)
+        self.per_host = per_host
+        self.host_delay = host_delay
+        self.timeout = timeout
+        self._throttles: Dict[str, _HostThrottle] = {}
+        self._throttles_lock = threading.Lock()
+        # stats from the most recent fetch_all() run
+        self.fetched = 0
+        self.failed = 0
+        self.elapsed = 0.0
+
+    def _throttle_for(self, url: str) -> _HostThrottle:
+        host = urlsplit(url).netloc.lower()
+        with self._throttles_lock:
+            throttle = self._throttles.get(host)
+            if throttle is None:
+                throttle = _HostThrottle(self.per_host, self.host_delay)
+                self._throttles[host] = throttle
+            return throttle
+
+    def fetch_one(self, url: str, validators: Optional[Tuple[Optional[str], Optional[str]]] = None) -> FetchResult:
+        """Fetch one URL; validators=(etag, last_modified) makes it a conditional GET."""
+        result = FetchResult(url=url)
+        headers = {}
+        if validators:
+            etag, last_modified = validators
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        started = time.monotonic()
+        try:
+            with self._throttle_for(url):
+                r = get_session().get(url, headers=headers, timeout=self.timeout, allow_redirects=True)
+            result.status = r.status_code
+            result.etag = r.headers.get("ETag")
+            result.last_modified = r.headers.get("Last-Modified")
+            result.size = len(r.content)
+            if r.status_code == 200:
+                result.html = r.text
+        except Exception as e:
+            result.error = repr(e)
+        result.elapsed = time.monotonic() - started
+        return result
+
+    def fetch_all(
+        self,
+        urls: Iterable[str],
+        validators: Optional[Dict[str, Tuple[Optional[str], Optional[str]]]] = None,
+        window: Optional[int] = None,
+    ) -> Iterator[FetchResult]:
+        """Yield a FetchResult per URL, in completion order.
+
+        validators maps url -> (etag, last_modified) from a previous build; those
+        URLs are fetched conditionally and may come back as 304 Not Modified.
+        At most `window` URLs are submitted ahead of the consumer, so a slow
+        consumer stalls the fetch workers instead of piling up pages in memory.
+        """
+        urls = list(urls)
+        validators = validators or {}
+        window = max(1, window or FETCH_WINDOW)
+        self.fetched = 0
+        self.failed = 0
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="qchat-fetch") as pool:
+            queued = iter(urls)
+            pending = set()
+            for url in queued:
+                pending.add(pool.submit(self.fetch_one, url, validators.get(url)))
+                if len(pending) >= window:
+                    break
+            done_count = 0
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    result = future.result()
+                    done_count += 1
+                    if result.ok or result.not_modified:
+                        self.fetched += 1
+                    else:
+                        self.failed += 1
+                    if FETCH_LOG_EVERY and done_count % FETCH_LOG_EVERY == 0:
+                        self._log_rate(done_count, len(urls), time.monotonic() - started)
+                    yield result
+                    url = next(queued, None)
+                    if url is not None:
+                        pending.add(pool.submit(self.fetch_one, url, validators.get(url)))
+        self.elapsed = time.monotonic() - started
+        self._log_rate(len(urls), len(urls), self.elapsed)
+
+    @property
+    def pages_per_sec(self) -> float:
+        return (self.fetched + self.failed) / self.elapsed if self.elapsed > 0 else 0.0
+
+    def _log_rate(self, done: int, total: int, elapsed: float) -> None:
+        rate = done / elapsed if elapsed > 0 else 0.0
+        _safe_log(
+            f"[RAG] Fetched {done}/{total} URLs in {elapsed:.1f}s "
+            f"({rate:.2f} pages/sec, workers={self.workers}, per_host={self.per_host}, "
+            f"delay={self.host_delay}s) | ok: {self.fetched}, failed: {self.failed}"
+        )
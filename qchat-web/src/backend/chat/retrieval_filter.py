@@ -0,0 +1,247 @@
+"""
+Metadata-filtered (and batched) vector search.
+
+retrieve(..., source_filter=SourceFilter(...)) only considers chunks whose
+source URL passes the filter:
+
+    include_domains   only these hosts (a domain also matches its subdomains)
+    exclude_domains   never these hosts
+    include_prefixes  only URLs starting with one of these ("/academics/" is matched
+                      against the URL path, anything else against the whole URL)
+    exclude_prefixes  never URLs starting with one of these
+
+The filter is applied inside FAISS: the search parameters carry an
+IDSelectorBitmap over index positions, so chunks that fail it never take one
+of the k candidate slots (no fetch-more-then-drop). Each loaded store gets a
+table of every position's source URL once (from docstore.sqlite3 for compact
+stores); the bitmap of a filter is computed over the distinct URLs and cached
+per store, so a new index version starts with fresh bitmaps. Domain filters
+also skip whole shards (index_shards.py) that cannot match. The same masks
+restrict the BM25 side of hybrid search (allowed_positions).
+
+search_by_vectors() takes a matrix of query vectors, so retrieve_many()
+searches a whole batch of questions with one FAISS call per shard group.
+"""
+
+import threading
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Hashable, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from .index_shards import MAIN_SHARD, SHARD_HOSTS, ShardedFAISS, shard_for, shard_of_host
+
+# bitmaps kept per store (one per distinct filter)
+MAX_CACHED_FILTERS = 32
+
+
+def _norm(values: Iterable[str]) -> Tuple[str, ...]:
+    return tuple(sorted({v.strip().lower() for v in values if v and v.strip()}))
+
+
+def _host_in(host: str, domains: Tuple[str, ...]) -> bool:
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+@dataclass(frozen=True)
+class SourceFilter:
+    include_domains: Tuple[str, ...] = ()
+    exclude_domains: Tuple[str, ...] = ()
+    include_prefixes: Tuple[str, ...] = ()
+    exclude_prefixes: Tuple[str, ...] = ()
+
+    def __post_init__(self):
+        # normalized and sorted, so equal filters hash the same (bitmap / result cache keys)
+        for name in ("include_domains", "exclude_domains", "include_prefixes", "exclude_prefixes"):
+            object.__setattr__(self, name, _norm(getattr(self, name)))
+
+    def matches(self, source: str) -> bool:
+        url = (source or "").lower()
+        parts = urlsplit(url)
+        host = parts.hostname or ""
+        if self.include_domains and not _host_in(host, self.include_domains):
+            return False
+        if self.exclude_domains and _host_in(host, self.exclude_domains):
+            return False
+        path = parts.path or "/"
+
+        def starts(prefix: str) -> bool:
+            return (path if prefix.startswith("/") else url).startswith(prefix)
+
+        if self.include_prefixes and not any(starts(p) for p in self.include_prefixes):
+            return False
+        return not any(starts(p) for p in self.exclude_prefixes)
+
+    def shards(self) -> Optional[List[str]]:
+        """Shards that can hold matching chunks; None = all of them."""
+        names = [MAIN_SHARD] + list(SHARD_HOSTS)
+        possible = [name for name in names if self._shard_possible(name)]
+        return None if len(possible) == len(names) else possible
+
+    def _shard_possible(self, name: str) -> bool:
+        if name == MAIN_SHARD:
+            # main holds every host not listed in SHARD_HOSTS
+            return not self.include_domains or any(shard_of_host(d) == MAIN_SHARD for d in self.include_domains)
+        hosts = SHARD_HOSTS[name]
+        if self.include_domains and not any(_host_in(h, self.include_domains) for h in hosts):
+            return False
+        return not all(_host_in(h, self.exclude_domains) for h in hosts)
+
+
+def restrict_shards(names: Optional[List[str]], source_filter: Optional[SourceFilter]) -> Optional[List[str]]:
+    """Routed shards (None = all) narrowed to the ones the filter can match."""
+    allowed = source_filter.shards() if source_filter is not None else None
+    if allowed is None:
+        return names
+    if names is None:
+        return allowed
+    # the filter is a hard constraint; routing is only a hint
+    return [n for n in names if n in allowed] or allowed
+
+
+class _Selection:
+    """Positions passing one filter, as a bool mask and the packed bitmap FAISS reads."""
+
+    def __init__(self, mask: np.ndarray):
+        self.mask = mask
+        self.count = int(mask.sum())
+        self._bits = np.packbits(mask, bitorder="little")
+        self.selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(self._bits))
+
+
+class _SourceTable:
+    """Source URL per index position (as codes into the distinct URLs) and cached filter bitmaps."""
+
+    def __init__(self, sources: List[str]):
+        codes = {}
+        self._codes = np.fromiter(
+            (codes.setdefault(s, len(codes)) for s in sources), dtype=np.int32, count=len(sources)
+        )
+        self._urls = list(codes)
+        self._selections: "OrderedDict[Hashable, _Selection]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def selection(self, key: Hashable, passes: Callable[[str], bool]) -> _Selection:
+        """Positions whose source URL passes; cached under key."""
+        with self._lock:
+            selection = self._selections.get(key)
+            if selection is not None:
+                self._selections.move_to_end(key)
+                return selection
+        url_passes = np.fromiter((passes(u) for u in self._urls), dtype=bool, count=len(self._urls))
+        selection = _Selection(url_passes[self._codes])
+        with self._lock:
+            self._selections[key] = selection
+            while len(self._selections) > MAX_CACHED_FILTERS:
+                self._selections.popitem(last=False)
+        return selection
+
+
+# per docstore, so a shard view and its full store share one table; dropped with the store
+_TABLES: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_TABLES_LOCK = threading.Lock()
+
+
+def _source_table(store: FAISS) -> _SourceTable:
+    with _TABLES_LOCK:
+        table = _TABLES.get(store.docstore)
+    if table is not None:
+        return table
+    if hasattr(store.docstore, "sources"):
+        sources = store.docstore.sources()
+    else:
+        # in-memory stores (legacy pickle versions)
+        sources = []
+        for position in range(len(store.index_to_docstore_id)):
+            doc = store.docstore.search(store.index_to_docstore_id[position])
+            sources.append(doc.metadata.get("source", "") if isinstance(doc, Document) else "")
+    table = _SourceTable(sources)
+    with _TABLES_LOCK:
+        _TABLES[store.docstore] = table
+    return table
+
+
+def _leaves(index: faiss.Index) -> List[faiss.Index]:
+    if isinstance(index, faiss.IndexShards):
+        return [index.at(i) for i in range(index.count())]
+    return [index]
+
+
+def _search_leaf(index: faiss.Index, vectors: np.ndarray, k: int, selection: _Selection) -> List[List[Tuple[float, int]]]:
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        params = faiss.SearchParametersIVF(sel=selection.selector, nprobe=ivf.nprobe)
+    else:
+        params = faiss.SearchParameters(sel=selection.selector)
+    try:
+        scores, ids = index.search(vectors, k, params=params)
+    except RuntimeError:
+        # IndexPQ takes no selector: scan it whole and keep the selected positions
+        scores, ids = index.search(vectors, index.ntotal)
+        return [
+            [(float(s), int(i)) for s, i in zip(row_scores, row_ids) if i >= 0 and selection.mask[i]][:k]
+            for row_scores, row_ids in zip(scores, ids)
+        ]
+    return [
+        [(float(s), int(i)) for s, i in zip(row_scores, row_ids) if i >= 0]
+        for row_scores, row_ids in zip(scores, ids)
+    ]
+
+
+def _hits_by_row(store: FAISS, vectors: np.ndarray, k: int, source_filter: Optional[SourceFilter]) -> List[list]:
+    if source_filter is None:
+        scores, ids = store.index.search(vectors, k)
+        return [
+            [(float(s), int(i)) for s, i in zip(row_scores, row_ids) if i >= 0]
+            for row_scores, row_ids in zip(scores, ids)
+        ]
+    selection = _source_table(store).selection(source_filter, source_filter.matches)
+    if not selection.count:
+        return [[] for _ in range(len(vectors))]
+    rows = [[] for _ in range(len(vectors))]
+    for index in _leaves(store.index):
+        for row, hits in zip(rows, _search_leaf(index, vectors, k, selection)):
+            row.extend(hits)
+    descending = store.index.metric_type == faiss.METRIC_INNER_PRODUCT
+    for row in rows:
+        row.sort(key=lambda hit: hit[0], reverse=descending)
+        del row[k:]
+    return rows
+
+
+def search_by_vectors(
+    store: FAISS, vectors: np.ndarray, k: int, source_filter: Optional[SourceFilter] = None
+) -> List[List[Tuple[Document, float]]]:
+    """(doc, score) lists for a matrix of query vectors, in one FAISS search, optionally filtered."""
+    vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+    if store._normalize_L2:
+        faiss.normalize_L2(vectors)
+    results = []
+    for hits in _hits_by_row(store, vectors, k, source_filter):
+        docs = []
+        for score, position in hits:
+            doc = store.docstore.search(store.index_to_docstore_id[position])
+            if isinstance(doc, Document):
+                docs.append((doc, score))
+        results.append(docs)
+    return results
+
+
+def allowed_positions(
+    store: FAISS, shards: Optional[List[str]], source_filter: Optional[SourceFilter]
+) -> Optional[np.ndarray]:
+    """Bool mask of the positions a search over these shards with this filter may return (None = all)."""
+    mask = None
+    if shards is not None and isinstance(store, ShardedFAISS):
+        names = frozenset(shards)
+        mask = _source_table(store).selection(("shards", names), lambda url: shard_for(url) in names).mask
+    if source_filter is not None:
+        selected = _source_table(store).selection(source_filter, source_filter.matches).mask
+        mask = selected if mask is None else mask & selected
+    return mask
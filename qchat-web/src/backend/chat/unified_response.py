@@ -22,7 +22,7 @@ load_backend_env()
 from .profile_service import get_user_profile
 from .faq_data import FAQ_DATA
 from .profanity_filter import sanitize_text
-from .RAG import retrieve as rag_retrieve
+from .RAG import retrieve as rag_retrieve, select_diverse
 
 # LLM Configuration
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434")
@@ -316,24 +316,28 @@ def _get_web_context(question: str) -> tuple[str, list]:
         # Sort by AI score (highest first)
         scored_docs.sort(key=lambda x: x[0], reverse=True)
         
-        # Select top 4 documents with diversity
-        selected_docs = []
-        seen_pages = set()
-        
-        for score, doc in scored_docs:
-            # Skip very low scores (likely irrelevant)
-            if score < 20:
-                continue
-                
-            source_url = doc.metadata.get("source", "")
-            page_id = source_url.split('#')[0].split('?')[0].rstrip('/')
-            
-            if page_id not in seen_pages:
-                selected_docs.append((score, doc))
-                seen_pages.add(page_id)
-            
-            if len(selected_docs) >= 4:
-                break
+        # Skip very low scores (likely irrelevant)
+        scored_docs = [(score, doc) for score, doc in scored_docs if score >= 20]
+
+        # Select top 4 documents with diversity: MMR over their embeddings, AI score as relevance
+        picks = select_diverse([doc for _, doc in scored_docs], [score / 100 for score, _ in scored_docs], 4)
+        if picks is not None:
+            selected_docs = [scored_docs[i] for i in picks]
+        else:
+            # index without chunk vectors: one chunk per page
+            selected_docs = []
+            seen_pages = set()
+
+            for score, doc in scored_docs:
+                source_url = doc.metadata.get("source", "")
+                page_id = source_url.split('#')[0].split('?')[0].rstrip('/')
+
+                if page_id not in seen_pages:
+                    selected_docs.append((score, doc))
+                    seen_pages.add(page_id)
+
+                if len(selected_docs) >= 4:
+                    break
         
         # Debug output
         print(f"[Unified] Selected {len(selected_docs)} top documents:")
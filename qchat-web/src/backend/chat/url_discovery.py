@@ -0,0 +1,250 @@
+"""
+URL discovery and canonicalization for index builds.
+
+The URL list fed to build_index comes from two places:
+
+1. the hand-maintained qu_docs.txt (seed list), and
+2. the sitemaps named in QCHAT_SITEMAPS: sitemap URLs, or local files or
+   directories holding a snapshot of them (.xml or .xml.gz; sitemap indexes
+   are followed, from the same directory when reading a snapshot).
+
+Duplicates are found by a canonical key (lowercase host, www for the bare
+domain, no fragment, no tracking parameters such as utm_* or fbclid, sorted
+query, trailing slash on directory-style paths, http = https), so variants
+like programs, programs/#main and programs/?utm_source=x count once. Other
+query parameters select different content (programs/?School=..., ?keyword=...)
+and are kept. The key is only used for de-duplication: the URL that is
+fetched and stored is the first one listed (the https copy when both are).
+Sitemap URLs are only added for hosts already in the seed list (narrowed
+further by QCHAT_SITEMAP_INCLUDE / QCHAT_SITEMAP_EXCLUDE prefixes). Each
+sitemap <lastmod> is kept, so incremental builds can skip pages whose lastmod
+has not moved since they were last fetched.
+"""
+
+import gzip
+import os
+import posixpath
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .rag_fetch import REQUEST_TIMEOUT, get_session
+
+
+def _csv_env(name: str) -> List[str]:
+    return [part.strip() for part in os.getenv(name, "").split(",") if part.strip()]
+
+
+# config
+SITEMAPS = _csv_env("QCHAT_SITEMAPS")
+SITEMAP_INCLUDE = _csv_env("QCHAT_SITEMAP_INCLUDE")
+SITEMAP_EXCLUDE = _csv_env("QCHAT_SITEMAP_EXCLUDE")
+# tracking query parameters ignored when comparing URLs (names ending in * are prefixes)
+STRIP_QUERY_PARAMS = {
+    p.lower()
+    for p in ["utm_*", "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "_ga", "_gl", "hsa_*", "_hs*"]
+    + _csv_env("QCHAT_URL_STRIP_PARAMS")
+}
+# nested sitemap indexes deeper than this are ignored
+MAX_SITEMAP_DEPTH = 3
+
+_FILE_EXT_RE = re.compile(r"\.[A-Za-z0-9]{1,5}$")
+# bare domains that redirect to their www host
+_HOST_ALIASES = {"qu.edu": "www.qu.edu"}
+
+
+def _is_tracking(name: str, strip_params: Set[str]) -> bool:
+    name = name.lower()
+    return any(name.startswith(p[:-1]) if p.endswith("*") else name == p for p in strip_params)
+
+
+def canonicalize(url: str, strip_params: Optional[Set[str]] = None) -> Optional[str]:
+    """Canonical form of an http(s) URL (the de-duplication key), or None if it is not one."""
+    strip_params = STRIP_QUERY_PARAMS if strip_params is None else strip_params
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return None
+    if parts.scheme.lower() not in ("http", "https") or not parts.hostname:
+        return None
+    host = parts.hostname.lower().rstrip(".")
+    host = _HOST_ALIASES.get(host, host)
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    path = posixpath.normpath(parts.path) if parts.path not in ("", "/") else "/"
+    if path.endswith("/index.html") or path.endswith("/index.htm"):
+        path = path.rsplit("/", 1)[0] + "/"
+    # qu.edu serves directory-style paths with a trailing slash
+    if not path.endswith("/") and not _FILE_EXT_RE.search(path.rsplit("/", 1)[-1]):
+        path += "/"
+    query = urlencode(
+        sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not _is_tracking(k, strip_params))
+    )
+    return urlunsplit((parts.scheme.lower(), host, path, query, ""))
+
+
+def _key(canonical: str) -> str:
+    # http:// and https:// copies of a page are the same page
+    return canonical.split("://", 1)[1]
+
+
+def url_key(url: str) -> Optional[str]:
+    """De-duplication key of a URL (None if it is not http(s))."""
+    canonical = canonicalize(url)
+    return _key(canonical) if canonical is not None else None
+
+
+def canonical_urls(urls: Iterable[str]) -> Tuple[List[str], int]:
+    """De-duplicate by canonical key, keeping the listed URLs in first-seen order; returns (urls, dropped)."""
+    positions: Dict[str, int] = {}
+    out: List[str] = []
+    dropped = 0
+    for url in urls:
+        url = url.strip()
+        key = url_key(url)
+        if key is None:
+            dropped += 1
+            continue
+        position = positions.get(key)
+        if position is not None:
+            dropped += 1
+            if url.lower().startswith("https:") and not out[position].lower().startswith("https:"):
+                out[position] = url
+            continue
+        positions[key] = len(out)
+        out.append(url)
+    return out, dropped
+
+
+def normalize_lastmod(raw: Optional[str]) -> Optional[str]:
+    """W3C datetime (2024-05-01, 2024-05-01T10:00:00+02:00, ...) -> UTC ISO string."""
+    if not raw:
+        return None
+    raw = raw.strip().replace("Z", "+00:00")
+    try:
+        value = datetime.fromisoformat(raw)
+    except ValueError:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _load_sitemap(source: str, snapshot_dir: Optional[Path]) -> Optional[bytes]:
+    if snapshot_dir is not None:
+        # child of a local snapshot: looked up by file name next to its index
+        path = snapshot_dir / posixpath.basename(urlsplit(source).path)
+        data = path.read_bytes() if path.exists() else None
+    elif source.startswith(("http://", "https://")):
+        response = get_session().get(source, timeout=REQUEST_TIMEOUT)
+        data = response.content if response.status_code == 200 else None
+    else:
+        data = Path(source).read_bytes()
+    if data and data[:2] == b"\x1f\x8b":
+        data = gzip.decompress(data)
+    return data
+
+
+@dataclass
+class Discovery:
+    urls: List[str]
+    lastmod: Dict[str, str] = field(default_factory=dict)
+    listed: int = 0
+    duplicates: int = 0
+    from_sitemaps: int = 0
+    sitemap_errors: List[str] = field(default_factory=list)
+
+    def report(self) -> str:
+        return (
+            f"[RAG] URLs: {self.listed} listed, {self.duplicates} duplicates/invalid dropped, "
+            f"+{self.from_sitemaps} from sitemaps -> {len(self.urls)} | lastmod known: {len(self.lastmod)}"
+            + (f" | sitemap errors: {len(self.sitemap_errors)}" if self.sitemap_errors else "")
+        )
+
+
+def read_sitemaps(sources: Iterable[str]) -> Tuple[Dict[str, Optional[str]], List[str]]:
+    """All page URLs in the given sitemaps (first listing per key) -> normalized lastmod; plus failed sources."""
+    pending: List[Tuple[str, Optional[Path], int]] = []
+    for source in sources:
+        if Path(source).is_dir():
+            # a snapshot directory: read every sitemap file in it
+            files = sorted(p for p in Path(source).iterdir() if p.name.endswith((".xml", ".xml.gz")))
+            pending.extend((str(p), None, 0) for p in files)
+        else:
+            pending.append((source, None, 0))
+    entries: Dict[str, Optional[str]] = {}
+    listed: Dict[str, str] = {}
+    errors: List[str] = []
+    seen: Set[str] = set()
+    while pending:
+        source, snapshot_dir, depth = pending.pop(0)
+        if source in seen or depth > MAX_SITEMAP_DEPTH:
+            continue
+        seen.add(source)
+        try:
+            data = _load_sitemap(source, snapshot_dir)
+            root = ET.fromstring(data) if data else None
+        except Exception:
+            root = None
+        if root is None:
+            errors.append(source)
+            continue
+        if snapshot_dir is not None:
+            child_dir = snapshot_dir
+        elif source.startswith(("http://", "https://")):
+            child_dir = None
+        else:
+            child_dir = Path(source).parent
+        is_index = _local_name(root.tag) == "sitemapindex"
+        for node in root:
+            values = {_local_name(child.tag): (child.text or "").strip() for child in node}
+            loc = values.get("loc")
+            if not loc:
+                continue
+            if is_index:
+                pending.append((loc, child_dir, depth + 1))
+                continue
+            key = url_key(loc)
+            if key is not None:
+                url = listed.setdefault(key, loc)
+                lastmod = normalize_lastmod(values.get("lastmod"))
+                if url not in entries or (lastmod and lastmod > (entries[url] or "")):
+                    entries[url] = lastmod
+    return entries, errors
+
+
+def discover_urls(seed_urls: List[str], sitemaps: Optional[List[str]] = None) -> Discovery:
+    """De-duplicated seed list, extended with (and dated by) the configured sitemaps."""
+    urls, dropped = canonical_urls(seed_urls)
+    discovery = Discovery(urls=urls, listed=len(seed_urls), duplicates=dropped)
+    sitemaps = SITEMAPS if sitemaps is None else sitemaps
+    if not sitemaps:
+        return discovery
+    entries, discovery.sitemap_errors = read_sitemaps(sitemaps)
+    hosts = {urlsplit(canonicalize(u)).netloc for u in urls}
+    listed = {url_key(u): u for u in urls}
+    for url, lastmod in entries.items():
+        canonical = canonicalize(url)
+        known = listed.get(_key(canonical))
+        if known is None:
+            if urlsplit(canonical).netloc not in hosts:
+                continue
+            # prefixes are compared with the canonical form (https, www, trailing slash)
+            if SITEMAP_INCLUDE and not any(canonical.startswith(p) for p in SITEMAP_INCLUDE):
+                continue
+            if any(canonical.startswith(p) for p in SITEMAP_EXCLUDE):
+                continue
+            known = listed[_key(canonical)] = url
+            urls.append(url)
+            discovery.from_sitemaps += 1
+        if lastmod:
+            discovery.lastmod[known] = lastmod
+    return discovery
@@ -0,0 +1,97 @@
+"""
+Per-URL build manifest for incremental FAISS rebuilds.
+
+Stored as url_manifest.json next to the index. For every ingested URL it keeps
+the HTTP validators (ETag / Last-Modified) used for conditional GETs, a hash of
+the cleaned page text, and the ids of the chunks that page contributed to the
+vector store, so a rebuild can delete and re-add just the pages that changed.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+MANIFEST_FILE = "url_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_ids_for(url: str, page_hash: str, count: int) -> List[str]:
+    """Stable, collision-free docstore ids for the chunks of one page version."""
+    url_key = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+    return [f"{url_key}-{page_hash[:12]}-{i}" for i in range(count)]
+
+
+def build_params(
+    embed_model: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    dedup_distance: Optional[int] = None,
+    strip_boilerplate: bool = False,
+    html_extractor: str = "bs4",
+) -> Dict[str, Any]:
+    """Settings that invalidate every stored vector when they change."""
+    return {
+        "embed_model": embed_model,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "dedup_distance": dedup_distance,
+        "strip_boilerplate": strip_boilerplate,
+        "html_extractor": html_extractor,
+    }
+
+
+def new_manifest(params: Dict[str, Any]) -> Dict[str, Any]:
+    return {"version": MANIFEST_VERSION, "params": params, "urls": {}}
+
+
+def load_manifest(index_dir: Path) -> Optional[Dict[str, Any]]:
+    path = index_dir / MANIFEST_FILE
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save_manifest(index_dir: Path, manifest: Dict[str, Any]) -> None:
+    """Write the manifest atomically so a crash never leaves half a file behind."""
+    index_dir.mkdir(parents=True, exist_ok=True)
+    path = index_dir / MANIFEST_FILE
+    tmp = path.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def url_entry(
+    page_hash: str,
+    chunk_ids: List[str],
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+    fingerprints: Optional[List[str]] = None,
+    lastmod: Optional[str] = None,
+    dup_of: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    return {
+        "etag": etag,
+        "last_modified": last_modified,
+        "content_hash": page_hash,
+        "chunk_ids": chunk_ids,
+        # simhash of each kept chunk, so incremental builds can dedup against them
+        "fingerprints": fingerprints or [],
+        # sitemap <lastmod> when the page was fetched (see url_discovery.py)
+        "lastmod": lastmod,
+        # pages holding chunks this one dropped as near-duplicates (see near_dup.py)
+        "dup_of": dup_of or [],
+    }
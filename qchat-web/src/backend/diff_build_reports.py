@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Diff Build Reports - Compare the telemetry of two index builds
+
+Every build_index run writes <index-dir>/builds/<run id>.json (per-URL fetch
+latency/status/bytes/chunks, embed batch times, stage wall times, params).
+This script compares two of them: stage and embedding slowdowns, slow hosts,
+pages that started failing, chunk count swings and changed build params.
+
+Usage:
+    python diff_build_reports.py                      # newest vs the one before
+    python diff_build_reports.py OLD.json NEW.json    # two specific reports
+    python diff_build_reports.py --baseline base.json --fail-on-regression   # CI
+
+Options:
+    --index-dir DIR         Where to look for builds/ (default: chat/faiss_index)
+    --baseline FILE         Compare the newest report against this one
+    --slower-factor X       How much slower a stage/host must get to count
+                            (default: QCHAT_BUILD_DIFF_SLOWER_FACTOR or 1.5)
+    --json                  Print the full diff as JSON
+    --fail-on-regression    Exit with status 2 when any regression is found
+"""
+
+import sys
+import argparse
+import json
+from pathlib import Path
+
+# Add the chat module to the path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from chat.RAG import DEFAULT_INDEX_DIR
+from chat.build_telemetry import SLOWER_FACTOR, diff_reports, format_diff, list_reports, load_report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare two QChat index build reports",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    parser.add_argument('reports', nargs='*', type=Path, help='OLD.json NEW.json (default: the two newest)')
+    parser.add_argument(
+        '--index-dir',
+        type=Path,
+        default=DEFAULT_INDEX_DIR,
+        help=f'Index directory holding builds/ (default: {DEFAULT_INDEX_DIR})'
+    )
+    parser.add_argument('--baseline', type=Path, default=None, help='Compare the newest report against this one')
+    parser.add_argument('--slower-factor', type=float, default=SLOWER_FACTOR)
+    parser.add_argument('--json', action='store_true', help='Print the diff as JSON')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit 2 if regressions are found')
+    args = parser.parse_args()
+
+    if len(args.reports) == 2:
+        old_path, new_path = args.reports
+    elif args.reports:
+        parser.error('give two reports (OLD NEW), or none to use --index-dir')
+    else:
+        found = list_reports(args.index_dir)
+        if args.baseline:
+            if not found:
+                print(f"No build reports in {args.index_dir}")
+                return 1
+            old_path, new_path = args.baseline, found[0]
+        elif len(found) < 2:
+            print(f"Need two build reports in {args.index_dir}, found {len(found)}")
+            return 1
+        else:
+            new_path, old_path = found[0], found[1]
+
+    diff = diff_reports(load_report(old_path), load_report(new_path), args.slower_factor)
+    if args.json:
+        print(json.dumps(diff, indent=2))
+    else:
+        print(format_diff(diff))
+    if args.fail_on_regression and diff["regressions"]:
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
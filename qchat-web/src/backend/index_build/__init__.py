@@ -0,0 +1,128 @@
+"""
+Index Build API
+GET /api/index_build - Status of the current / last index build (stage, percent, ETA)
+POST /api/index_build - Start an index build in a separate worker process (ADMIN ONLY, checked by requested_by)
+"""
+
+import azure.functions as func
+import logging
+import json
+import sys
+import os
+
+# Add backend to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat.build_worker import (
+    default_mode,
+    parse_max_urls,
+    read_status,
+    resolve_index_dir,
+    resolve_urls_file,
+    start_build,
+)
+
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Index Build Control
+
+    GET - Returns the build status written by the worker
+    POST - Starts a build (returns at once; poll GET for progress)
+    """
+    logging.info('Index Build API triggered')
+
+    method = req.method
+
+    try:
+        if method == 'GET':
+            return func.HttpResponse(
+                json.dumps(read_status(resolve_index_dir())),
+                status_code=200,
+                mimetype="application/json"
+            )
+        elif method == 'POST':
+            return handle_start_build(req)
+        else:
+            return func.HttpResponse(
+                json.dumps({"error": "Method not allowed"}),
+                status_code=405,
+                mimetype="application/json"
+            )
+
+    except Exception as e:
+        logging.error(f"Index Build API error: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": str(e)}),
+            status_code=500,
+            mimetype="application/json"
+        )
+
+
+def handle_start_build(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    POST /api/index_build
+
+    Body: {"requested_by": "username", "mode": "incremental" | "full" (optional)}
+    requested_by must be an admin user.
+    202 when a build was started, 409 (with its status) when one is already running
+    """
+    try:
+        req_body = req.get_json()
+    except ValueError:
+        req_body = {}
+    if not isinstance(req_body, dict):
+        return func.HttpResponse(
+            json.dumps({"error": "Request body must be a JSON object"}),
+            status_code=400,
+            mimetype="application/json"
+        )
+    mode = req_body.get('mode') or default_mode()
+    if mode not in ('incremental', 'full'):
+        return func.HttpResponse(
+            json.dumps({"error": "mode must be 'incremental' or 'full'"}),
+            status_code=400,
+            mimetype="application/json"
+        )
+    requested_by = req_body.get('requested_by')
+    if not is_admin(requested_by):
+        logging.warning(f'Index build refused for non-admin requester {requested_by!r}')
+        return func.HttpResponse(
+            json.dumps({"error": "Admin access required"}),
+            status_code=403,
+            mimetype="application/json"
+        )
+
+    launched = start_build(
+        resolve_index_dir(),
+        resolve_urls_file(),
+        mode=mode,
+        max_urls=parse_max_urls(),
+        trigger="admin",
+        requested_by=requested_by,
+    )
+    if not launched["started"]:
+        logging.info('Index build already running')
+        return func.HttpResponse(
+            json.dumps({"error": "A build is already running", "status": launched["status"]}),
+            status_code=409,
+            mimetype="application/json"
+        )
+
+    logging.info(f'Index build started ({mode}) by {requested_by}')
+    return func.HttpResponse(
+        json.dumps(launched["status"]),
+        status_code=202,
+        mimetype="application/json"
+    )
+
+
+def is_admin(username) -> bool:
+    """True if username belongs to a user with the admin role (the role the admin panel checks)."""
+    if not isinstance(username, str) or not username:
+        return False
+    # imported here so GET (status polling) does not need MongoDB
+    from db_connection import user_service
+
+    user = user_service.get_by_username(username)
+    return user is not None and user.is_admin()
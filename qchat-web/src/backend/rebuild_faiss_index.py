@@ -2,18 +2,35 @@
 """
 Rebuild FAISS Index - Manual script to rebuild the vector store index
 
-This script rebuilds the FAISS index from scratch by:
+This script rebuilds the FAISS index by:
 1. Reading URLs from qu_docs.txt
 2. Fetching content from each URL
 3. Splitting into chunks
 4. Creating embeddings
 5. Saving the index to disk
 
+With --incremental, pages are fetched with conditional GETs and only pages whose
+text changed since the last build (per url_manifest.json) are re-embedded.
+
 Usage:
-    python rebuild_faiss_index.py [--max-urls N]
+    python rebuild_faiss_index.py [--max-urls N] [--full | --incremental]
 
 Options:
     --max-urls N    Limit to first N URLs (useful for testing)
+    --full          Rebuild the whole index from scratch (default)
+    --incremental   Only re-embed changed pages; falls back to --full when there
+                    is no compatible manifest
+    --no-resume     Ignore the checkpoint of an interrupted build and start over
+    --sitemap SRC   Add pages from a sitemap URL or local snapshot file/dir
+                    (repeatable; default: QCHAT_SITEMAPS)
+    --write-urls F  Only discover: write the de-duplicated URL list to F and exit
+
+Duplicate URLs (fragment, tracking parameters, trailing-slash and http/https
+variants of one page) are fetched once, under the URL as listed. Sitemap <lastmod> dates are recorded, and
+incremental builds skip pages whose lastmod has not changed.
+
+An interrupted build (timeout, Ollama restart, Ctrl+C) leaves its progress in
+<index-dir>/checkpoint; running the same command again resumes from it.
 
 Environment Variables:
     QCHAT_CHUNK_SIZE       Chunk size for text splitting (default: 1000)
@@ -29,7 +46,8 @@ from pathlib import Path
 # Add the chat module to the path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from chat.RAG import build_index, DEFAULT_URLS_TXT, DEFAULT_INDEX_DIR
+from chat.RAG import build_index, read_urls, DEFAULT_URLS_TXT, DEFAULT_INDEX_DIR
+from chat.url_discovery import discover_urls
 
 
 def main():
@@ -56,14 +74,55 @@ def main():
         default=DEFAULT_INDEX_DIR,
         help=f'Output directory for index (default: {DEFAULT_INDEX_DIR})'
     )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        '--full',
+        dest='incremental',
+        action='store_false',
+        help='Rebuild the whole index from scratch (default)'
+    )
+    mode.add_argument(
+        '--incremental',
+        dest='incremental',
+        action='store_true',
+        help='Only re-embed pages that changed since the last build'
+    )
+    parser.set_defaults(incremental=False)
+    parser.add_argument(
+        '--no-resume',
+        dest='resume',
+        action='store_false',
+        help='Discard any checkpoint from an interrupted build and start over'
+    )
+    parser.add_argument(
+        '--sitemap',
+        dest='sitemaps',
+        action='append',
+        default=None,
+        help='Sitemap URL or local snapshot file/directory (repeatable; default: QCHAT_SITEMAPS)'
+    )
+    parser.add_argument(
+        '--write-urls',
+        type=Path,
+        default=None,
+        help='Write the discovered, de-duplicated URL list to this file and exit (no build)'
+    )
     
     args = parser.parse_args()
+
+    if args.write_urls:
+        discovery = discover_urls(read_urls(args.urls_file), args.sitemaps)
+        print(discovery.report())
+        args.write_urls.write_text("\n".join(discovery.urls) + "\n", encoding="utf-8")
+        print(f"Wrote {len(discovery.urls)} URLs to {args.write_urls}")
+        return 0
     
     print("=" * 70)
     print("QChat FAISS Index Rebuild")
     print("=" * 70)
     print(f"URLs file: {args.urls_file}")
     print(f"Index directory: {args.index_dir}")
+    print(f"Mode: {'incremental' if args.incremental else 'full'}")
     if args.max_urls:
         print(f"Max URLs: {args.max_urls}")
     print("=" * 70)
@@ -73,7 +132,10 @@ def main():
         pages, chunks = build_index(
             urls_txt=args.urls_file,
             index_dir=args.index_dir,
-            max_urls=args.max_urls
+            max_urls=args.max_urls,
+            incremental=args.incremental,
+            resume=args.resume,
+            sitemaps=args.sitemaps
         )
         
         print()
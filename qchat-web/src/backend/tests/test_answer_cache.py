@@ -0,0 +1,42 @@
+"""SemanticAnswerCache must not reuse an answer across questions that differ in their key term."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from chat.answer_cache import SemanticAnswerCache, key_terms
+
+SPRING = "When does spring break start?"
+FALL = "when does fall break start"
+
+
+def _vectors(similarity: float):
+    # two unit vectors with the given cosine similarity, like nomic embeddings of the pair
+    a = np.zeros(8, dtype=np.float32)
+    b = np.zeros(8, dtype=np.float32)
+    a[0] = 1.0
+    b[0], b[1] = similarity, np.sqrt(1 - similarity ** 2)
+    return a.tolist(), b.tolist()
+
+
+def test_key_term_pair_is_not_reused():
+    cache = SemanticAnswerCache(max_entries=4, ttl_seconds=0, threshold=0.95)
+    spring, fall = _vectors(0.97)
+    cache.put(spring, SPRING, {"reply": "Spring break starts March 7.", "sources": []}, "v1")
+    assert cache.lookup(fall, FALL, "v1") is None
+
+
+def test_rewording_with_same_key_terms_is_reused():
+    cache = SemanticAnswerCache(max_entries=4, ttl_seconds=0, threshold=0.95)
+    spring, reworded = _vectors(0.97)
+    cache.put(spring, SPRING, {"reply": "Spring break starts March 7.", "sources": []}, "v1")
+    hit = cache.lookup(reworded, "when is the start of spring break", "v1")
+    assert hit is not None and hit["reply"] == "Spring break starts March 7."
+
+
+def test_key_terms():
+    assert key_terms(SPRING) == {"spring", "break", "start"}
+    assert key_terms("What are the library hours?") == key_terms("library hour")
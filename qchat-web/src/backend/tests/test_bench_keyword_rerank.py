@@ -0,0 +1,45 @@
+"""Smoke test: bench_keyword_rerank.py against a tiny published index."""
+
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND))
+
+BENCH = BACKEND / "benchmarks" / "bench_keyword_rerank.py"
+
+
+def _publish_tiny_index(index_dir: Path) -> None:
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    from chat import RAG
+    from chat.build_telemetry import BuildTelemetry
+    from chat.url_manifest import build_params, new_manifest
+
+    docs = [
+        Document(page_content=f"Registration for spring courses opens in week {i}.", metadata={"source": f"https://www.qu.edu/page{i}/"})
+        for i in range(20)
+    ]
+    store = FAISS.from_documents(docs, DeterministicFakeEmbedding(size=32))
+    RAG._publish(store, new_manifest(build_params(RAG.EMBED_MODEL, 1000, 200)), index_dir, BuildTelemetry())
+
+
+def _run(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, str(BENCH), *args], capture_output=True, text=True, timeout=300)
+
+
+def test_runs_against_built_index(tmp_path):
+    index_dir = tmp_path / "faiss_index"
+    _publish_tiny_index(index_dir)
+    result = _run("--index-dir", str(index_dir), "--queries", "5", "--pool-sizes", "4", "--rounds", "1")
+    assert result.returncode == 0, result.stderr
+    assert "20 chunks" in result.stdout
+
+
+def test_exits_cleanly_without_published_index(tmp_path):
+    result = _run("--index-dir", str(tmp_path / "missing"))
+    assert result.returncode == 1
+    assert "No published index" in result.stderr
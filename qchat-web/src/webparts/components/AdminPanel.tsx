@@ -74,6 +74,7 @@ function URLsTab() {
   const [adding, setAdding] = React.useState(false);
   const [newUrl, setNewUrl] = React.useState('');
   const [searchQuery, setSearchQuery] = React.useState('');
+  const [urlsChanged, setUrlsChanged] = React.useState(false);
 
   const loadUrls = React.useCallback(async () => {
     setLoading(true);
@@ -114,6 +115,7 @@ function URLsTab() {
       if (!res.ok) throw new Error('Failed to save URLs');
       const data = await res.json();
       setUrls(Array.isArray(data.urls) ? data.urls : newList);
+      setUrlsChanged(true);
     } catch (e) {
       setError(e instanceof Error ? e.message : 'Failed to save URLs');
     } finally {
@@ -201,6 +203,8 @@ function URLsTab() {
             )}
           </div>
 
+          <IndexBuildBar urlsChanged={urlsChanged} onStarted={() => setUrlsChanged(false)} />
+
           {/* SEARCH BAR */}
           <div className={styles.searchBar}>
             <input
@@ -254,6 +258,104 @@ function URLsTab() {
 }
 
 
+// INDEX BUILD - RUNS IN A SEPARATE WORKER PROCESS, POLLED FOR PROGRESS
+interface BuildStatus {
+  state: 'idle' | 'starting' | 'running' | 'succeeded' | 'failed';
+  stage?: string | null;
+  percent?: number;
+  eta_seconds?: number | null;
+  error?: string | null;
+  finished_at?: string;
+  result?: { pages: number; chunks: number } | null;
+}
+
+function formatEta(seconds: number): string {
+  if (seconds < 60) return `${Math.round(seconds)}s`;
+  return `${Math.floor(seconds / 60)}m ${Math.round(seconds % 60)}s`;
+}
+
+function IndexBuildBar(props: { urlsChanged: boolean; onStarted: () => void }) {
+  const [status, setStatus] = React.useState<BuildStatus | null>(null);
+  const [error, setError] = React.useState<string | null>(null);
+  const [starting, setStarting] = React.useState(false);
+  const active = status?.state === 'starting' || status?.state === 'running';
+
+  const loadStatus = React.useCallback(async () => {
+    try {
+      const res = await fetch(`${llm_base}/api/index_build`);
+      if (!res.ok) throw new Error('Failed to load build status');
+      setStatus(await res.json());
+    } catch (e) {
+      setError(e instanceof Error ? e.message : 'Failed to load build status');
+    }
+  }, []);
+
+  React.useEffect(() => {
+    loadStatus();
+  }, [loadStatus]);
+
+  React.useEffect(() => {
+    if (!active) return;
+    const timer = window.setInterval(loadStatus, 3000);
+    return () => window.clearInterval(timer);
+  }, [active, loadStatus]);
+
+  async function startBuild() {
+    setStarting(true);
+    setError(null);
+    try {
+      const res = await fetch(`${llm_base}/api/index_build`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ mode: 'incremental', requested_by: localStorage.getItem('username') || 'admin' }),
+      });
+      const data = await res.json();
+      if (res.status === 409) {
+        setStatus(data.status);
+      } else if (!res.ok) {
+        throw new Error(data.error || 'Failed to start build');
+      } else {
+        setStatus(data);
+      }
+      props.onStarted();
+    } catch (e) {
+      setError(e instanceof Error ? e.message : 'Failed to start build');
+    } finally {
+      setStarting(false);
+    }
+  }
+
+  let label = 'Index: no build yet';
+  if (active) {
+    label = `Rebuilding index: ${status?.stage || 'starting'} ${Math.round(status?.percent || 0)}%`;
+    if (status?.eta_seconds != null) label += ` (about ${formatEta(status.eta_seconds)} left)`;
+  } else if (status?.state === 'succeeded') {
+    label = `Last build finished ${status.finished_at ? new Date(status.finished_at).toLocaleString() : ''}`;
+    if (status.result) label += ` · ${status.result.pages} pages, ${status.result.chunks} chunks`;
+  } else if (status?.state === 'failed') {
+    label = `Last build failed: ${status.error || 'unknown error'}`;
+  }
+
+  return (
+    <div className={styles.toolbar}>
+      {error && <div className={styles.error}>{error}</div>}
+      <span className={status?.state === 'failed' ? styles.statusStopped : undefined} style={{ flex: 1, fontSize: '14px' }}>
+        {props.urlsChanged && !active ? 'URLs changed, rebuild the index to apply them. ' : ''}
+        {label}
+      </span>
+      <button
+        type="button"
+        className={props.urlsChanged ? styles.primaryButton : styles.secondaryButton}
+        onClick={startBuild}
+        disabled={starting || active}
+      >
+        {active ? 'Rebuilding…' : 'Rebuild index'}
+      </button>
+    </div>
+  );
+}
+
+
 // USERS TAB - WITH SEARCH AND TEACHER ROLE
 function UsersTab() {
   const [users, setUsers] = React.useState<User[]>([]);
@@ -523,6 +625,90 @@ function BackendTab() {
         <strong>Warning:</strong> When maintenance mode is enabled, ALL users (including admins) cannot use chat. 
         Use this only in emergency situations (security breach, data leak, etc.).
       </div>
+
+      <IndexBuildsCard />
+    </div>
+  );
+}
+
+
+// INDEX BUILDS - TELEMETRY OF RECENT build_index RUNS
+interface BuildSummary {
+  run_id: string;
+  started_at: string;
+  mode: string;
+  result: string;
+  error: string | null;
+  seconds: number | null;
+  totals: { pages?: number; chunks?: number; failed?: number };
+}
+
+interface BuildDiff {
+  urls: { newly_failed: { url: string; status: number | null; error: string | null }[] };
+  regressions: string[];
+}
+
+function IndexBuildsCard() {
+  const [reports, setReports] = React.useState<BuildSummary[]>([]);
+  const [diff, setDiff] = React.useState<BuildDiff | null>(null);
+  const [error, setError] = React.useState<string | null>(null);
+
+  React.useEffect(() => {
+    loadReports();
+  }, []);
+
+  async function loadReports() {
+    setError(null);
+    try {
+      const res = await fetch(`${llm_base}/api/build_reports`);
+      if (!res.ok) throw new Error('Failed to load build reports');
+      const data = await res.json();
+      setReports(Array.isArray(data.reports) ? data.reports : []);
+      setDiff(data.diff || null);
+    } catch (e) {
+      setError(e instanceof Error ? e.message : 'Failed to load build reports');
+    }
+  }
+
+  return (
+    <div className={styles.statusCard} style={{ marginTop: '20px' }}>
+      <h3>Index Builds</h3>
+      {error && <div className={styles.error}>{error}</div>}
+      {reports.length === 0 && !error && <div className={styles.empty}>No builds recorded yet</div>}
+
+      {reports.slice(0, 5).map((r) => (
+        <div key={r.run_id} className={styles.statusRow} style={{ marginBottom: 0, padding: '6px 0' }}>
+          <span>
+            {new Date(r.started_at).toLocaleString()} ({r.mode})
+          </span>
+          <span className={r.result === 'failed' ? styles.statusStopped : styles.statusRunning}>
+            {r.result}
+            {r.seconds != null && ` · ${Math.round(r.seconds)}s`}
+            {r.totals.chunks != null && ` · ${r.totals.chunks} chunks`}
+            {!!r.totals.failed && ` · ${r.totals.failed} failed`}
+          </span>
+        </div>
+      ))}
+
+      {diff && (
+        <div style={{ marginTop: '12px', fontSize: '14px' }}>
+          <strong>Latest vs previous build:</strong>
+          {diff.regressions.length === 0 ? (
+            <div style={{ color: '#666' }}>No regressions</div>
+          ) : (
+            <ul style={{ margin: '6px 0', paddingLeft: '20px' }}>
+              {diff.regressions.map((r) => (
+                <li key={r}>{r}</li>
+              ))}
+            </ul>
+          )}
+          {diff.urls.newly_failed.slice(0, 10).map((f) => (
+            <div key={f.url} style={{ color: '#666', wordBreak: 'break-all' }}>
+              Failing: {f.url} ({f.error || f.status})
+            </div>
+          ))}
+        </div>
+      )}
     </div>
   );
-}
\ No newline at end of file
+}